@@ -16,13 +16,20 @@ _________
 """
 
 
+import os
 import re
 import copy
+import hashlib
+import weakref
+import tempfile
 import fnmatch
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import detrend
-from pandas import rolling_kurt
+from collections import OrderedDict
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+from scipy.signal import detrend, iirfilter, zpk2sos, sosfilt, sosfilt_zi
+from pandas import DataFrame
 from obspy import read, Trace, Stream
 from obspy.core.trace import Stats
 from obspy.signal.filter import highpass
@@ -42,10 +49,10 @@ def streamdatadim(a):
 	"""
 
 	nmax=0
-	for t, tr in enumerate(a):
+	for tr in a:
 		nmax = max((tr.stats.npts, nmax))
 
-	return (t+1, nmax)
+	return (len(a), nmax)
 
 
 def trace2stream(trace_or_stream_or_nparray):
@@ -84,6 +91,452 @@ def trace2stream(trace_or_stream_or_nparray):
 	return newstream, trace_or_stream_or_nparray 
 
 
+class RaggedTraces(object):
+	"""
+	Multi-trace array without padding to the longest trace: the 
+	samples of all traces are concatenated along the last axis of a 
+	single buffer, with the offset and length of each trace.
+
+	Indexing a trace returns a view of its samples, so that 
+	``ragged[t][n]`` is used as ``padded[t][n][:npts]``.
+	______
+	:type: 
+		- vector of int.
+		- shape: tuple of int (optional).
+		- dtype: NumPy:class:`~numpy.dtype` (optional).
+		- fill: float (optional).
+		- data: NumPy:class:`~numpy.ndarray` (..., samples) (optional).
+		- shared: bool (optional).
+		- scratch: string (optional).
+	:param: 
+		- number of samples of each trace.
+		- shape: leading dimensions of each trace (e.g. scales).
+		- dtype: data type.
+		- fill: initial value.
+		- data: existing buffer of the concatenated samples.
+		- shared: allocates the buffer with `~trigger.shared_array`.
+		- scratch: allocates the buffer with 
+			`~trigger.scratch_array` in this directory.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.RaggedTraces.data`: buffer (..., samples).
+		- `~trigger.RaggedTraces.offsets`: first buffer sample of 
+			each trace.
+		- `~trigger.RaggedTraces.lengths`: number of samples of 
+			each trace.
+		- `~trigger.RaggedTraces.padded`: returns the padded array.
+		- `~trigger.RaggedTraces.take`: selects along the leading 
+			dimensions.
+		- `~trigger.RaggedTraces.assign`: sets a block of samples 
+			from a padded array.
+	_________
+	.. note::
+
+		With ragged=True, `~trigger.recursive`, the multiplexors, 
+		`~trigger.Ratio` and `~trigger.Correlate` give the padded 
+		results over the samples of each trace, except for the 
+		right terms of `~trigger.LeftRightTerms`: within the largest
+		scale before the end of a trace shorter than the longest, 
+		they end with the trace instead of reading its padding 
+		(as at the end of the longest trace).
+	___________
+	.. rubric:: Example
+
+		>>> import trigger
+		>>> data = trigger.artificial_stream(npts=1000)
+		>>> ragged = trigger.RaggedTraces([tr.stats.npts for tr in data], (2,))
+		>>> ragged[0][1] = data[0].data
+
+	"""
+
+	def __init__(self, lengths, shape=(), dtype=np.float, fill=0., data=None, shared=False, scratch=None):
+
+		self.lengths = np.asarray(lengths, dtype=np.int64)
+		self.offsets = np.zeros(len(self.lengths), dtype=np.int64)
+		self.offsets[1:] = np.cumsum(self.lengths)[:-1]
+
+		if data is None and scratch is not None:
+			data = scratch_array(tuple(shape) + (np.sum(self.lengths),), dtype, fill, scratch)
+		elif data is None and shared:
+			data = shared_array(tuple(shape) + (np.sum(self.lengths),), dtype, fill)
+		elif data is None:
+			data = np.empty(tuple(shape) + (np.sum(self.lengths),), dtype=dtype)
+			data[...] = fill
+		self.data = data
+		self.dtype = data.dtype
+
+	def __len__(self):
+		return len(self.lengths)
+
+	def __getitem__(self, t):
+		o = self.offsets[t]
+		return self.data[..., o:o+self.lengths[t]]
+
+	def __setitem__(self, t, value):
+		self[t][...] = value
+
+	def __iter__(self):
+		for t in range(len(self)):
+			yield self[t]
+
+	def padded(self, fill=0., nmax=None):
+		"""
+		Returns the (traces, ..., samples) array padded with fill.
+		"""
+
+		if nmax is None:
+			nmax = max([0]+list(self.lengths))
+		output = np.empty((len(self),) + self.data.shape[:-1] + (nmax,), dtype=self.dtype)
+		output[...] = fill
+		for t, trace in enumerate(self):
+			output[t, ..., :trace.shape[-1]] = trace[..., :nmax]
+
+		return output
+
+	def take(self, index):
+		"""
+		Returns the traces with the given index of the leading 
+		dimensions (e.g. a slice of scales).
+		"""
+
+		return RaggedTraces(self.lengths, data=self.data[index])
+
+	def assign(self, start, values):
+		"""
+		Sets the samples from start of all traces, from a padded 
+		(traces, ..., samples) array (e.g. a chunk).
+		"""
+
+		for t, trace in enumerate(self):
+			trace = trace[..., start:start+values.shape[-1]]
+			trace[...] = values[t, ..., :trace.shape[-1]]
+
+
+def shared_array(shape, dtype=np.float, fill=0.):
+	"""
+	Returns an array in shared memory, that processes forked by 
+	`~trigger.forked_map` can write to.
+	______
+	:type: 
+		- tuple of int.
+		- dtype: NumPy:class:`~numpy.dtype` (optional).
+		- fill: float (optional).
+	:param: 
+		- shape of the array.
+		- dtype: data type.
+		- fill: initial value.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray`
+	:return: array.
+	"""
+
+	dtype = np.dtype(dtype)
+	size = int(np.prod(shape))
+	buf = np.ctypeslib.as_array(RawArray('b', max(1, size*dtype.itemsize)))
+	buf = buf[:size*dtype.itemsize].view(dtype).reshape(shape)
+	if fill != 0:
+		buf[...] = fill
+
+	return buf
+
+
+def scratch_array(shape, dtype=np.float, fill=0., scratch=None):
+	"""
+	Returns an array mapped to a file in a scratch directory (see 
+	NumPy:class:`~numpy.memmap`), or in memory by default. Processes 
+	forked by `~trigger.forked_map` can write to a mapped array.
+	______
+	:type: 
+		- tuple of int.
+		- dtype: NumPy:class:`~numpy.dtype` (optional).
+		- fill: float (optional).
+		- scratch: string (optional).
+	:param: 
+		- shape of the array.
+		- dtype: data type.
+		- fill: initial value.
+		- scratch: directory of the file (in memory if None).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` or 
+		NumPy:class:`~numpy.memmap`
+	:return: array.
+	_________
+	.. note::
+
+		The file is deleted right away: its disk space is released 
+		with the last reference to the array.
+
+	"""
+
+	if scratch is None or int(np.prod(shape)) == 0:
+		buf = np.empty(shape, dtype=dtype)
+		buf[...] = fill
+		return buf
+
+	with tempfile.NamedTemporaryFile(dir=scratch, prefix='trigger-', suffix='.dat') as f:
+		buf = np.memmap(f, dtype=dtype, mode='w+', shape=tuple(shape))
+	if fill != 0:
+		buf[...] = fill
+
+	return buf
+
+
+_forked = []
+
+def _forked_call(arguments):
+	return _forked[-1](*arguments)
+
+def forked_map(function, arguments, workers=None):
+	"""
+	Calls a function with each of the given arguments, in a pool of 
+	processes.
+	______
+	:type: 
+		- function.
+		- list of tuple.
+		- workers: int (optional).
+	:param: 
+		- function to call.
+		- arguments of each call.
+		- workers: number of processes (one call after the other in 
+			this process by default).
+	_______
+	:rtype: list
+	:return: the results of each call.
+	_________
+	.. note::
+
+		The processes are forked from this one: the function and 
+		all the data it uses are inherited without copy, only the 
+		arguments and results are transferred. Large results have 
+		to be written into a `~trigger.shared_array`. To call the 
+		function several times with the same processes, see 
+		`~trigger.ForkedPool`.
+
+	"""
+
+	if workers is None or workers < 2 or len(arguments) < 2:
+		return [function(*a) for a in arguments]
+
+	with ForkedPool(function, min(workers, len(arguments))) as pool:
+		return pool.map(arguments)
+
+
+class ForkedPool(object):
+
+	"""
+	Pool of processes of `~trigger.forked_map`, forked once to call 
+	a function over several lists of arguments (e.g. once per chunk 
+	of data).
+
+	In practice, it sets an instance of ForkedPool that forks the 
+	processes at the first map and keeps them until closed. The 
+	function and the data it uses are inherited as they are at that 
+	time: data changing between maps have to be written into arrays 
+	allocated before (e.g. by `~trigger.shared_array`).
+	______
+	:type: 
+		- function.
+		- workers: int (optional).
+	:param: 
+		- function to call.
+		- workers: number of processes (one call after the other in 
+			this process by default).
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.ForkedPool.forks`: whether the calls are made in 
+			other processes.
+		- `~trigger.ForkedPool.map`: returns the results of each 
+			call.
+		- `~trigger.ForkedPool.close`: waits for the processes to 
+			exit.
+
+	"""
+
+	def __init__(self, function, workers=None):
+
+		self.function = function
+		self.workers = workers
+		self.forks = workers is not None and workers > 1
+		self.pool = None
+
+	def map(self, arguments):
+		"""
+		Calls the function with each of the given arguments.
+		"""
+
+		if not self.forks:
+			return [self.function(*a) for a in arguments]
+
+		if self.pool is None:
+			_forked.append(self.function)
+			try:
+				self.pool = Pool(self.workers)
+			finally:
+				_forked.pop()
+
+		return self.pool.map(_forked_call, arguments, chunksize=1)
+
+	def close(self):
+		"""
+		Waits for the processes to exit.
+		"""
+
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+def station_batches(lengths, workers=None, size=16):
+	"""
+	Splits stations into batches of consecutive stations with the 
+	same number of samples, to be processed at once.
+	______
+	:type: 
+		- list of int.
+		- workers: int (optional).
+		- size: int (optional).
+	:param: 
+		- number of samples of each station.
+		- workers: number of processes sharing the batches (see 
+			`~trigger.forked_map`).
+		- size: maximum number of stations per batch.
+	_______
+	:rtype: list of list
+	:return: first and last (excluded) station of each batch.
+	"""
+
+	if workers is not None:
+		size = max(1, min(size, -(-len(lengths)//workers)))
+
+	batches = []
+	for i, n in enumerate(lengths):
+		if batches and i-batches[-1][0] < size and n == lengths[batches[-1][0]]:
+			batches[-1][1] = i+1
+		else:
+			batches.append([i, i+1])
+
+	return batches
+
+
+def station_batch(channels, cf, first, last):
+	"""
+	Returns the multiplexed data and the characteristic function of a 
+	batch of stations given by `~trigger.station_batches`.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (channel, station, scale, 
+			samples) or list of `~trigger.RaggedTraces`.
+		- NumPy:class:`~numpy.ndarray` (station, samples) or 
+			`~trigger.RaggedTraces`.
+		- int
+		- int
+	:param: 
+		- multiplexed data (e.g. from `~trigger.ShortLongTerms`).
+		- characteristic function.
+		- first station of the batch.
+		- last station of the batch (excluded).
+	_______
+	:rtype: 
+		- NumPy:class:`~numpy.ndarray` (channel, station, scale, 
+			samples).
+		- NumPy:class:`~numpy.ndarray` (station, samples).
+	:return: 
+		- data of the batch (a copy for ragged inputs).
+		- view of the characteristic function of the batch.
+	"""
+
+	if isinstance(cf, RaggedTraces):
+		# traces of the same length, contiguous in the buffers
+		o, n = cf.offsets[first], cf.lengths[first]
+		data = np.asarray([channel.data[:, o:o+(last-first)*n].reshape(-1, last-first, n) for channel in channels]).swapaxes(1, 2)
+		return data, cf.data[o:o+(last-first)*n].reshape(last-first, n)
+
+	return channels[:, first:last], cf[first:last]
+
+
+def stream_table(data):
+	"""
+	Returns the metadata of a data-stream as a table, with one row 
+	per trace, to select traces with `~trigger.stream_indexes`.
+	______
+	:type: ObsPy:class:`~obspy.core.stream`.
+	:param: data-stream of e.g. seismograms.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` structured array.
+	:return: fields id, network, station, location, channel, 
+		starttime, endtime (timestamps, in seconds), delta and npts.
+	"""
+
+	columns = OrderedDict()
+	columns['id'] = [tr.id for tr in data]
+	for name in ('network', 'station', 'location', 'channel'):
+		columns[name] = [tr.stats[name] for tr in data]
+	columns['starttime'] = [tr.stats.starttime.timestamp for tr in data]
+	columns['endtime'] = [tr.stats.endtime.timestamp for tr in data]
+	columns['delta'] = [tr.stats.delta for tr in data]
+	columns['npts'] = [tr.stats.npts for tr in data]
+
+	table = np.zeros(len(columns['id']), dtype=[(name, str, max([1]+[len(v) for v in columns[name]])) for name in list(columns)[:5]] + [('starttime', np.float), ('endtime', np.float), ('delta', np.float), ('npts', np.int)])
+	for name, values in columns.items():
+		table[name] = values
+
+	return table
+
+
+_tables = {}
+_table_headers = ('network', 'station', 'location', 'channel', 'starttime', 'delta', 'npts')
+
+def cached_stream_table(data):
+	"""
+	Returns the `~trigger.stream_table` of a data-stream, built once 
+	per data-stream object.
+	______
+	:type: ObsPy:class:`~obspy.core.stream`.
+	:param: data-stream of e.g. seismograms.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` structured array.
+	:return: see `~trigger.stream_table` (shared, not to be modified 
+		in place).
+	_________
+	.. note::
+
+		The table is rebuilt if the traces of the data-stream or 
+		any of their headers have been replaced or modified (the 
+		header values are compared by identity, without reading 
+		the ids and times of the traces). Tables are dropped once 
+		their data-stream is garbage collected.
+
+	"""
+
+	headers = [tr.stats.__dict__.get(name) for tr in data for name in _table_headers]
+	key = id(data)
+	if key in _tables:
+		reference, cached, table = _tables[key]
+		if reference() is data and len(cached) == len(headers) and all(a is b for a, b in zip(cached, headers)):
+			return table
+
+	table = stream_table(data)
+	reference = weakref.ref(data, lambda reference, key=key: _forget_table(key, reference))
+	_tables[key] = (reference, headers, table)
+
+	return table
+
+
+def _forget_table(key, reference):
+	# drops the table of `~trigger.cached_stream_table` whose 
+	# data-stream is gone
+	if key in _tables and _tables[key][0] is reference:
+		del _tables[key]
+
+
 def stream_indexes(data, delta=None, id=None, network=None, station=None, location=None, channel=None, starttime=None, endtime=None, npts=None, maxendtime=None, minstarttime=None, reftime=None):
 	"""
 	Return the indexes of Stream object with these traces that match the 
@@ -91,12 +544,17 @@ def stream_indexes(data, delta=None, id=None, network=None, station=None, locati
 	as the corresponding indexes of data attributes if requested.
 	______
 	:type: 
+		- ObsPy:class:`~obspy.core.stream` or 
+			NumPy:class:`~numpy.ndarray` structured array.
 		- identical to the attributes of 
 			ObsPy:class:`~obspy.core.trace.Stats`.
 		- maxendtime, minstarttime, reftime: 
 			ObsPy:class:`~obspy.core.utcdatetime.UTCDateTime` 
 			(optional).
 	:param: 
+		- data-stream (its table is cached, see 
+			`~trigger.cached_stream_table`), or its 
+			`~trigger.stream_table`.
 		- identical to the attributes of 
 			ObsPy:class:`~obspy.core.trace.Stats`
 		- maxendtime: optional, latest date and time of the first 
@@ -120,68 +578,205 @@ def stream_indexes(data, delta=None, id=None, network=None, station=None, locati
 	.. note::
 
 		Works similarly to ObsPy:meth:`~obspy.core.stream.select`.
+		Times are compared as ObsPy:class:`~obspy.core.utcdatetime.UTCDateTime`
+		does, rounded to the precision of the given times.
 
 	"""
 
-	# Gets stream dimensions
-	(tmax,nmax) = streamdatadim(data)
+	# Gets the metadata table
+	table = data
+	if not (isinstance(data, np.ndarray) and data.dtype.names):
+		table = cached_stream_table(data)
+
+	def ticks(times, utcdatetime):
+		# times rounded to the precision of a UTCDateTime
+		return np.rint(np.asarray(times)*10.**utcdatetime.precision)
+
+	# Testing inputs all traces at once
+	selected = np.ones(len(table), dtype=bool)
+	if delta is not None:
+		selected &= table['delta'] == delta
+	if starttime is not None:
+		selected &= ticks(table['starttime'], starttime) == ticks(starttime.timestamp, starttime)
+	if endtime is not None:
+		selected &= ticks(table['endtime'], endtime) == ticks(endtime.timestamp, endtime)
+	if npts is not None:
+		selected &= table['npts'] == npts
+	for name, pattern in (('id', id), ('network', network), ('station', station), ('location', location), ('channel', channel)):
+		if pattern is not None:
+			selected &= glob_mask(table[name], pattern)
+
+	# Testing optional inputs
+	if maxendtime is not None:
+		selected &= ticks(table['starttime'], maxendtime) <= ticks(maxendtime.timestamp, maxendtime)
+	if minstarttime is not None:
+		selected &= ticks(table['endtime'], minstarttime) >= ticks(minstarttime.timestamp, minstarttime)
+
+	# If all tests passed
+	## Selects traces
+	trace_indexes = np.flatnonzero(selected)
+
+	## Calculates optional sample difference
+	data_indexes = np.asarray([], dtype=int)
+	if reftime is not None:
+		data_indexes = (np.round(reftime.timestamp - table['starttime'][trace_indexes], reftime.precision) / table['delta'][trace_indexes]).astype(int)
+
+	return trace_indexes, data_indexes
+
+
+def glob_mask(values, pattern):
+	"""
+	Tests a vector of strings against a shell-style pattern (see 
+	fnmatch), once per distinct string.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` of strings.
+		- string.
+	:param: 
+		- strings to test.
+		- pattern (e.g. "EH?").
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` type bool.
+	:return: whether each string matches.
+	"""
 
-	# Initiates
-	trace_indexes = np.asarray([])
-	data_indexes = np.asarray([]) 
+	if not re.search(r'[*?[]', pattern):
+		return values == pattern
 
-	# Loops over traces 
-	for station_j in range(tmax):
+	unique, inverse = np.unique(values, return_inverse=True)
+	match = re.compile(fnmatch.translate(pattern)).match
 
-		# Testing inputs one by one
-		if delta is not None:
-			if delta != (data[station_j]).stats.delta :
-				continue
-		if starttime is not None:
-			if starttime != (data[station_j]).stats.starttime :
-				continue
-		if endtime is not None:
-			if endtime != (data[station_j]).stats.endtime :
-				continue
-		if npts is not None:
-			if npts != (data[station_j]).stats.npts :
-				continue
-		if id is not None:
-			if not fnmatch.fnmatch((data[station_j]).stats.id, id) :
-				continue
-		if network is not None:
-			if not fnmatch.fnmatch((data[station_j]).stats.network, network) :
-				continue
-		if station is not None:
-			if not fnmatch.fnmatch((data[station_j]).stats.station, station) :
-				continue
-		if location is not None:
-			if not fnmatch.fnmatch((data[station_j]).stats.location, location) :
-				continue
-		if channel is not None:
-			if not fnmatch.fnmatch((data[station_j]).stats.channel, channel) :
-				continue
-		
-		# Testing optional inputs
-		if maxendtime is not None:
-			if maxendtime < (data[station_j]).stats.starttime :
-				continue
-		if minstarttime is not None:
-			if minstarttime > (data[station_j]).stats.endtime :
-				continue
-		
-		# If all tests passed
-		## Selects trace
-		trace_indexes = np.append(trace_indexes, station_j)
+	return np.asarray([match(value) is not None for value in unique], dtype=bool)[inverse]
+
+
+def component_code(stats):
+	"""
+	Identifies the three-component set of a trace, following the 
+	naming conventions of `~trigger.Components` (Z/N/E, 3/2/1, 
+	VERTICAL/NORTH/EAST and station suffixes).
+	______
+	:type: ObsPy:class:`~obspy.core.trace.Stats`.
+	:param: header of a trace.
+	_______
+	:rtype: 
+		- tuple
+		- string
+	:return: 
+		- key shared by the traces of the same three-component set.
+		- component of the trace ('Z', 'N' or 'E').
+	_________
+	.. note::
+
+		Channels without component code are assumed vertical.
+
+	"""
+
+	sta = stats.station
+	chan = stats.channel
+
+	if chan in ('VERTICAL', 'NORTH', 'EAST', 'vertical', 'north', 'east') :
+		band = chan.isupper()
+		component = {'V':'Z', 'N':'N', 'E':'E'}[chan[0].upper()]
+	elif chan[-1:] in ('Z', 'N', 'E') :
+		band = chan[:-1]
+		component = chan[-1]
+	elif chan[-1:] in ('3', '2', '1') :
+		band = (chan[:-1], '321')
+		component = {'3':'Z', '2':'N', '1':'E'}[chan[-1]]
+	else :
+		band = chan[:-1]
+		component = 'Z'
+
+	if len(sta) > 3 and sta[-1] in ('Z', 'N', 'E', 'z', 'n', 'e') :
+		sta = (sta[:-1], sta[-1].isupper())
+
+	return (stats.network, sta, stats.location, band, stats.delta), component
+
+
+class ComponentIndex(object):
+	"""
+	Groups the traces of a data-stream into three-component sets 
+	with `~trigger.component_code`, in one pass, so that the 
+	components of any trace are found in constant time.
+	______
+	:type: ObsPy:class:`~obspy.core.stream`.
+	:param: data-stream of e.g. seismograms.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.ComponentIndex.groups`: trace indexes by 
+			three-component set and component.
+		- `~trigger.ComponentIndex.triplet`: returns the components 
+			of a trace.
+	_________
+	.. note::
+
+		Split or duplicated traces give several candidates for a 
+		component: the one overlapping the most the given trace is 
+		used.
+
+	"""
 
-		## Calculates optional sample difference
-		if reftime is not None:
-			data_indexes = np.append(data_indexes, ( reftime - (data[station_j]).stats.starttime ) / (data[station_j]).stats.delta )
+	def __init__(self, data):
 
-	return trace_indexes.astype(int), data_indexes.astype(int)
+		self.data = data
+		self.codes = [component_code(tr.stats) for tr in data]
+		self.groups = {}
+		for t, (key, component) in enumerate(self.codes):
+			self.groups.setdefault(key, {}).setdefault(component, []).append(t)
+
+	def triplet(self, t):
+		"""
+		Returns the indexes of the components of trace t (itself 
+		first, then Z, N, E) and their time differences (in samples, 
+		as in `~trigger.stream_indexes`).
+		"""
+
+		key, component = self.codes[t]
+		group = self.groups[key]
+		stime = self.data[t].stats.starttime
+		etime = self.data[t].stats.endtime
+		delta = self.data[t].stats.delta
+
+		ZNE_i = [t]
+		ZNE_di = [0]
+		for c in {'Z':'NE', 'N':'Z', 'E':'Z'}[component]:
+			best = None
+			for j in group.get(c, []):
+				overlap = min(etime, self.data[j].stats.endtime) - max(stime, self.data[j].stats.starttime)
+				if overlap >= 0 and (best is None or overlap > best[0]):
+					best = (overlap, j)
+			if best is not None:
+				ZNE_i.append(best[1])
+				ZNE_di.append(int((stime - self.data[best[1]].stats.starttime) / delta))
+
+		return np.asarray(ZNE_i, dtype=int), np.asarray(ZNE_di, dtype=int)
+
+
+def default_scales(nmax, maxscale=None):
+	"""
+	Returns the default scales of `~trigger.recursive`.
+	______
+	:type: 
+		- int
+		- maxscale: int (optional).
+	:param: 
+		- number of samples of the data.
+		- maxscale: maximum allowed scale (in samples).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` vector.
+	:return: powers of 2 from 32 to 512 samples, below maxscale and 
+		half the number of samples.
+	"""
+
+	if maxscale is None:
+		maxscale = nmax
+
+	scales = [2**i for i in range(5,10) if ((2**i <= (maxscale)) and (2**i <= (nmax - 2**i)))]
 
+	return np.require(scales, dtype=np.int) 
 
-def recursive(a, scales=None, operation=None, maxscale=None):
+
+def recursive(a, scales=None, operation=None, maxscale=None, dtype=np.float, ragged=False, workers=None, pyramid=None, scratch=None):
 	"""
 	_
 	Performs multi-scale calculation by 
@@ -194,6 +789,11 @@ def recursive(a, scales=None, operation=None, maxscale=None):
 		- scales: vector (optional).
 		- operation: string (optional).
 		- maxscale: int (optional).
+		- dtype: NumPy:class:`~numpy.dtype` (optional).
+		- ragged: bool (optional).
+		- workers: int (optional).
+		- pyramid: int (optional).
+		- scratch: string (optional).
 	:param: 
 		- data-stream of e.g. seismograms.
 		- scales: scale(s) of time-series operation (in samples).
@@ -203,10 +803,30 @@ def recursive(a, scales=None, operation=None, maxscale=None):
 			average: average  over time scales.
 			sumabs: sum of absolute values over time scales.
 			averageabs: average of absolute values over time scales.
+			sumsquare: sum of squared values over time scales.
+			d-sumsquare: sumsquare of the time derivative.
+			median: median over time scales.
+			medianabs: median of absolute values over time scales.
+			mad: median absolute deviation over time scales.
+			percentileXX: XX-th percentile over time scales 
+				(e.g. percentile90, or percentile90abs of absolute 
+				values).
 		- maxscale: maximum allowed scale (in samples).
+		- dtype: data type of the time series (e.g. np.float32 
+			for half the memory).
+		- ragged: returns `~trigger.RaggedTraces` (scales, samples) 
+			instead of padding all channels to the longest one.
+		- workers: number of processes sharing the channels (see 
+			`~trigger.forked_map`).
+		- pyramid: number of samples per window from which large 
+			scales are evaluated on decimated data (see 
+			`~trigger.multiscale_pyramid`, full rate by default).
+		- scratch: directory of a file mapping the output (see 
+			`~trigger.scratch_array`, in memory by default).
 	_______
 	:rtype: 
-		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples) or
+			`~trigger.RaggedTraces`.
 		- NumPy:class:`~numpy.ndarray` vector.
 	:return: 
 		- multi-scale array of root mean square time series, 
@@ -215,7 +835,13 @@ def recursive(a, scales=None, operation=None, maxscale=None):
 	.. note::
 
 		High-pass filtering over 1/(scale/fs) is performed before 
-		calculation using ObsPy:class:`~obspy.core.stream.filter`.
+		calculation using `~trigger.filterbank`, for all the channels 
+		with the same sampling rate and length at once. Long 
+		traces can be processed block by block with 
+		`~trigger.recursive_chunks`.
+
+		Filters run in double precision, the sums run in dtype 
+		(see `~trigger.CumulativeSums`).
 
 	"""
 	# 1) Iterate on channels
@@ -230,16 +856,18 @@ def recursive(a, scales=None, operation=None, maxscale=None):
 		operation = 'rms'
 	(tmax,nmax) = streamdatadim(a)
 
-	if maxscale is None:
-		maxscale = nmax
-
 	if scales is None:
-		scales = [2**i for i in range(5,10) if ((2**i <= (maxscale)) and (2**i <= (nmax - 2**i)))]
-		scales = np.require(scales, dtype=np.int) 
+		scales = default_scales(nmax, maxscale)
 
 	# Initialize results at the minimal size
-	timeseries = np.zeros(( tmax, len(scales), nmax )) 
-	bandpass_timeseries = np.zeros(( tmax, len(scales), nmax )) 
+	if ragged:
+		timeseries = RaggedTraces([tr.stats.npts for tr in a], (len(scales),), dtype, shared=workers is not None, scratch=scratch)
+	elif scratch is not None:
+		timeseries = scratch_array(( tmax, len(scales), nmax ), dtype, 0., scratch)
+	elif workers is None:
+		timeseries = np.zeros(( tmax, len(scales), nmax ), dtype=dtype) 
+	else:
+		timeseries = shared_array(( tmax, len(scales), nmax ), dtype)
 
 	a.detrend('linear')
 	a.taper(.05, type='triang', max_length=10) 
@@ -249,148 +877,1333 @@ def recursive(a, scales=None, operation=None, maxscale=None):
 	# a.filter("highpass", freq=1.)  
 	# a.taper(.05, type='triang', max_length=10) 
 
+	# Channels sharing sampling rate and length are processed together
+	groups = OrderedDict()
 	for t, tr in enumerate(a) : # the channel-wise calculations      
 
 		# Avoid clock channels 
 		if not tr.stats.channel == 'YH':
-
-			for n, s in reversed(list(enumerate(scales))) : # Avoid scales when too wide for the current channel
-				
-				npts = tr.stats.npts
-				dt = np.zeros((tr.data).shape)
-				dt[1:] = np.abs(tr.data[:-1]-tr.data[1:])
-				data = tr.data.copy()
-
-				if len(scales)>1 and n < len(scales)-1 :
-					tr_filt = tr.copy()
-					tr_filt.filter('highpass', freq=1/(scales[n+1]*tr_filt.stats.delta), corners=4, zerophase=True)
-					data = tr_filt.data.copy()
-
-				data *= dt < (np.median(dt)+2.*np.std(dt))
-				data = detrend(data)
-
-				if operation[0:1] in ('d-'):  
-					data = np.gradient(data) 
-
-				data[data==0] = np.nan
-				
-				# The cumulative sum can be exploited to calculate a 
-				# moving average (the cumsum function is quite efficient)
-				if operation in ('rms', 'sumsquare', 'd-sumsquare'):                  
-					csqr = np.nan_to_num(data**2).cumsum() #np.nancumsum( data ** 2 ) #
-				elif operation in ('averageabs', 'sumabs'):  
-					csqr = np.nan_to_num(np.abs(data)).cumsum() # np.nancumsum(np.abs( data )) 
-				elif operation in ('average', 'sum'):  
-					csqr = np.nan_to_num(data).cumsum() #np.nancumsum( data )  
-				
-				# Convert to float
-				csqr = np.require(csqr, dtype=np.float)
-
-				if (s < (npts - s)) :    
-					# Compute the sliding window
-					timeseries[t][n][s:npts] = csqr[s:] - csqr[:npts-s]
-					# for average and rms only 
-					if operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
-						timeseries[t][n][:] /= s     
-					# Pad with modified scale definitions(vectorization ###################################### TODO)
-					timeseries[t][n][1:s] = csqr[1:s] - csqr[0]
-					# for average and rms only
-					if operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
-						timeseries[t][n][1:s] = timeseries[t][n][1:s]/np.asarray(range(1, s), dtype=np.float32)
-					# detrending
-					timeseries[t][n][1:s] = timeseries[t][n][1:s]+(timeseries[t][n][1:s]-timeseries[t][n][1])*np.asarray(range(s, 1, -1), dtype=np.float32)/s
-					# filtering
-					f = np.cumsum(timeseries[t][n][:])
-					timeseries[t][n][0:s] = (f[s+1]-f[0:s])/np.asarray(range(s+1,1,-1), dtype=np.float32)
-				
-					# Avoid division by zero by setting zero values to tiny float
-					dtiny = np.finfo(0.0).tiny
-					idx = timeseries[t][n] < dtiny
-					timeseries[t][n][idx] = dtiny 
-					timeseries[t][n][12000:] = dtiny 
-					# finish rms case
-					if (operation is 'rms') :
-						timeseries[t][n][:npts] = timeseries[t][n][:npts]**.5
+			groups.setdefault((tr.stats.sampling_rate, tr.stats.npts), []).append(t)
+
+	def process(batch, sampling_rate, npts):
+		# All scales at once: one (channel, scale, sample) array 
+		# and one cumulative sum along samples
+		data = np.asarray([a[t].data for t in batch], dtype=np.float)
+		data = recursive_preprocessing(data, scales, operation, sampling_rate)
+		if pyramid:
+			data = multiscale_pyramid(np.asarray(data, dtype=dtype), scales, operation, npts if ragged else nmax, pyramid)
+		elif robust_operation(operation):
+			data = multiscale_quantiles(np.asarray(data, dtype=dtype), scales, operation, npts if ragged else nmax)
+		else:
+			data = multiscale_sums(np.asarray(data, dtype=dtype), scales, operation, npts if ragged else nmax)
+		for t, sums in zip(batch, data):
+			timeseries[t] = sums
+
+	batches = []
+	for (sampling_rate, npts), traces in groups.items() :
+		size = 16
+		if workers is not None:
+			size = max(1, min(size, -(-len(traces)//workers)))
+		for b in range(0, len(traces), size) :
+			batches.append((traces[b:b+size], sampling_rate, npts))
+	forked_map(process, batches, workers)
 	
 	return timeseries, scales 
 
 
-def correlationcoef(a, b, scales=None, maxscale=None):
+_recursives = OrderedDict()
+recursive_cachesize = 4
+
+def cached_recursive(a, scales=None, operation=None, maxscale=None, dtype=np.float, ragged=False, workers=None, pyramid=None, scratch=None):
 	"""
-	Calculate moving cross-correlation coefficients by 
-	creating series of operations of different subsets of 
-	the full data set.
+	Returns `~trigger.recursive` of a copy of the data, from a least 
+	recently used cache of `~trigger.recursive_cachesize` results 
+	shared by all multiplexors (e.g. the `~trigger.Ratio` and 
+	`~trigger.Correlate` of the same data-stream).
 	______
 	:type: 
-		- NumPy:class:`~numpy.ndarray` (samples).
-		- NumPy:class:`~numpy.ndarray` (samples).
-		- scales: vector (optional).
-		- maxscale: int (optional).
+		- ObsPy:class:`~obspy.core.stream`
+		- other parameters: see `~trigger.recursive`.
 	:param: 
-		- data of e.g. seismograms.
-		- data of e.g. seismograms.
-		- scales: scale(s) of cross-correlation (in samples).
-		- maxscale: maximum allowed scale (in samples).
+		- data-stream of e.g. seismograms (left unchanged).
+		- other parameters: see `~trigger.recursive`.
 	_______
-	:rtype: NumPy:class:`~numpy.ndarray`
-	:return: array of moving cross-correlation coefficients.
+	:rtype: see `~trigger.recursive`.
+	:return: see `~trigger.recursive`.
 	_________
 	.. note::
 
-		The signal windows considered for calculation are truncated 
-		for sample indexes below time scale.
+		Results are identified by the data-stream object itself 
+		(and its traces ids, start times, sampling rates and 
+		numbers of samples), not by its samples: a data-stream 
+		modified in place must be given as a new object.
 
-	"""
+		Results are shared and must not be modified in place. They 
+		are dropped from the cache once the data-stream is garbage 
+		collected.
 
-	na = len(a)
-	if maxscale is None:
-		maxscale = na
+	"""
 
+	stream = trace2stream(a)[0]
+	if operation is None:
+		operation = 'rms'
 	if scales is None:
-		scales = [2**i for i in range(4,999) if ((2**i <= (maxscale)) and (2**i <= (na - 2**i)))]
-	
-	scales = np.require(scales, dtype=np.int) 
-	scales = np.asarray(scales)
-	nscale = len(scales)
-	if nscale == 0 : 
-		scales = [max([4, maxscale/10.])]
-		nscale = 1
-
-	cc = np.ones(a.shape)*1.0
-	prod_cumsum = np.cumsum( a * b )
-	a_squarecumsum = np.cumsum( a**2 )
-	b_squarecumsum = np.cumsum( b**2 )
-
-	dtiny = np.finfo(0.0).tiny
-	b_squarecumsum[b_squarecumsum < dtiny] = dtiny
-	a_squarecumsum[a_squarecumsum < dtiny] = dtiny
-
-	for s in scales :
+		scales = default_scales(streamdatadim(stream)[1], maxscale)
 
-		scaled_prod_cumsum = prod_cumsum[s:] - prod_cumsum[:-s]
-		scaled_a_squarecumsum = a_squarecumsum[s:] - a_squarecumsum[:-s]
-		scaled_b_squarecumsum = b_squarecumsum[s:] - b_squarecumsum[:-s]
+	key = (id(a), 
+		tuple((tr.id, tr.stats.starttime.timestamp, tr.stats.sampling_rate, tr.stats.npts) for tr in stream), 
+		operation, tuple(np.asarray(scales).tolist()), maxscale, np.dtype(dtype).str, ragged, pyramid, scratch)
+	if key in _recursives and _recursives[key][0]() is a:
+		reference, result = _recursives.pop(key)
+	else:
+		reference = weakref.ref(a, lambda reference, key=key: _forget_recursive(key, reference))
+		result = recursive(stream.copy(), scales, operation, maxscale, dtype, ragged, workers, pyramid, scratch)
+	_recursives[key] = (reference, result)
 
-		cc[s:] *= (scaled_prod_cumsum / np.sqrt( scaled_a_squarecumsum * scaled_b_squarecumsum ))
+	while len(_recursives) > recursive_cachesize:
+		_recursives.popitem(last=False)
 
-		# pading with modified def
-		scaled_prod_cumsum = prod_cumsum[1:s] - prod_cumsum[0]
-		scaled_a_squarecumsum = a_squarecumsum[1:s] - a_squarecumsum[0]
-		scaled_b_squarecumsum = b_squarecumsum[1:s] - b_squarecumsum[0]
+	return result
 
-		cc[1:s] *= (scaled_prod_cumsum / np.sqrt( scaled_a_squarecumsum * scaled_b_squarecumsum ))
 
-	return cc #**(1./nscale)
+def _forget_recursive(key, reference):
+	# drops a result of `~trigger.cached_recursive` whose data-stream 
+	# is gone (unless the key already holds a newer data-stream)
+	if key in _recursives and _recursives[key][0] is reference:
+		del _recursives[key]
 
 
-def stream_processor_plot(stream, cf, cfcolor = 'm', ax = None, label = None, shift = 0, f=None, rescale=None):
+def recursive_preprocessing(data, scales, operation='rms', sampling_rate=1.):
 	"""
-	Plots the body-wave characteristic functions resulting of 
+	Prepares the data of one or several traces for 
+	`~trigger.recursive` at all scales at once.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- scales: vector.
+		- operation: string (optional).
+		- sampling_rate: float (optional).
+	:param: 
+		- data of e.g. seismograms, all with the same sampling rate.
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- sampling_rate: sampling rate of data (in Hz).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., scales, samples).
+	:return: filtered, de-spiked and detrended data of each scale.
+	_________
+	.. note::
+
+		The spike mask is the same for all scales, it is computed 
+		once on the raw data of each trace (see 
+		`~trigger.spike_mask`), over windows of the largest scale for
+		robust operations.
+
+		High-pass filters are given by `~trigger.filterbank`.
+
+	"""
+
+	npts = data.shape[-1]
+
+	dt = np.zeros(data.shape)
+	dt[..., 1:] = np.abs(data[..., :-1]-data[..., 1:])
+	keep = spike_mask(dt, np.max(scales) if robust_operation(operation) and len(scales) else None)
+
+	data = filterbank(sampling_rate, scales).filter(data)
+	data *= keep[..., None, :]
+	# row by row, as scipy's 2d detrend rounds differently 
+	for row in data.reshape(-1, npts):
+		row[:] = detrend(row)
+
+	if operation[0:1] in ('d-'):  
+		data = np.gradient(data, axis=-1) 
+
+	return data
+
+
+class HighpassBank(object):
+	"""
+	Zero-phase high-pass filters used by `~trigger.recursive`, 
+	designed once for a sampling rate and a set of scales.
+
+	The data of scale n are high-passed above fs/scale[n+1] with a 
+	Butterworth filter applied forward and backward (as in 
+	ObsPy:meth:`~obspy.core.trace.Trace.filter` with ``zerophase=True``). 
+	The data of the largest scale are not filtered.
+	______
+	:type: 
+		- sampling_rate: float.
+		- scales: vector.
+		- corners: int (optional).
+	:param: 
+		- sampling_rate: sampling rate of data (in Hz).
+		- scales: scale(s) of time-series operation (in samples).
+		- corners: filter corners.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.HighpassBank.sos`: second-order sections of each 
+			filter.
+		- `~trigger.HighpassBank.filter`: filters data at all 
+			scales.
+	___________
+	.. rubric:: Example
+
+		>>> import numpy as np
+		>>> import trigger
+		>>> a = trigger.artificial_stream(npts=1000)
+		>>> bank = trigger.filterbank(a[0].stats.sampling_rate, [16, 128])
+		>>> data = bank.filter(np.asarray([tr.data for tr in a]))
+
+	"""
+
+	def __init__(self, sampling_rate, scales, corners=4):
+
+		self.sampling_rate = sampling_rate
+		self.scales = np.asarray(scales)
+		self.corners = corners
+
+		fe = 0.5 * sampling_rate
+		self.sos = []
+		for s in self.scales[1:]:
+			f = (1/(s/float(sampling_rate))) / fe
+			if f > 1:
+				raise ValueError("Selected corner frequency is above Nyquist.")
+			z, p, k = iirfilter(corners, f, btype='highpass', ftype='butter', output='zpk')
+			self.sos.append(zpk2sos(z, p, k))
+
+	def filter(self, data):
+		"""
+		Filters data at all scales.
+		______
+		:type: NumPy:class:`~numpy.ndarray` (..., samples).
+		:param: data of e.g. seismograms.
+		_______
+		:rtype: NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		:return: filtered data of each scale.
+		"""
+
+		output = np.empty(data.shape[:-1] + (len(self.scales), data.shape[-1]))
+		for n, sos in enumerate(self.sos):
+			firstpass = sosfilt(sos, data, axis=-1)
+			output[..., n, :] = sosfilt(sos, firstpass[..., ::-1], axis=-1)[..., ::-1]
+		if len(self.scales):
+			output[..., -1, :] = data
+
+		return output
+
+
+_filterbanks = OrderedDict()
+filterbank_cachesize = 32
+
+def filterbank(sampling_rate, scales, corners=4):
+	"""
+	Returns the `~trigger.HighpassBank` of a sampling rate and a set 
+	of scales, from a least recently used cache of 
+	`~trigger.filterbank_cachesize` filter banks.
+	______
+	:type: 
+		- sampling_rate: float.
+		- scales: vector.
+		- corners: int (optional).
+	:param: 
+		- sampling_rate: sampling rate of data (in Hz).
+		- scales: scale(s) of time-series operation (in samples).
+		- corners: filter corners.
+	_______
+	:rtype: `~trigger.HighpassBank`
+	:return: filter bank.
+	"""
+
+	key = (float(sampling_rate), tuple(np.asarray(scales).tolist()), corners)
+	if key in _filterbanks:
+		bank = _filterbanks.pop(key)
+	else:
+		bank = HighpassBank(sampling_rate, scales, corners)
+	_filterbanks[key] = bank
+
+	while len(_filterbanks) > filterbank_cachesize:
+		_filterbanks.popitem(last=False)
+
+	return bank
+
+
+class ChunkedRecursive(object):
+
+	"""
+	Pre-processing of `~trigger.recursive` for one trace, evaluated 
+	chunk by chunk with bounded memory.
+
+	In practice, it sets an instance of ChunkedRecursive that runs 
+	the zero-phase filters forward and backward once over the trace
+	to store the filter states on a grid of samples, together with 
+	the spike threshold and the linear trends of each scale. Any 
+	range of samples can then be pre-processed exactly from the 
+	closest stored states.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (samples).
+		- scales: vector.
+		- operation: string (optional).
+		- sampling_rate: float (optional).
+		- step: int (optional).
+	:param: 
+		- data of e.g. a seismogram.
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- sampling_rate: sampling rate of data (in Hz).
+		- step: number of samples between stored filter states.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.ChunkedRecursive.preprocessed`: returns the 
+			pre-processed data of a range of samples.
+		- `~trigger.ChunkedRecursive.sums`: returns the multi-scale
+			time series of a range of samples.
+
+	"""
+
+	def __init__(self, data, scales, operation='rms', sampling_rate=1., step=8192):
+
+		self.data = data
+		self.scales = np.asarray(scales, dtype=np.int64)
+		self.operation = operation
+		self.npts = len(data)
+		self.step = step
+		self.bounds = list(range(0, self.npts, step)) + [self.npts]
+		self.sos = filterbank(sampling_rate, scales).sos
+
+		# spike threshold, or windows of the rolling one
+		self.window = None
+		self.threshold = None
+		if robust_operation(operation):
+			self.window = np.max(self.scales)
+		else:
+			dt = np.zeros(data.shape)
+			dt[1:] = np.abs(data[:-1]-data[1:])
+			self.threshold = np.median(dt)+2.*np.std(dt)
+			del dt
+
+		# filter states, forward then backward
+		nchunk = len(self.bounds)-1
+		self.forward = []
+		self.backward = []
+		for sos in self.sos:
+			zf = [np.zeros((sos.shape[0], 2))]
+			for k in range(nchunk):
+				zf.append(sosfilt(sos, data[self.bounds[k]:self.bounds[k+1]], zi=zf[k])[1])
+			self.forward.append(zf)
+			self.backward.append([None]*nchunk + [np.zeros((sos.shape[0], 2))])
+
+		# linear trends of the de-spiked data, as scipy's detrend
+		sums = np.zeros(( len(self.scales), 2 ))
+		center = (self.npts-1)/2.
+		for k in reversed(range(nchunk)):
+			b0, b1 = self.bounds[k], self.bounds[k+1]
+			filtered = self.filtered(b0, b1, k, k+1, store=True)
+			sums[:, 0] += np.sum(filtered, axis=-1)
+			sums[:, 1] += np.dot(filtered, np.arange(b0, b1)-center)
+		self.center = center
+		self.mean = sums[:, 0]/max(1, self.npts)
+		self.slope = sums[:, 1]/max(1., np.sum((np.arange(self.npts)-center)**2.))
+
+	def filtered(self, b0, b1, k0, k1, store=False):
+		# De-spiked filtered data between stored filter states k0, k1
+		data = self.data[b0:b1]
+		filtered = np.empty(( len(self.scales), b1-b0 ))
+		for n, sos in enumerate(self.sos):
+			firstpass = sosfilt(sos, data, zi=self.forward[n][k0])[0]
+			buf, zb = sosfilt(sos, firstpass[::-1], zi=self.backward[n][k1])
+			filtered[n] = buf[::-1]
+			if store:
+				self.backward[n][k0] = zb
+		filtered[-1] = data
+
+		if self.window is None:
+			dt = np.zeros(b1-b0)
+			dt[1:] = np.abs(data[:-1]-data[1:])
+			if b0 > 0:
+				dt[0] = np.abs(self.data[b0-1]-data[0])
+			filtered *= dt < self.threshold
+		else:
+			# with the past samples of the rolling windows
+			a = max(0, b0-self.window+1)
+			dt = np.zeros(b1-a)
+			dt[1:] = np.abs(self.data[a:b1-1]-self.data[a+1:b1])
+			if a > 0:
+				dt[0] = np.abs(self.data[a-1]-self.data[a])
+			filtered *= spike_mask(dt, self.window)[b0-a:]
+
+		return filtered
+
+	def preprocessed(self, p, q):
+		"""
+		Returns the pre-processed data of samples p to q, as given 
+		by `~trigger.recursive_preprocessing` for the whole trace.
+		"""
+
+		# closest stored filter states
+		d = 0
+		if self.operation[0:1] in ('d-'):
+			d = 1
+		p0, q0 = max(0, p-d), min(self.npts, q+d)
+		k0, k1 = p0//self.step, -(-q0//self.step)
+		k1 = min(k1, len(self.bounds)-1)
+		b0, b1 = self.bounds[k0], self.bounds[k1]
+
+		data = self.filtered(b0, b1, k0, k1)[:, p0-b0:q0-b0]
+		data -= self.mean[:, None] + self.slope[:, None]*(np.arange(p0, q0)-self.center)
+
+		if d :  
+			data = np.gradient(data, axis=-1)[:, p-p0:q-p0] 
+
+		return data
+
+	def sums(self, p, q):
+		"""
+		Returns the multi-scale time series of samples p to q, as
+		given by `~trigger.recursive` for the whole trace (tiny 
+		values beyond the trace).
+		"""
+
+		smax = np.max(self.scales)
+		n = min(q, self.npts) - p
+		if robust_operation(self.operation):
+			past = p - max(0, p - smax)
+			data = np.zeros(( len(self.scales), 0 ))
+			if n > 0 :
+				data = self.preprocessed(p-past, p+n)
+			return multiscale_quantiles(data, self.scales, self.operation, nmax=q-p, overlap=past if n > 0 else 0, npts=self.npts)
+		if n <= 0 :
+			timeseries = multiscale_sums(np.zeros(( len(self.scales), smax+1 )), self.scales, self.operation, nmax=q-p, overlap=smax+1, npts=self.npts)
+		elif p <= smax :
+			# the head filter of the first samples needs smax+2 samples
+			m = max(p+n, min(self.npts, smax+2))
+			timeseries = multiscale_sums(self.preprocessed(0, m), self.scales, self.operation, nmax=max(q, m), npts=self.npts)[:, p:q]
+		else :
+			timeseries = multiscale_sums(self.preprocessed(p-smax, p+n), self.scales, self.operation, nmax=q-p, overlap=smax, npts=self.npts)
+
+		return timeseries
+
+
+def recursive_chunks(a, scales=None, operation=None, maxscale=None, chunksize=2**16, overlap=0, dtype=np.float):
+	"""
+	Performs the multi-scale calculation of `~trigger.recursive` 
+	chunk by chunk, for traces of any length.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`
+		- scales: vector (optional).
+		- operation: string (optional).
+		- maxscale: int (optional).
+		- chunksize: int (optional).
+		- overlap: int (optional).
+		- dtype: NumPy:class:`~numpy.dtype` (optional).
+	:param: 
+		- data-stream of e.g. seismograms.
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- maxscale: maximum allowed scale (in samples).
+		- chunksize: number of samples of each chunk.
+		- overlap: number of samples added before and after each 
+			chunk.
+		- dtype: data type of the time series.
+	_______
+	:rtype: generator of 
+		- int
+		- int
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- NumPy:class:`~numpy.ndarray` vector.
+	:return: 
+		- first sample of the chunk,
+		- last sample of the chunk (excluded),
+		- multi-scale time series from max(0, first-overlap) to 
+			min(nmax, last+overlap), 
+		- calculation scales (samples scale unit).
+	_________
+	.. note::
+
+		Chunks stitch into the output of `~trigger.recursive`, up 
+		to rounding (the cumulative sums restart in each chunk). 
+		Memory is bounded by the chunk size, except for one 
+		temporary sample difference per trace.
+
+		The zero-phase filters are run twice over the trace.
+
+	"""
+
+	a, input_a = trace2stream(a)
+	
+	# Initialize multiscale if undefined
+	if operation is None:
+		operation = 'rms'
+	(tmax,nmax) = streamdatadim(a)
+
+	if scales is None:
+		scales = default_scales(nmax, maxscale)
+
+	a.detrend('linear')
+	a.taper(.05, type='triang', max_length=10) 
+
+	chunked = [None]*tmax
+	if len(scales):
+		for t, tr in enumerate(a) :
+			# Avoid clock channels 
+			if not tr.stats.channel == 'YH':
+				chunked[t] = ChunkedRecursive(np.require(tr.data, dtype=np.float), scales, operation, tr.stats.sampling_rate, max(1, chunksize//8))
+
+	for start in range(0, nmax, chunksize):
+		stop = min(nmax, start+chunksize)
+		p, q = max(0, start-overlap), min(nmax, stop+overlap)
+
+		timeseries = np.zeros(( tmax, len(scales), q-p ), dtype=dtype)
+		for t in range(tmax):
+			if chunked[t] is not None:
+				timeseries[t] = chunked[t].sums(p, q)
+
+		yield start, stop, timeseries, scales
+
+
+class CumulativeSums(object):
+	"""
+	Cumulative sums along samples used by `~trigger.multiscale_sums`, 
+	to get sums over windows of samples. 
+
+	Below double precision, the sums restart every block of samples: 
+	over long traces, a single precision cumulative sum grows much 
+	larger than the window sums taken as its differences, and loses 
+	their precision. The error of the restarted sums stays at the 
+	scale of a block.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		- block: int (optional).
+	:param: 
+		- data to sum.
+		- block: number of samples between restarts, at least the 
+			widest window (no restart by default).
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.CumulativeSums.window`: returns the sums over 
+			windows of samples.
+
+	"""
+
+	def __init__(self, data, block=None):
+
+		self.npts = data.shape[-1]
+		self.rows = np.arange(data.shape[-2])[:, None]
+		self.block = block
+		if data.dtype.itemsize >= 8 or block is None or block >= self.npts:
+			self.block = None
+
+		if self.block is None:
+			self.sums = data.cumsum(axis=-1)
+		else:
+			nblock = -(-self.npts//block)
+			blocks = np.zeros(data.shape[:-1] + (nblock*block,), dtype=data.dtype)
+			blocks[..., :self.npts] = data
+			blocks = blocks.reshape(data.shape[:-1] + (nblock, block)).cumsum(axis=-1)
+			self.sums = blocks.reshape(data.shape[:-1] + (nblock*block,))[..., :self.npts]
+			# the same, minus the sum of their block
+			self.lower = (blocks - blocks[..., -1:]).reshape(data.shape[:-1] + (nblock*block,))[..., :self.npts]
+
+	def window(self, i, j):
+		"""
+		Returns the sums over samples j (excluded) to i (included). 
+		______
+		:type: 
+			- slice or NumPy:class:`~numpy.ndarray` vector.
+			- NumPy:class:`~numpy.ndarray` (scales, samples).
+		:param: 
+			- last samples of each window.
+			- first samples (excluded) of each window and scale, no 
+				more than a block before i.
+		_______
+		:rtype: NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		:return: window sums.
+		"""
+
+		if self.block is None:
+			return self.sums[..., i] - self.sums[..., self.rows, j]
+
+		# windows starting in the previous block
+		before = (j//self.block) < (np.arange(self.npts)[i]//self.block)
+		return self.sums[..., i] - np.where(before, self.lower[..., self.rows, j], self.sums[..., self.rows, j])
+
+
+def multiscale_sums(data, scales, operation='rms', nmax=None, overlap=0, npts=None):
+	"""
+	Calculates the rolling operations of `~trigger.recursive` for all 
+	scales at once, from a single cumulative sum along samples.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		- scales: vector.
+		- operation: string (optional).
+		- nmax: int (optional).
+		- overlap: int (optional).
+		- npts: int (optional).
+	:param: 
+		- pre-processed data (e.g. from 
+			`~trigger.recursive_preprocessing`).
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- nmax: number of samples of the output (padded with tiny 
+			values beyond the data).
+		- overlap: number of first samples of data only used as 
+			past of the output samples, 0 if data start with the 
+			trace, else at least the largest scale (for data 
+			processed in chunks).
+		- npts: number of samples of the whole trace (default, the 
+			number of samples of data after overlap).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., scales, nmax).
+	:return: multi-scale time series, in the floating point type 
+		of data (double precision for integers).
+	_________
+	.. note::
+
+		The windows of the first samples (below scale) are truncated,
+		detrended and smoothed. Scales too wide for the trace are 
+		left to zero.
+
+	"""
+
+	scales = np.asarray(scales, dtype=np.int64)
+	n = data.shape[-1] - overlap
+	if npts is None:
+		npts = n
+	if nmax is None:
+		nmax = n
+	dtype = np.result_type(data, np.float32)
+	data = np.asarray(data, dtype=dtype)
+	dtiny = np.finfo(dtype).tiny
+
+	if len(scales) == 0:
+		return np.zeros(data.shape[:-1] + (nmax,), dtype=dtype)
+
+	# The cumulative sum can be exploited to calculate a 
+	# moving average (the cumsum function is quite efficient), 
+	# restarted every largest scale below double precision
+	block = int(np.max(scales))+1
+	if operation in ('rms', 'sumsquare', 'd-sumsquare'):                  
+		csqr = CumulativeSums(np.nan_to_num(data**2), block)
+	elif operation in ('averageabs', 'sumabs'):  
+		csqr = CumulativeSums(np.nan_to_num(np.abs(data)), block)
+	elif operation in ('average', 'sum'):  
+		csqr = CumulativeSums(np.nan_to_num(data), block)
+
+	# (scale, sample) grids
+	s = scales[:, None]
+	i = overlap + np.arange(n)[None, :]
+	rows = np.arange(len(scales))[:, None]
+
+	if overlap > 0 :
+		# Compute the sliding windows of all scales
+		timeseries = csqr.window(slice(overlap, None), i-s)
+		# for average and rms only 
+		if operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
+			timeseries /= s
+
+	else :
+		# the first samples (below the largest scale) need 
+		# scale-specific definitions
+		nhead = min(n, np.max(scales)+2)
+		ih = i[:, :nhead]
+		head = (ih >= 1) & (ih < s)
+
+		# Compute the sliding windows of all scales, first samples
+		# are padded with modified scale definitions
+		timeseries = csqr.window(slice(None), np.maximum(i-s, 0))
+
+		# for average and rms only 
+		if operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
+			timeseries[..., nhead:] /= s
+			timeseries[..., :nhead] /= np.where(ih < s, np.maximum(ih, 1), s)
+
+		# detrending (multiplied before divided, as the per-scale loop)
+		buf = timeseries[..., :nhead]
+		buf[:] = np.where(head, buf+(buf-buf[..., 1:2])*(s-ih+1).astype(dtype)/s, buf)
+
+		# filtering
+		f = np.cumsum(buf, axis=-1)
+		fs = f[..., rows, np.minimum(s+1, nhead-1)]
+		buf[:] = np.where(ih < s, (fs-f)/np.maximum(s+1-ih, 1).astype(dtype), buf)
+
+	# Avoid division by zero by setting zero values to tiny float
+	output = np.empty(data.shape[:-1] + (nmax,), dtype=dtype)
+	output[..., :n] = timeseries
+	output[..., n:] = dtiny
+	output[output < dtiny] = dtiny 
+	# finish rms case
+	if operation == 'rms':
+		output[..., :n] **= .5
+
+	# Scales too wide for the trace
+	output[..., scales >= npts-scales, :] = 0.
+
+	return output 
+
+
+def rolling_moments(data, windows=100, statistics=('kurtosis',), min_periods=None, chunk=2**16):
+	"""
+	Calculates rolling skewness and/or kurtosis along samples, for 
+	several windows and traces at once, from cumulative sums of the 
+	first four powers of the data.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- windows: int or vector (default 100, optional).
+		- statistics: tuple (default ('kurtosis',), optional).
+		- min_periods: int (default the window, optional).
+		- chunk: int (default 2**16, optional).
+	:param: 
+		- data, e.g. characteristic functions (trace, samples).
+		- windows: number(s) of samples of the windows, ending at 
+			each sample.
+		- statistics: 'skewness' and/or 'kurtosis'.
+		- min_periods: number of samples below which the output is 
+			NaN (first samples).
+		- chunk: number of values processed at once (whole traces).
+	_______
+	:rtype: tuple of NumPy:class:`~numpy.ndarray` (..., [windows,] 
+		samples).
+	:return: each statistic, as pandas rolling skew and kurt 
+		(unbiased estimators, excess kurtosis).
+	_________
+	.. note::
+
+		The sums restart every window, around the mean of the block 
+		of samples: a window sum has the precision of the samples 
+		of its two blocks, not of the whole trace, and small 
+		variations over a large offset are not lost. The sums of 
+		the first block are moved to the mean of the second one 
+		(binomial expansion). Windows whose variance is below the 
+		rounding of the sums are NaN.
+
+	"""
+
+	scalar = np.ndim(windows) == 0
+	windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+	data = np.asarray(data, dtype=np.float)
+	shape, npts = data.shape[:-1], data.shape[-1]
+	data = data.reshape(-1, npts)
+	eps = np.finfo(np.float).eps
+	for statistic in statistics:
+		if statistic not in ('kurtosis', 'skewness'):
+			raise ValueError('unknown rolling statistic: %s' % statistic)
+
+	outputs = [np.empty((len(data), len(windows), npts)) for statistic in statistics]
+	size = max(1, chunk//(npts+1))
+	for r in range(0, len(data), size):
+		rows = data[r:r+size]
+
+		for w, window in enumerate(windows):
+
+			# one padding sample before the data, blocks of a window
+			nblock = npts//window + 1
+			padded = np.empty((len(rows), nblock*window))
+			padded[:, 1:npts+1] = rows
+			padded[:, 0] = rows[:, 0]
+			padded[:, npts+1:] = rows[:, -1:]
+			padded = padded.reshape(len(rows), nblock, window)
+			shifts = padded.mean(axis=-1)
+			centred = padded - shifts[..., None]
+			centred.reshape(len(rows), -1)[:, 0] = 0.
+			centred.reshape(len(rows), -1)[:, npts+1:] = 0.
+
+			# block-restarted cumulative sums of the powers
+			sums = [None, centred.cumsum(axis=-1)]
+			power = centred.copy()
+			for p in range(2, 5):
+				power *= centred
+				sums.append(power.cumsum(axis=-1))
+			del power, centred, padded
+
+			# sums of the windows ending at each sample: the end of 
+			# the previous block, moved to the mean of the block, 
+			# and the start of the block
+			h0 = np.arange(window-1, -1, -1, dtype=np.float)
+			h1, h2, h3, h4 = [sums[p][:, :-1, -1:] - sums[p][:, :-1, :] for p in range(1, 5)]
+			delta = (shifts[:, :-1] - shifts[:, 1:])[..., None]
+			window_sums = [None] + [sums[p].copy() for p in range(1, 5)]
+			window_sums[1][:, 1:] += h1 + delta*h0
+			window_sums[2][:, 1:] += h2 + delta*(2*h1 + delta*h0)
+			window_sums[3][:, 1:] += h3 + delta*(3*h2 + delta*(3*h1 + delta*h0))
+			window_sums[4][:, 1:] += h4 + delta*(4*h3 + delta*(6*h2 + delta*(4*h1 + delta*h0)))
+			window_sums = [None] + [s.reshape(len(rows), -1)[:, 1:npts+1] for s in window_sums[1:]]
+
+			# rounding of the sums of squares
+			rounding = sums[2].copy()
+			rounding[:, 1:] += sums[2][:, :-1, -1:]
+			rounding = rounding.reshape(len(rows), -1)[:, 1:npts+1]
+			del sums, h1, h2, h3, h4
+
+			# central moments
+			n = np.minimum(np.arange(1, npts+1), window).astype(np.float)
+			inverse = 1./n
+			a = window_sums[1]*inverse
+			a2 = a*a
+			b = window_sums[2]*inverse
+			b -= a2
+			c = window_sums[3]*inverse
+			c -= a*(3*b + a2)
+			d = window_sums[4]*inverse
+			d -= a*(4*c + a*(6*b + a2))
+			flat = b*n <= 4*eps*rounding
+
+			with np.errstate(divide='ignore', invalid='ignore'):
+				for output, statistic in zip(outputs, statistics):
+					if statistic == 'kurtosis':
+						value = d/(b*b)
+						value *= (n*n-1)/((n-2)*(n-3))
+						value -= 3*(n-1)**2/((n-2)*(n-3))
+						value[flat | (n < 4)] = np.nan
+					else:
+						value = c/(b*np.sqrt(b))
+						value *= np.sqrt(n*(n-1))/(n-2)
+						value[flat | (n < 3)] = np.nan
+					value[:, :(window if min_periods is None else min_periods)-1] = np.nan
+					output[r:r+len(rows), w] = value
+
+	outputs = [output.reshape(shape + (len(windows), npts)) for output in outputs]
+	if scalar:
+		outputs = [output[..., 0, :] for output in outputs]
+
+	return tuple(outputs)
+
+
+def rolling_kurtosis(data, windows=100, min_periods=None):
+	"""
+	Returns the rolling kurtosis of `~trigger.rolling_moments`.
+	"""
+
+	return rolling_moments(data, windows, ('kurtosis',), min_periods)[0]
+
+
+def rolling_skewness(data, windows=100, min_periods=None):
+	"""
+	Returns the rolling skewness of `~trigger.rolling_moments`.
+	"""
+
+	return rolling_moments(data, windows, ('skewness',), min_periods)[0]
+
+
+def robust_operation(operation):
+	"""
+	Returns the quantile of a rolling robust operation of 
+	`~trigger.recursive` (median, medianabs, mad or percentileXX), 
+	None for the other operations.
+	______
+	:type: string.
+	:param: type of operation.
+	_______
+	:rtype: float or None.
+	:return: quantile (between 0 and 1).
+	"""
+
+	match = re.match(r'^(median|mad|percentile([0-9.]+))(abs)?$', operation)
+	if match is None:
+		return None
+	if match.group(2) is None:
+		return .5
+
+	return float(match.group(2))/100.
+
+
+class WindowOrder(object):
+
+	"""
+	Order statistics of any windows of a vector (wavelet matrix).
+
+	In practice, it sets an instance of WindowOrder that replaces 
+	the values by their ranks and stores, for each bit of the ranks 
+	(from the highest), the ranks stably partitioned by the bit and 
+	the number of zero bits before each position. The k-th smallest 
+	value of a window is then found with one step per bit, for all 
+	the windows at once.
+	______
+	:type: NumPy:class:`~numpy.ndarray` vector.
+	:param: values, e.g. samples of a trace.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.WindowOrder.values`: sorted values.
+		- `~trigger.WindowOrder.kth`: returns the k-th smallest 
+			values of windows.
+	_________
+	.. note::
+
+		Built in O(n log(n)), queried in O(log(n)) per window, 
+		with n the number of values.
+
+	"""
+
+	def __init__(self, values):
+
+		order = np.argsort(values, kind='mergesort')
+		self.values = values[order]
+		ranks = np.empty(len(values), dtype=np.intp)
+		ranks[order] = np.arange(len(values))
+
+		self.bits = max(1, int(len(values)-1).bit_length())
+		self.index = np.int32 if len(values) < 2**31 else np.intp
+		self.zeros = []
+		self.nzeros = []
+		for bit in range(self.bits-1, -1, -1):
+			ones = (ranks >> bit) & 1 == 1
+			zeros = np.zeros(len(values)+1, dtype=self.index)
+			np.cumsum(~ones, out=zeros[1:])
+			self.zeros.append(zeros)
+			self.nzeros.append(zeros[-1])
+			ranks = np.concatenate((ranks[~ones], ranks[ones]))
+
+	def kth(self, first, end, k):
+		"""
+		Returns the k-th smallest values (from 0) of the windows 
+		from first to end (excluded) of the vector given at 
+		construction (NumPy:class:`~numpy.ndarray` vectors of int, 
+		with 0 <= k < end-first).
+		"""
+
+		first, end, k = np.broadcast_arrays(first, end, k)
+		first, end, k = first.astype(self.index), end.astype(self.index), k.astype(self.index)
+		rank = np.zeros(first.shape, dtype=self.index)
+		for bit, zeros, nzeros in zip(range(self.bits-1, -1, -1), self.zeros, self.nzeros):
+			zfirst, zend = zeros.take(first), zeros.take(end)
+			count = zend - zfirst
+			one = k >= count
+			first = np.where(one, nzeros + first - zfirst, zfirst)
+			end = np.where(one, nzeros + end - zend, zend)
+			k = k - one*count
+			rank |= one.astype(self.index) << bit
+
+		return self.values[rank]
+
+
+def rolling_mad(data, window, chunk=2**16):
+	"""
+	Calculates the rolling median absolute deviation along samples: 
+	the median of the absolute deviations of each window from the 
+	median of the same window.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- int
+		- chunk: int (default 2**16, optional).
+	:param: 
+		- data, e.g. pre-processed traces.
+		- number of samples of the windows, ending at each sample.
+		- chunk: number of output samples processed at once.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., samples).
+	:return: median absolute deviations, in the floating point type 
+		of data (double precision for integers), equal to 
+		`~numpy.median` of each window.
+	_________
+	.. note::
+
+		Each window is kept sorted by a `~trigger.WindowOrder` of 
+		its chunk. Its median is read from it, and the deviations 
+		below and above the median are two sorted sequences of the 
+		window: their middle value is found by bisection, one 
+		`~trigger.WindowOrder.kth` per step, in O(log(n) 
+		log(window)) per sample for all samples at once. The 
+		windows of the first samples (below window) are truncated.
+
+	"""
+
+	dtype = np.result_type(data, np.float32)
+	npts = data.shape[-1]
+	rows = np.asarray(data, dtype=dtype).reshape(-1, npts)
+	output = np.empty(rows.shape, dtype=dtype)
+
+	for row, mad in zip(rows, output):
+		for a in range(0, npts, chunk):
+			b = min(npts, a+chunk)
+			start = max(0, a-window+1)
+			order = WindowOrder(row[start:b])
+
+			# windows of the chunk samples, in the chunk
+			end = np.arange(a, b) + 1 - start
+			first = np.maximum(0, end-window)
+			n = end - first
+			low, high = (n-1)//2, n//2
+			median = (order.kth(first, end, low) + order.kth(first, end, high))/dtype.type(2)
+
+			# deviations: below the median, left[i] = median - 
+			# sorted[high-1-i] (high values), above, right[j] = 
+			# sorted[high+j] - median (n-high values), both increasing
+			def left(i):
+				return np.where(i < high, median - order.kth(first, end, np.clip(high-1-i, 0, n-1)), np.inf)
+			def right(j):
+				return np.where(j < n-high, order.kth(first, end, np.clip(high+j, 0, n-1)) - median, np.inf)
+
+			# the low+1 smallest deviations: i values from left, 
+			# with left[i-1] <= right[low-i+1] and right[low-i] <= 
+			# left[i], by bisection
+			lo, hi = np.maximum(0, low+1-(n-high)), np.minimum(low+1, high)
+			while np.any(lo < hi):
+				i = (lo+hi)//2
+				active = lo < hi
+				more = active & (left(i) < right(low-i))
+				lo, hi = np.where(more, i+1, lo), np.where(active & ~more, i, hi)
+			i, j = lo, low+1-lo
+			deviation = np.maximum(np.where(i > 0, left(np.maximum(i-1, 0)), -np.inf), np.where(j > 0, right(np.maximum(j-1, 0)), -np.inf))
+			# and the next one for even windows
+			following = deviation
+			even = n % 2 == 0
+			if np.any(even):
+				following = np.where(even, np.minimum(left(i), right(j)), deviation)
+			mad[a:b] = (deviation + following)/dtype.type(2)
+
+	return output.reshape(data.shape)
+
+
+def spike_mask(dt, window=None):
+	"""
+	Returns the samples kept by the de-spiking of 
+	`~trigger.recursive`, given their absolute differences with the 
+	previous samples.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- window: int (optional).
+	:param: 
+		- absolute differences of e.g. seismograms (0 for the first
+			sample).
+		- window: number of samples of rolling windows (the whole 
+			traces by default).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` of bool (..., samples).
+	:return: False for spikes.
+	_________
+	.. note::
+
+		Over whole traces, spikes are the differences above their 
+		median plus twice their standard deviation. Over rolling 
+		windows (ending at each sample, truncated for the first 
+		samples), the standard deviation is replaced by the 
+		interquartile range over 1.349 (the same for normal 
+		noise), so that a glitch skews neither the median nor the 
+		spread of its window. The quartiles are rolling quantiles, 
+		in O(n log(window)). Flat windows keep their samples.
+
+	"""
+
+	if window is None:
+		return dt < (np.median(dt, axis=-1)+2.*np.std(dt, axis=-1))[..., None]
+
+	rows = DataFrame(dt.reshape(-1, dt.shape[-1]).T).rolling(window, min_periods=1)
+	median = rows.median().values.T
+	spread = (rows.quantile(.75).values - rows.quantile(.25).values).T/1.349
+	threshold = (median + 2.*spread).reshape(dt.shape)
+
+	return dt <= threshold
+
+
+def multiscale_quantiles(data, scales, operation='median', nmax=None, overlap=0, npts=None):
+	"""
+	Calculates the rolling robust operations of `~trigger.recursive` 
+	(median, medianabs, mad and percentileXX) for all scales.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		- scales: vector.
+		- operation: string (optional).
+		- nmax: int (optional).
+		- overlap: int (optional).
+		- npts: int (optional).
+	:param: 
+		- pre-processed data (e.g. from 
+			`~trigger.recursive_preprocessing`).
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- nmax: number of samples of the output (padded with tiny 
+			values beyond the data).
+		- overlap: number of first samples of data only used as 
+			past of the output samples, 0 if data start with the 
+			trace, else at least the largest scale.
+		- npts: number of samples of the whole trace (default, the 
+			number of samples of data after overlap).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., scales, nmax).
+	:return: multi-scale time series, in the floating point type 
+		of data (double precision for integers).
+	_________
+	.. note::
+
+		The windows are sorted with the skip lists of pandas 
+		rolling windows, in O(n log(scale)) per scale. The windows 
+		of the first samples (below scale) are truncated. 
+
+		The median absolute deviation of each window is given by 
+		`~trigger.rolling_mad`, in O(n log(n) log(scale)) per 
+		scale.
+
+		Scales too wide for the trace are left to zero.
+
+	"""
+
+	quantile = robust_operation(operation)
+	scales = np.asarray(scales, dtype=np.int64)
+	n = max(0, data.shape[-1] - overlap)
+	if npts is None:
+		npts = n
+	if nmax is None:
+		nmax = n
+	dtype = np.result_type(data, np.float32)
+	dtiny = np.finfo(dtype).tiny
+
+	data = np.nan_to_num(data)
+	if operation.endswith('abs'):
+		data = np.abs(data)
+
+	output = np.empty(data.shape[:-1] + (nmax,), dtype=dtype)
+	# Nothing to sort past the end of the data (e.g. chunks beyond 
+	# a shorter trace)
+	for k, s in enumerate(scales if n > 0 else []):
+		if operation.startswith('mad'):
+			output[..., k, :n] = rolling_mad(data[..., k, :], s)[..., overlap:]
+			continue
+		# one column per trace
+		columns = DataFrame(data[..., k, :].reshape(-1, data.shape[-1]).T)
+		if quantile == .5:
+			columns = columns.rolling(s, min_periods=1).median()
+		else:
+			columns = columns.rolling(s, min_periods=1).quantile(quantile)
+		output[..., k, :n] = columns.values[overlap:].T.reshape(data.shape[:-2] + (n,))
+
+	# Avoid division by zero by setting zero values to tiny float
+	output[..., n:] = dtiny
+	output[output < dtiny] = dtiny 
+
+	# Scales too wide for the trace
+	output[..., scales >= npts-scales, :] = 0.
+
+	return output 
+
+
+def multiscale_pyramid(data, scales, operation='rms', nmax=None, samples=32):
+	"""
+	Calculates the rolling operations of `~trigger.recursive` with 
+	large scales evaluated on progressively decimated data.
+
+	Each scale of at least twice samples samples is evaluated on 
+	its data decimated by the largest power of two d dividing the 
+	scale that leaves at least samples samples per window. The 
+	decimated copies of all scales are built level by level, each 
+	halving the previous one: for sums, averages and rms, level d 
+	holds the sums of blocks of d samples (pairs of blocks of the 
+	previous level), so that the windows are exact at the block 
+	ends; for medians, level d holds the medians of the blocks of d 
+	samples (the remedian, an approximation). The results at block 
+	ends are linearly interpolated to all samples.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., scales, samples).
+		- scales: vector.
+		- operation: string (optional).
+		- nmax: int (optional).
+		- samples: int (optional).
+	:param: 
+		- pre-processed data (e.g. from 
+			`~trigger.recursive_preprocessing`).
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- nmax: number of samples of the output (padded with tiny 
+			values beyond the data).
+		- samples: minimum number of decimated samples per window.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., scales, nmax).
+	:return: multi-scale time series, in the floating point type 
+		of data (double precision for integers).
+	_________
+	.. note::
+
+		The window statistics of a scale cost O(n/d) (O(n/d log(s/d))
+		for medians) instead of O(n) (O(n log s)), plus O(n) for 
+		all the levels of the pyramid (O(n) per level for 
+		medians) and the interpolation. Scales with no power of two 
+		divisor leaving samples samples per window (e.g. odd 
+		scales) and the first samples (below scale) are given at 
+		full rate, as by `~trigger.multiscale_sums` or 
+		`~trigger.multiscale_quantiles`. Percentiles (biased by 
+		the percentiles of blocks) and the median absolute 
+		deviation are not decimated.
+
+	"""
+
+	scales = np.asarray(scales, dtype=np.int64)
+	npts = data.shape[-1]
+	if nmax is None:
+		nmax = npts
+	quantile = robust_operation(operation)
+	if quantile is None:
+		multiscale = multiscale_sums
+	else:
+		multiscale = multiscale_quantiles
+
+	decimation = np.ones(len(scales), dtype=np.int64)
+	for k, s in enumerate(scales):
+		d = 1
+		while s % (2*d) == 0 and s//(2*d) >= samples :
+			d *= 2
+		if s >= npts-s or npts//d <= s//d or quantile not in (None, .5) or operation.startswith('mad'):
+			# too wide or too short for the trace, or no remedian
+			d = 1
+		decimation[k] = d
+
+	# scales at full rate
+	full = np.flatnonzero(decimation == 1)
+	output = multiscale(data[..., full, :], scales[full], operation, nmax)
+	if len(full) == len(scales):
+		return output
+	output = np.concatenate((output, np.zeros(output.shape[:-2] + (len(scales)-len(full), nmax), dtype=output.dtype)), axis=-2)
+	output[..., full, :] = output[..., :len(full), :].copy()
+	dtiny = np.finfo(output.dtype).tiny
+
+	# the decimated scales, level by level
+	rows = np.flatnonzero(decimation > 1)
+	level = np.nan_to_num(data[..., rows, :])
+	if operation in ('rms', 'sumsquare', 'd-sumsquare'):
+		level = level**2
+	elif operation.endswith('abs'):
+		level = np.abs(level)
+	full_rate = level
+	d = 1
+	while rows.size:
+		d *= 2
+		nb = npts//d
+		if quantile is None:
+			# sums of pairs of blocks of the previous level
+			level = level[..., 0:2*nb:2] + level[..., 1:2*nb:2]
+		else:
+			# medians of blocks of the full rate data
+			level = np.median(full_rate[..., :nb*d].reshape(full_rate.shape[:-1] + (nb, d)), axis=-1)
+
+		for r in np.flatnonzero(decimation[rows] == d):
+			k = rows[r]
+			s = scales[k]
+			m = s//d
+			values = level[..., r, :]
+			if quantile is None:
+				csum = np.zeros(values.shape[:-1] + (nb+1,))
+				csum[..., 1:] = np.cumsum(values, axis=-1)
+				coarse = csum[..., m:] - csum[..., :-m]
+				if operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
+					coarse /= s
+			else:
+				coarse = DataFrame(values.reshape(-1, nb).T).rolling(m).median()
+				coarse = coarse.values.T[:, m-1:].reshape(values.shape[:-1] + (nb-m+1,))
+
+			# first samples at full rate
+			head = min(npts, s+2)
+			output[..., k, :head] = multiscale(data[..., k:k+1, :head], scales[k:k+1], operation, head, npts=npts)[..., 0, :]
+
+			# block ends, to all samples
+			ends = (np.arange(m, nb+1))*d - 1
+			for row, values in zip(output[..., k, :].reshape(-1, nmax), coarse.reshape(-1, nb-m+1)):
+				row[head:npts] = np.interp(np.arange(head, npts), ends, values)
+
+			output[..., k, head:npts][output[..., k, head:npts] < dtiny] = dtiny
+			if operation == 'rms':
+				output[..., k, head:npts] **= .5
+			output[..., k, npts:] = dtiny
+
+		# deeper levels for the next scales only
+		deeper = decimation[rows] > d
+		rows, level = rows[deeper], level[..., deeper, :]
+		full_rate = full_rate[..., deeper, :]
+
+	return output
+
+
+def correlationcoef(a, b, scales=None, maxscale=None, npts=None):
+	"""
+	Calculate moving cross-correlation coefficients by 
+	creating series of operations of different subsets of 
+	the full data set.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- scales: vector (optional).
+		- maxscale: int (optional).
+		- npts: int (optional).
+	:param: 
+		- data of e.g. seismograms (one or several time series).
+		- data of e.g. seismograms, broadcast against the first 
+			(e.g. (channel, station, samples) against (station, 
+			samples)).
+		- scales: scale(s) of cross-correlation (in samples).
+		- maxscale: maximum allowed scale (in samples).
+		- npts: number of samples of the whole data, if a and b 
+			are a chunk (for the default scales).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray`
+	:return: array of moving cross-correlation coefficients, in the 
+		floating point type of the data, for all pairs of time 
+		series at once.
+	_________
+	.. note::
+
+		The signal windows considered for calculation are truncated 
+		for sample indexes below time scale.
+
+	"""
+
+	na = a.shape[-1]
+	if npts is not None:
+		na = npts
+	if maxscale is None:
+		maxscale = na
+
+	if scales is None:
+		scales = [2**i for i in range(4,999) if ((2**i <= (maxscale)) and (2**i <= (na - 2**i)))]
+	
+	scales = np.require(scales, dtype=np.int) 
+	scales = np.asarray(scales)
+	nscale = len(scales)
+	if nscale == 0 : 
+		scales = [max([4, maxscale/10.])]
+		nscale = 1
+
+	# single precision data are summed in double precision
+	cc = np.ones(np.broadcast(a, b).shape, dtype=np.result_type(a, b, np.float32))
+	prod_cumsum = np.cumsum( a * b , axis=-1, dtype=np.float)
+	a_squarecumsum = np.cumsum( a**2 , axis=-1, dtype=np.float)
+	b_squarecumsum = np.cumsum( b**2 , axis=-1, dtype=np.float)
+
+	dtiny = np.finfo(0.0).tiny
+	b_squarecumsum[b_squarecumsum < dtiny] = dtiny
+	a_squarecumsum[a_squarecumsum < dtiny] = dtiny
+
+	def coefficients(p, q):
+		# moving sums over (q, p], in place of temporaries
+		scaled_prod_cumsum = prod_cumsum[..., p] - prod_cumsum[..., q]
+		scaled_squarecumsum = (a_squarecumsum[..., p] - a_squarecumsum[..., q]) * (b_squarecumsum[..., p] - b_squarecumsum[..., q])
+		np.sqrt(scaled_squarecumsum, out=scaled_squarecumsum)
+		scaled_prod_cumsum /= scaled_squarecumsum
+		return scaled_prod_cumsum
+
+	for s in scales :
+
+		cc[..., s:] *= coefficients(slice(s, None), slice(None, -s))
+
+		# pading with modified def
+		cc[..., 1:s] *= coefficients(slice(1, s), slice(0, 1))
+
+	return cc #**(1./nscale)
+
+
+def stream_processor_plot(stream, cf, cfcolor = 'm', ax = None, label = None, shift = 0, f=None, rescale=None):
+	"""
+	Plots the body-wave characteristic functions resulting of 
 	`~trigger.Ratio.output` and `~trigger.Correlate.output` classes.
 	______
 	:type: 
 		- ObsPy:class:`~obspy.core.stream`.
-		- NumPy:class:`~numpy.ndarray` [channel, samples].
+		- NumPy:class:`~numpy.ndarray` [channel, samples] or 
+			`~trigger.RaggedTraces`.
 		- cfcolor: string (optional).
 		- ax: matplotlib:class:`~matplotlib.axes.Axes` (optional).
 		- label: string (optional).
@@ -431,6 +2244,8 @@ def stream_processor_plot(stream, cf, cfcolor = 'm', ax = None, label = None, sh
 		ax = (plt.figure( figsize=(8, 5) )).gca()
 		(ax.get_figure()).tight_layout()
 
+	if isinstance(cf, RaggedTraces):
+		cf = cf.padded()
 
 	(tmax,nmax) = streamdatadim(stream)
 	labels = ["" for x in range(shift+tmax)]
@@ -603,121 +2418,476 @@ def artificial_stream(npts=1000., noise=1., P=[10., 15., 3.**.5], S=[17., 15., 3
 	Pspot = range(npts/3,npts/2)
 	Sspot = range(npts/2,npts*2/3)
 
-	stats3_z = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
-	stats3_e = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
-	stats3_n = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
-	stats2_z = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
-	stats2_e = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
-	stats2_n = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
-	stats1_z = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
-	stats1_e = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
-	stats1_n = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
-	stats0_z = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
-	stats0_e = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
-	stats0_n = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
+	stats3_z = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
+	stats3_e = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
+	stats3_n = Stats({'network':"Test", 'station':"P", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
+	stats2_z = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
+	stats2_e = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
+	stats2_n = Stats({'network':"Test", 'station':"F", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
+	stats1_z = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
+	stats1_e = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
+	stats1_n = Stats({'network':"Test", 'station':"A", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
+	stats0_z = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"Z", 'npts':npts, 'delta':1/Fs})
+	stats0_e = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"E", 'npts':npts, 'delta':1/Fs})
+	stats0_n = Stats({'network':"Test", 'station':"Ns", 'location':"", 'channel':"N", 'npts':npts, 'delta':1/Fs})
+
+	noise_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, npts)/1000. , 
+		np.random.random_integers(-np.pi*1000, np.pi*1000, npts)/1000. , 
+		np.random.random_integers(-noise*500, noise*500, npts)/1000. ] )
+
+	noise_signal = np.asarray(spherical_to_cartesian(noise_signal))
+
+	# change the noise pol polarization to isotropic to vertical (P) and horizontal (S)
+	pola = np.copy(noise_signal)
+	## onde P
+	common = np.random.random_integers(-50., 50., len(Pspot)+2)/100.
+
+	p_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, len(Pspot))/1000. , 
+		np.random.random_integers(np.pi*1000/1.3, np.pi*1000/0.7, len(Pspot))/1000. , 
+		np.random.random_integers(-noise*500, noise*500, len(Pspot))/1000. ] ) 
+	p_signal = np.asarray(spherical_to_cartesian(p_signal))
+	s_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, len(Sspot))/1000. , 
+		np.random.random_integers(np.pi*1000/2.3, np.pi*1000/1.7, len(Sspot))/1000. , 
+		np.random.random_integers(-noise*500, noise*500, len(Sspot))/1000. ] )
+	s_signal = np.asarray(spherical_to_cartesian(s_signal))
+
+	pola[0][Pspot] += p_signal[2]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	pola[1][Pspot] += p_signal[1]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	pola[2][Pspot] += p_signal[0]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	## onde S
+	pola[0][Sspot] += s_signal[2]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+	pola[1][Sspot] += s_signal[1]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+	pola[2][Sspot] += s_signal[0]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+
+	# roughly change amplitudes at P and S wave amplitudes
+	ampl = np.copy(noise_signal)
+
+	ampl[0][Pspot] += ampl[0][Pspot] * P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	ampl[0][Pspot] /= np.max(np.abs( ampl[0][Pspot] )) 
+	ampl[0][Pspot] *= P[0]/2.
+	ampl[1][Pspot] += ampl[1][Pspot] * P[0]*1./P[2] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	ampl[1][Pspot] /= np.max(np.abs( ampl[1][Pspot] )) 
+	ampl[1][Pspot] *= P[0]*1/P[2]/2.
+	ampl[2][Pspot] += ampl[2][Pspot] * P[0]*1./P[2] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
+	ampl[2][Pspot] /= np.max(np.abs( ampl[2][Pspot] )) 
+	ampl[2][Pspot] *= P[0]*1/P[2]/2.
+
+	ampl[0][Sspot] += ampl[0][Sspot] * S[0]*1./S[2]  * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+	ampl[0][Sspot] /= np.max(np.abs( ampl[0][Sspot]  )) 
+	ampl[0][Sspot] *= S[0]*1/S[2]/2.
+	ampl[1][Sspot] += ampl[1][Sspot] * S[0]   * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+	ampl[1][Sspot] /= np.max(np.abs( ampl[1][Sspot]  )) 
+	ampl[1][Sspot] *= S[0]/2.
+	ampl[2][Sspot] += ampl[2][Sspot] * S[0]   * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+	ampl[2][Sspot] /= np.max(np.abs( ampl[2][Sspot]  )) 
+	ampl[2][Sspot] *= S[0]/2.
+
+
+	# roughly remap frequencies at P and S wave frequencies
+	freq = np.copy(noise_signal)
+	freq[0][Pspot] += P[0] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
+	freq[0][Pspot] /= np.max(np.abs( freq[0][Pspot] )) 
+	freq[0][Pspot] *= noise/2.
+	freq[1][Pspot] += P[0]*1./P[2] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
+	freq[1][Pspot] /= np.max(np.abs( freq[1][Pspot] )) 
+	freq[1][Pspot] *= noise/2.
+	freq[2][Pspot] += P[0]*1/P[2] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
+	freq[2][Pspot] /= np.max(np.abs( freq[2][Pspot] )) 
+	freq[2][Pspot] *= noise/2.
+
+	freq[0][Sspot] += S[0]*1./S[2] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
+	freq[0][Sspot] /= np.max(np.abs( freq[0][Sspot] )) 
+	freq[0][Sspot] *= noise/2.
+	freq[1][Sspot] += S[0] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
+	freq[1][Sspot] /= np.max(np.abs( freq[1][Sspot] )) 
+	freq[1][Sspot] *= noise/2.
+	freq[2][Sspot] += S[0] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
+	freq[2][Sspot] /= np.max(np.abs( freq[2][Sspot] )) 
+	freq[2][Sspot] *= noise/2.
+
+	a = Stream(traces=[Trace(data=noise_signal[0], header=stats0_z), \
+						Trace(data=freq[0], header=stats2_z), \
+						Trace(data=ampl[0], header=stats1_z), \
+						Trace(data=ampl[1], header=stats1_e), \
+						Trace(data=ampl[2], header=stats1_n), \
+						Trace(data=pola[0], header=stats3_z), \
+						Trace(data=pola[1], header=stats3_e), \
+						Trace(data=pola[2], header=stats3_n)])
+
+	return a
+
+
+class ShortLongTerms(object):
+
+	"""
+	Produces an estimation/proxy of the probability of seismic 
+	body-wave arrival in continuous seismic records.
+
+	In practice, it sets an instance of ShortLongTerms that can be 
+	used to form a matrix in which the data-stream of cell [0, c, n] 
+	has to be compared with cells [1, c, n]. For the data of a given 
+	channel (c) there are n pairs of time-series to compare. 
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`.
+		- scale: list (multi-scaling by default, optional).
+		- statistic: string (default 'averageabs', optional).
+		- maxscale: int (default 'None', optional).
+		- dtype: NumPy:class:`~numpy.dtype` (default np.float, optional).
+		- ragged: bool (default False, optional).
+		- workers: int (default 'None', optional).
+		- pyramid: int (default 'None', optional).
+		- scratch: string (default 'None', optional).
+	:param: 
+		- data of e.g. seismograms.
+		- scales: or length of the window used for pre-processing with
+			`~trigger.recursive`.
+		- statistic: operation parameter in pre-processing with
+			`~trigger.recursive`.
+		- maxscale: maximum scale the window used for pre-processing 
+			with `~trigger.recursive`.
+		- dtype: data type of the output (e.g. np.float32).
+		- ragged: output lists of `~trigger.RaggedTraces` instead 
+			of arrays padded to the longest trace.
+		- workers: number of processes used by `~trigger.recursive`.
+		- pyramid: decimation of large scales in 
+			`~trigger.recursive` (full rate by default, not chunk
+			by chunk).
+		- scratch: directory of the files mapping the outputs 
+			(see `~trigger.scratch_array`, in memory by default).
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.ShortLongTerms.output`: returns the results.
+		- `~trigger.ShortLongTerms.chunks`: yields the results block by 
+			block (see `~trigger.recursive_chunks`).
+		- `~trigger.ShortLongTerms.windows`: returns the number of enhancements 
+			and the window lengths of the output, without the data.
+		- `~trigger.ShortLongTerms.plot`: displays the output with 
+			`~trigger.stream_multiplexor_plot`.
+		- `~trigger.ShortLongTerms.correlate`: uses the 
+			`~trigger.Correlate` class to compare data-streams.
+		- `~trigger.ShortLongTerms.ratio`: uses the 
+			`~trigger.Ratio` class to compare data-streams.
+	___________
+	.. rubric:: Example
+
+		Plot the data-streams:
+		>>> import trigger
+		>>> cf = trigger.ShortLongTerms(trigger.artificial_stream(npts=5000), statistic='rms')
+		>>> cf.plot()
+		
+		Plot the characteristic function:
+		>>> cf.correlate.plot()
+
+	"""
+
+	def __init__(self, data, preprocessor='averageabs', scales=None, maxscale=None, dtype=np.float, ragged=False, workers=None, pyramid=None, scratch=None): 
+
+		# stores input parameters
+		self.preprocessor = preprocessor
+		self.scales = scales
+		self.maxscale = maxscale
+		self.dtype = dtype
+		self.ragged = ragged
+		self.workers = workers
+		self.pyramid = pyramid
+		self.scratch = scratch
+
+		# get (station, scale, sample) array any way (for Trace & Stream inputs)
+		self.data, self.original_data = trace2stream(data)
+
+	def output(self):
+		# Multiplex the pre-processed data	
+
+		# pre_processed: array of pre-processed data
+		# preprocessor: sum|average|rms
+		# scales: list
+		self.pre_processed, self.scales = cached_recursive(self.original_data, self.scales, self.preprocessor, self.maxscale, self.dtype, self.ragged, self.workers, self.pyramid, self.scratch) 
+
+		return self.multiplex(self.pre_processed)
+
+	def chunks(self, chunksize=2**16, overlap=0):
+		"""
+		Returns the output chunk by chunk, as given by 
+		`~trigger.recursive_chunks`, preceded by the first and last 
+		samples of each chunk. 
+		"""
+
+		if self.pyramid:
+			raise ValueError('the pyramid mode is not available chunk by chunk')
+
+		for start, stop, pre_processed, self.scales in recursive_chunks(self.data.copy(), self.scales, self.preprocessor, self.maxscale, chunksize, overlap, self.dtype):
+			yield (start, stop) + self.multiplex(pre_processed)
+
+	def windows(self):
+		"""
+		Returns the number of enhancements and the window lengths of 
+		`~trigger.ShortLongTerms.multiplex`, without the data.
+		"""
+
+		if self.scales is None:
+			self.scales = default_scales(streamdatadim(self.data)[1], self.maxscale)
+		small, big = np.asarray(self.pairs(), dtype=np.int64).reshape(-1, 2).T
+		l_windows = np.asarray([ np.asarray(self.scales)[small], np.asarray(self.scales)[big] ], dtype=np.float).reshape(2, -1)
+
+		return len(small), l_windows
+
+	def pairs(self):
+		"""
+		Returns the indexes of the (short, long) scale pairs to 
+		compare.
+		"""
+
+		pairs = []
+		for smallscale_i, smallscale in enumerate(self.scales):
+			for bigscale_i, bigscale in enumerate(self.scales):
+
+				# en fait on peut dire len(STA)*9 = len(LTA) d'apres Withers, M., Aster, R., Young, C., Beiriger, J., Harris, M., Moore, S., & Trujillo, J. (1998). A comparison of select trigger algorithms for automated global seismic phase and event detection. Bulletin of the Seismological Society of America, 88(1), 95–106.
+				if bigscale <= smallscale*10 and bigscale >= smallscale*7:
+					pairs.append((smallscale_i, bigscale_i))
+
+		return pairs
+
+	def multiplex(self, pre_processed):
+
+		# Initialize results at the minimal size: one row per pair
+		small, big = np.asarray(self.pairs(), dtype=np.int64).reshape(-1, 2).T
+		l_windows = np.asarray([ np.asarray(self.scales)[small], np.asarray(self.scales)[big] ], dtype=np.float).reshape(2, -1)
+		dtiny = np.finfo(self.dtype).tiny
+
+		if len(small) == 0:
+			print "scales must around 1 orders apart (from *7 to *10)"
+
+		ragged = isinstance(pre_processed, RaggedTraces)
+		if ragged:
+			channels = [RaggedTraces(pre_processed.lengths, (len(small),), self.dtype, scratch=self.scratch) for c in range(2)]
+		else:
+			(tmax,nmax) = streamdatadim(self.data)
+			channels = scratch_array(( 2, tmax, len(small), pre_processed.shape[-1] ), self.dtype, 1., self.scratch)  
+		for c, rows in enumerate((small, big)):
+			for row_i, row in enumerate(rows):
+				if ragged:
+					channels[c].data[row_i] = pre_processed.data[row]
+				else:
+					channels[c][:, row_i] = pre_processed[:, row]
+
+		# no divide by ~zeros (in the copies: pre_processed may be 
+		# shared by other multiplexors, see `~trigger.cached_recursive`)
+		clipped = [np.in1d(small, big), np.ones(len(big), dtype=bool)]
+		for c in range(2):
+			for row in np.flatnonzero(clipped[c]):
+				values = channels[c].data[row] if ragged else channels[c][:, row]
+				values[values < dtiny] = dtiny
+
+		return channels, len(small), l_windows
+
+	def plot(self):
+		channels, n, l = self.output()
+		return stream_multiplexor_plot( self.data, channels )
+
+
+class LeftRightTerms(object):
+
+	"""
+	Produces an estimation/proxy of the probability of seismic 
+	body-wave arrival in continuous seismic records. 
+
+	In practice, it sets an instance of leftRightTerms that can be 
+	used to form a matrix in which the data-stream in cell [0, c, n] 
+	has to be compared with cells [1, c, n]. For the data of a given 
+	channel (c) there are n pairs of time-series to compare.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`.
+		- scale: list (multi-scaling by default, optional).
+		- statistic: string (default 'averageabs', optional).
+		- maxscale: int (default 'None', optional).
+		- dtype: NumPy:class:`~numpy.dtype` (default np.float, optional).
+		- ragged: bool (default False, optional).
+		- workers: int (default 'None', optional).
+		- pyramid: int (default 'None', optional).
+		- scratch: string (default 'None', optional).
+	:param: 
+		- data of e.g. seismograms.
+		- scales: or length of the window used for pre-processing with
+			`~trigger.recursive`.
+		- statistic: operation parameter in pre-processing with
+			`~trigger.recursive`.
+		- maxscale: maximum scale the window used for pre-processing 
+			with `~trigger.recursive`.
+		- dtype: data type of the output (e.g. np.float32).
+		- ragged: output lists of `~trigger.RaggedTraces` instead 
+			of arrays padded to the longest trace.
+		- workers: number of processes used by `~trigger.recursive`.
+		- pyramid: decimation of large scales in 
+			`~trigger.recursive` (full rate by default, not chunk
+			by chunk).
+		- scratch: directory of the files mapping the outputs 
+			(see `~trigger.scratch_array`, in memory by default).
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.LeftRightTerms.output`: returns the results.
+		- `~trigger.LeftRightTerms.chunks`: yields the results block by 
+			block (see `~trigger.recursive_chunks`).
+		- `~trigger.LeftRightTerms.windows`: returns the number of enhancements 
+			and the window lengths of the output, without the data.
+		- `~trigger.LeftRightTerms.plot`: displays the output with 
+			`~trigger.stream_multiplexor_plot`.
+		- `~trigger.LeftRightTerms.correlate`: uses the 
+			`~trigger.Correlate` class to compare data-streams.
+		- `~trigger.LeftRightTerms.ratio`: uses the 
+			`~trigger.Ratio` class to compare data-streams.
+	___________
+	.. rubric:: Example
+
+		Plot the data-streams:
+		>>> import trigger
+		>>> cf = trigger.LeftRightTerms(trigger.artificial_stream(npts=5000), statistic='rms')
+		>>> cf.plot()
+		
+		Plot the characteristic function:
+		>>> cf.correlate.plot()
+
+	"""
+
+	def __init__(self, data, preprocessor='averageabs', scales=None, maxscale=None, dtype=np.float, ragged=False, workers=None, pyramid=None, scratch=None): 
+
+		# stores input parameters
+		self.preprocessor = preprocessor
+		self.scales = scales
+		self.maxscale = maxscale
+		self.dtype = dtype
+		self.ragged = ragged
+		self.workers = workers
+		self.pyramid = pyramid
+		self.scratch = scratch
+
+		# get (station, scale, sample) array any way (for Trace & Stream inputs)
+		self.data, self.original_data = trace2stream(data)
+
+	def output(self):
+		# Multiplex the pre-processed data	
+
+		# pre_processed: array of pre-processed data
+		# preprocessor: sum|average|rms
+		# scales: list
+		self.pre_processed, self.scales = cached_recursive(self.original_data, self.scales, self.preprocessor, self.maxscale, self.dtype, self.ragged, self.workers, self.pyramid, self.scratch) 
+
+		return self.multiplex(self.pre_processed)
+
+	def chunks(self, chunksize=2**16, overlap=0):
+		"""
+		Returns the output chunk by chunk, as given by 
+		`~trigger.recursive_chunks`, preceded by the first and last 
+		samples of each chunk. 
+		"""
 
-	noise_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, npts)/1000. , 
-		np.random.random_integers(-np.pi*1000, np.pi*1000, npts)/1000. , 
-		np.random.random_integers(-noise*500, noise*500, npts)/1000. ] )
+		if self.pyramid:
+			raise ValueError('the pyramid mode is not available chunk by chunk')
 
-	noise_signal = np.asarray(spherical_to_cartesian(noise_signal))
+		(tmax,nmax) = streamdatadim(self.data)
+		if self.scales is None:
+			self.scales = default_scales(nmax, self.maxscale)
+		# right terms need the next samples
+		smax = max([0]+list(self.scales))
+
+		for start, stop, pre_processed, self.scales in recursive_chunks(self.data.copy(), self.scales, self.preprocessor, self.maxscale, chunksize, overlap+smax, self.dtype):
+			p = max(0, start-overlap-smax)
+			channels, n, l_windows = self.multiplex(pre_processed, p)
+			channels = channels[..., max(0, start-overlap)-p:min(nmax, stop+overlap)-p]
+			yield start, stop, channels, n, l_windows
+
+	def windows(self):
+		"""
+		Returns the number of enhancements and the window lengths of 
+		`~trigger.LeftRightTerms.multiplex`, without the data.
+		"""
+
+		if self.scales is None:
+			self.scales = default_scales(streamdatadim(self.data)[1], self.maxscale)
+		l_windows = np.zeros(( 2, len(self.scales) ))  
+		if len(self.data):
+			l_windows[:] = self.scales
+
+		return len(self.scales), l_windows
+
+	def multiplex(self, pre_processed, offset=0):
+
+		# Initialize results at the minimal size: one row per scale
+		(tmax,nmax) = streamdatadim(self.data)
+		nscale = len(self.scales)
+		ragged = isinstance(pre_processed, RaggedTraces)
+		if ragged:
+			channels = [RaggedTraces(pre_processed.lengths, (nscale,), self.dtype, scratch=self.scratch) for c in range(2)]
+		else:
+			channels = scratch_array(( 2, tmax, nscale, pre_processed.shape[-1] ), self.dtype, 0., self.scratch)  ################################################ todo gen as nan 
+		l_windows = np.zeros(( 2, nscale ))  
+		dtiny = np.finfo(self.dtype).tiny
+		
+		# along stations
+		for station_i, station_data in enumerate(pre_processed):
+			n_enhancements = -1
 
-	# change the noise pol polarization to isotropic to vertical (P) and horizontal (S)
-	pola = np.copy(noise_signal)
-	## onde P
-	common = np.random.random_integers(-50., 50., len(Pspot)+2)/100.
+			npts = (self.data[station_i]).stats.npts
+			samples = offset + np.arange(station_data.shape[-1])
+			if ragged:
+				nmax = npts
 
-	p_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, len(Pspot))/1000. , 
-		np.random.random_integers(np.pi*1000/1.3, np.pi*1000/0.7, len(Pspot))/1000. , 
-		np.random.random_integers(-noise*500, noise*500, len(Pspot))/1000. ] ) 
-	p_signal = np.asarray(spherical_to_cartesian(p_signal))
-	s_signal = np.asarray([ np.random.random_integers(-np.pi*1000, np.pi*1000, len(Sspot))/1000. , 
-		np.random.random_integers(np.pi*1000/2.3, np.pi*1000/1.7, len(Sspot))/1000. , 
-		np.random.random_integers(-noise*500, noise*500, len(Sspot))/1000. ] )
-	s_signal = np.asarray(spherical_to_cartesian(s_signal))
+			# along scales
+			for scale_i, scale_data in enumerate(station_data):
 
-	pola[0][Pspot] += p_signal[2]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	pola[1][Pspot] += p_signal[1]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	pola[2][Pspot] += p_signal[0]* P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	## onde S
-	pola[0][Sspot] += s_signal[2]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
-	pola[1][Sspot] += s_signal[1]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
-	pola[2][Sspot] += s_signal[0]* S[0] * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
+					n_enhancements += 1
+					l_windows[0][n_enhancements] = self.scales[scale_i]
+					l_windows[1][n_enhancements] = self.scales[scale_i]
 
-	# roughly change amplitudes at P and S wave amplitudes
-	ampl = np.copy(noise_signal)
+					channels[1][station_i][n_enhancements] = scale_data
 
-	ampl[0][Pspot] += ampl[0][Pspot] * P[0] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	ampl[0][Pspot] /= np.max(np.abs( ampl[0][Pspot] )) 
-	ampl[0][Pspot] *= P[0]/2.
-	ampl[1][Pspot] += ampl[1][Pspot] * P[0]*1./P[2] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	ampl[1][Pspot] /= np.max(np.abs( ampl[1][Pspot] )) 
-	ampl[1][Pspot] *= P[0]*1/P[2]/2.
-	ampl[2][Pspot] += ampl[2][Pspot] * P[0]*1./P[2] * (npts/6 - np.arange(len(Pspot)))/(npts/6.) 
-	ampl[2][Pspot] /= np.max(np.abs( ampl[2][Pspot] )) 
-	ampl[2][Pspot] *= P[0]*1/P[2]/2.
+					# no divide by ~zeros (in the copy: pre_processed may 
+					# be shared, see `~trigger.cached_recursive`)
+					right = channels[1][station_i][n_enhancements]
+					right[right < dtiny] = dtiny
 
-	ampl[0][Sspot] += ampl[0][Sspot] * S[0]*1./S[2]  * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
-	ampl[0][Sspot] /= np.max(np.abs( ampl[0][Sspot]  )) 
-	ampl[0][Sspot] *= S[0]*1/S[2]/2.
-	ampl[1][Sspot] += ampl[1][Sspot] * S[0]   * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
-	ampl[1][Sspot] /= np.max(np.abs( ampl[1][Sspot]  )) 
-	ampl[1][Sspot] *= S[0]/2.
-	ampl[2][Sspot] += ampl[2][Sspot] * S[0]   * (npts/6 - np.arange(len(Sspot)))/(npts/6.)
-	ampl[2][Sspot] /= np.max(np.abs( ampl[2][Sspot]  )) 
-	ampl[2][Sspot] *= S[0]/2.
+					channels[0][station_i][n_enhancements][:-1*(self.scales[scale_i])] = right[self.scales[scale_i]:]
 
+					channels[0][station_i][n_enhancements][samples >= nmax-self.scales[scale_i]] = np.nan
+					channels[1][station_i][n_enhancements][samples >= npts] = np.nan
 
-	# roughly remap frequencies at P and S wave frequencies
-	freq = np.copy(noise_signal)
-	freq[0][Pspot] += P[0] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
-	freq[0][Pspot] /= np.max(np.abs( freq[0][Pspot] )) 
-	freq[0][Pspot] *= noise/2.
-	freq[1][Pspot] += P[0]*1./P[2] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
-	freq[1][Pspot] /= np.max(np.abs( freq[1][Pspot] )) 
-	freq[1][Pspot] *= noise/2.
-	freq[2][Pspot] += P[0]*1/P[2] * np.sin(2 * np.pi * P[1] * np.arange(len(Pspot)) / Fs)
-	freq[2][Pspot] /= np.max(np.abs( freq[2][Pspot] )) 
-	freq[2][Pspot] *= noise/2.
+					# apod = (np.require( range(self.scales[scale_i]) , dtype=np.float) / np.require(self.scales[scale_i], dtype=np.float))**0.5
+					# channels[0][station_i][scale_i][:self.scales[scale_i]] *= apod
+					# channels[1][station_i][scale_i][:self.scales[scale_i]] *= apod
 
-	freq[0][Sspot] += S[0]*1./S[2] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
-	freq[0][Sspot] /= np.max(np.abs( freq[0][Sspot] )) 
-	freq[0][Sspot] *= noise/2.
-	freq[1][Sspot] += S[0] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
-	freq[1][Sspot] /= np.max(np.abs( freq[1][Sspot] )) 
-	freq[1][Sspot] *= noise/2.
-	freq[2][Sspot] += S[0] * np.sin(2 * np.pi * S[1] * np.arange(len(Sspot)) / Fs)
-	freq[2][Sspot] /= np.max(np.abs( freq[2][Sspot] )) 
-	freq[2][Sspot] *= noise/2.
+					# channels[0][station_i][n_enhancements][ (npts-2*self.scales[scale_i]):(npts-self.scales[scale_i]) ] *= apod[::-1]
+					# channels[1][station_i][n_enhancements][ (npts-self.scales[scale_i]):npts ] *= apod[::-1]
 
-	a = Stream(traces=[Trace(data=noise_signal[0], header=stats0_z), \
-						Trace(data=freq[0], header=stats2_z), \
-						Trace(data=ampl[0], header=stats1_z), \
-						Trace(data=ampl[1], header=stats1_e), \
-						Trace(data=ampl[2], header=stats1_n), \
-						Trace(data=pola[0], header=stats3_z), \
-						Trace(data=pola[1], header=stats3_e), \
-						Trace(data=pola[2], header=stats3_n)])
+		return channels, nscale, l_windows
 
-	return a
+	def plot(self):
+		channels, n, l = self.output() 
+		return stream_multiplexor_plot( self.data, channels )
 
 
-class ShortLongTerms(object):
+class Components(object):
 
 	"""
 	Produces an estimation/proxy of the probability of seismic 
-	body-wave arrival in continuous seismic records.
+	body-wave arrival in continuous seismic records. 
 
-	In practice, it sets an instance of ShortLongTerms that can be 
-	used to form a matrix in which the data-stream of cell [0, c, n] 
-	has to be compared with cells [1, c, n]. For the data of a given 
-	channel (c) there are n pairs of time-series to compare. 
+	In practice, it sets an instance of leftRightTerms that can be 
+	used to form a matrix in which the data-stream in cell [0, c, n] 
+	has to be compared with cells [1, c, n], [2, c, n], etc. For the data
+	of a given channel (c), with Nc component of the same channel, 
+	there are Nc*n pairs of time-series to compare. 
 	______
 	:type: 
 		- ObsPy:class:`~obspy.core.stream`.
 		- scale: list (multi-scaling by default, optional).
 		- statistic: string (default 'averageabs', optional).
 		- maxscale: int (default 'None', optional).
+		- dtype: NumPy:class:`~numpy.dtype` (default np.float, optional).
+		- ragged: bool (default False, optional).
+		- workers: int (default 'None', optional).
+		- pyramid: int (default 'None', optional).
+		- scratch: string (default 'None', optional).
 	:param: 
 		- data of e.g. seismograms.
 		- scales: or length of the window used for pre-processing with
@@ -726,37 +2896,58 @@ class ShortLongTerms(object):
 			`~trigger.recursive`.
 		- maxscale: maximum scale the window used for pre-processing 
 			with `~trigger.recursive`.
+		- dtype: data type of the output (e.g. np.float32).
+		- ragged: output lists of `~trigger.RaggedTraces` instead 
+			of arrays padded to the longest trace.
+		- workers: number of processes used by `~trigger.recursive`.
+		- pyramid: decimation of large scales in 
+			`~trigger.recursive` (full rate by default, not chunk
+			by chunk).
+		- scratch: directory of the files mapping the outputs 
+			(see `~trigger.scratch_array`, in memory by default).
 	___________
 	.. rubric:: _`Default Attributes`
-		- `~trigger.ShortLongTerms.output`: returns the results.
-		- `~trigger.ShortLongTerms.plot`: displays the output with 
+	___________
+	.. rubric:: _`Default Methods`
+		- `~trigger.Component.output`: returns the results.
+		- `~trigger.Components.chunks`: yields the results block by 
+			block (see `~trigger.recursive_chunks`).
+		- `~trigger.Components.windows`: returns the number of 
+			enhancements and the window lengths of the output, without 
+			the data.
+		- `~trigger.Component.plot`: displays the output with 
 			`~trigger.stream_multiplexor_plot`.
-		- `~trigger.ShortLongTerms.correlate`: uses the 
+		- `~trigger.Component.correlate`: uses the 
 			`~trigger.Correlate` class to compare data-streams.
-		- `~trigger.ShortLongTerms.ratio`: uses the 
+		- `~trigger.Component.ratio`: uses the 
 			`~trigger.Ratio` class to compare data-streams.
 	___________
 	.. rubric:: Example
 
 		Plot the data-streams:
 		>>> import trigger
-		>>> cf = trigger.ShortLongTerms(trigger.artificial_stream(npts=5000), statistic='rms')
+		>>> cf = trigger.Component(trigger.artificial_stream(npts=5000), statistic='rms')
 		>>> cf.plot()
-		
+
 		Plot the characteristic function:
 		>>> cf.correlate.plot()
 
 	"""
 
-	def __init__(self, data, preprocessor='averageabs', scales=None, maxscale=None): 
+	def __init__(self, data, preprocessor='rms', scales=None, maxscale=None, dtype=np.float, ragged=False, workers=None, pyramid=None, scratch=None): 
 
 		# stores input parameters
 		self.preprocessor = preprocessor
 		self.scales = scales
 		self.maxscale = maxscale
+		self.dtype = dtype
+		self.ragged = ragged
+		self.workers = workers
+		self.pyramid = pyramid
+		self.scratch = scratch
 
 		# get (station, scale, sample) array any way (for Trace & Stream inputs)
-		self.data, self.original_data = trace2stream(data.copy())
+		self.data, self.original_data = trace2stream(data)
 
 	def output(self):
 		# Multiplex the pre-processed data	
@@ -764,178 +2955,838 @@ class ShortLongTerms(object):
 		# pre_processed: array of pre-processed data
 		# preprocessor: sum|average|rms
 		# scales: list
-		self.pre_processed, self.scales = recursive(self.data, self.scales, self.preprocessor, self.maxscale) 
+		self.pre_processed, self.scales = cached_recursive(self.original_data, self.scales, self.preprocessor, self.maxscale, self.dtype, self.ragged, self.workers, self.pyramid, self.scratch) 
+
+		return self.multiplex(self.pre_processed)
+
+	def chunks(self, chunksize=2**16, overlap=0):
+		"""
+		Returns the output chunk by chunk, as given by 
+		`~trigger.recursive_chunks`, preceded by the first and last 
+		samples of each chunk. 
+		"""
+
+		if self.pyramid:
+			raise ValueError('the pyramid mode is not available chunk by chunk')
+
+		(tmax,nmax) = streamdatadim(self.data)
+		triplets = self.triplets()
+		# components may start before or after
+		margin = max([0]+[abs(di) for ZNE_i, ZNE_di in triplets for di in ZNE_di])
+
+		for start, stop, pre_processed, self.scales in recursive_chunks(self.data.copy(), self.scales, self.preprocessor, self.maxscale, chunksize, overlap+margin, self.dtype):
+			p = max(0, start-overlap-margin)
+			channels, n, l_windows = self.multiplex(pre_processed, p, triplets)
+			channels = channels[..., max(0, start-overlap)-p:min(nmax, stop+overlap)-p]
+			yield start, stop, channels, n, l_windows
+
+	def windows(self):
+		"""
+		Returns the number of enhancements and the window lengths of 
+		`~trigger.Components.multiplex`, without the data.
+		"""
+
+		if self.scales is None:
+			self.scales = default_scales(streamdatadim(self.data)[1], self.maxscale)
+		l_windows = np.zeros(( 3, len(self.scales) ))  
+		ncomponents = max([0]+[len(ZNE_i) for ZNE_i, ZNE_di in self.triplets()])
+		l_windows[:ncomponents] = self.scales
+
+		return len(self.scales)+1, l_windows
+
+	def triplets(self):
+		"""
+		Returns the indexes of the components of each trace and 
+		their time differences (in samples), from a 
+		`~trigger.ComponentIndex`.
+		"""
+
+		index = ComponentIndex(self.data)
 
-		# Initialize results at the minimal size
+		return [index.triplet(t) for t in range(len(self.data))]
+
+	def multiplex(self, pre_processed, offset=0, triplets=None):
+
+		if triplets is None:
+			triplets = self.triplets()
+
+		# Initialize results at the minimal size: one row per scale
 		(tmax,nmax) = streamdatadim(self.data)
 		nscale = len(self.scales)
-		channels = np.ones(( 2, tmax, nscale**2, nmax ))  
-		l_windows = np.zeros(( 2, nscale**2 ))  
-		dtiny = np.finfo(0.0).tiny
+		ragged = isinstance(pre_processed, RaggedTraces)
+		if ragged:
+			channels = [RaggedTraces(pre_processed.lengths, (nscale,), self.dtype, scratch=self.scratch) for c in range(3)]
+		else:
+			channels = scratch_array(( 3, tmax, nscale, pre_processed.shape[-1] ), self.dtype, 0., self.scratch) 
+		l_windows = np.zeros(( 3, nscale ))  
 		
 		# along stations
-		for station_i, station_data in enumerate(self.pre_processed):
-			n_enhancements = -1
-			# along scales
-			for smallscale_i, smallscale_data in enumerate(station_data):
-				for bigscale_i, bigscale_data in enumerate(station_data):
+		for station_i, (ZNE_i, ZNE_di) in enumerate(triplets):
+
+			n = pre_processed[station_i].shape[-1]
+			for i in range(len(ZNE_i)):
+				# channel sample j is sample j+di of the component
+				di = ZNE_di[i]
+				nc = pre_processed[ZNE_i[i]].shape[-1]
+				s = max(offset, -di, offset-di)
+				# nothing past the real end of the component (no ratio 
+				# nor correlation with its padding)
+				e = min(offset+n, self.data[ZNE_i[i]].stats.npts-di, offset+nc-di)
+				s = [s-offset, s+di-offset]
+				e = [max(s[0], e-offset), max(s[1], e+di-offset)]
+						
+				for scale_i in range(nscale):
+					l_windows[i][scale_i] = self.scales[scale_i]
+					channels[i][station_i][scale_i][s[0]:e[0]] = pre_processed[ZNE_i[i]][scale_i][s[1]:e[1]]
+					# channels[i][station_i][scale_i][:s[0]]   = self.pre_processed[ZNE_i[i]][scale_i][s[1]+1]
+					# channels[i][station_i][scale_i][e[0]:]   = self.pre_processed[ZNE_i[i]][scale_i][e[1]-1]
+
+		return channels, nscale+1, l_windows
+
+	def plot(self):
+		channels, n, l = self.output() 
+		return stream_multiplexor_plot( self.data, channels )
 
-					# en fait on peut dire len(STA)*9 = len(LTA) d'apres Withers, M., Aster, R., Young, C., Beiriger, J., Harris, M., Moore, S., & Trujillo, J. (1998). A comparison of select trigger algorithms for automated global seismic phase and event detection. Bulletin of the Seismological Society of America, 88(1), 95–106.
-					if self.scales[bigscale_i] <= self.scales[smallscale_i]*10 and self.scales[bigscale_i] >= self.scales[smallscale_i]*7:
 
-						n_enhancements += 1
-						l_windows[0][n_enhancements] = self.scales[smallscale_i]
-						l_windows[1][n_enhancements] = self.scales[bigscale_i]
+_cfcachefiles = re.compile(r'^cf-[0-9a-f]{40}(\.lengths)?\.npy$')
+cf_cachedir = None
+cf_cachesize = 2**30
+cf_cacheversion = 1
 
-						# no divide by ~zeros
-						bigscale_data[bigscale_data < dtiny] = dtiny
+def cf_cachekey(data, configuration):
+	"""
+	Returns the key of a characteristic function in the cache of 
+	`~trigger.cached_cf`.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream` or NumPy:class:`~numpy.ndarray`.
+		- dict.
+	:param: 
+		- data of e.g. seismograms.
+		- parameters of the characteristic function.
+	_______
+	:rtype: string
+	:return: hexadecimal SHA-1 of the samples, ids, start times, 
+		sampling rates and parameters.
+	"""
 
-						channels[0][station_i][n_enhancements] = smallscale_data
-						channels[1][station_i][n_enhancements] = bigscale_data
+	key = hashlib.sha1()
+	traces = data if isinstance(data, Stream) else [data]
+	for tr in traces:
+		values = np.ascontiguousarray(getattr(tr, 'data', tr))
+		if isinstance(tr, Trace):
+			key.update(repr((tr.id, tr.stats.starttime.timestamp, tr.stats.sampling_rate)).encode())
+		key.update(repr((values.dtype.str, values.shape)).encode())
+		key.update(values.view(np.uint8).ravel())
 
-		if n_enhancements == -1:
-			print "scales must around 1 orders apart (from *7 to *10)"
+	canonical = []
+	for name, value in sorted(configuration.items()):
+		if isinstance(value, np.ndarray):
+			value = value.tolist()
+		elif isinstance(value, type):
+			value = np.dtype(value).str
+		canonical.append((name, value))
+	key.update(repr((cf_cacheversion, canonical)).encode())
 
-		for i in range(n_enhancements+1, nscale**2):
-			channels = np.delete(channels, n_enhancements+1, axis=2)
-			l_windows = np.delete(l_windows, n_enhancements+1, axis=1)
+	return key.hexdigest()
 
-		return channels, n_enhancements+1, l_windows
 
-	def plot(self):
-		channels, n, l = self.output()
-		return stream_multiplexor_plot( self.data, channels )
+def cached_cf(data, configuration, function):
+	"""
+	Returns a characteristic function from the directory 
+	`~trigger.cf_cachedir`, or calculates and stores it. The 
+	least recently used files are deleted beyond 
+	`~trigger.cf_cachesize` bytes.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`.
+		- dict.
+		- function.
+	:param: 
+		- data of e.g. seismograms.
+		- parameters of the characteristic function (everything 
+			that changes its values).
+		- calculation of the characteristic function.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` or `~trigger.RaggedTraces`.
+	:return: characteristic function, mapped to its file on a hit 
+		(copy-on-write).
+	_________
+	.. note::
+
+		Nothing is cached while `~trigger.cf_cachedir` is None (the 
+		default). Keys are given by `~trigger.cf_cachekey`: increase 
+		`~trigger.cf_cacheversion` to invalidate the files of a 
+		previous calculation.
+
+		Files are written under a temporary name and renamed, so 
+		that processes sharing the directory only see complete 
+		files.
+
+	"""
+
+	if cf_cachedir is None:
+		return function()
+
+	path = os.path.join(cf_cachedir, 'cf-%s' % cf_cachekey(data, configuration))
+	try:
+		cf = np.load(path+'.npy', mmap_mode='c')
+		if os.path.exists(path+'.lengths.npy'):
+			cf = RaggedTraces(np.load(path+'.lengths.npy'), data=cf)
+			os.utime(path+'.lengths.npy', None)
+		os.utime(path+'.npy', None)
+		return cf
+	except (IOError, OSError, ValueError):
+		pass
+
+	cf = function()
+
+	if not os.path.isdir(cf_cachedir):
+		os.makedirs(cf_cachedir)
+	def store(values, name):
+		with tempfile.NamedTemporaryFile(dir=cf_cachedir, prefix='.cf-', suffix='.npy', delete=False) as f:
+			np.save(f, values)
+		os.rename(f.name, name)
+	if isinstance(cf, RaggedTraces):
+		store(cf.lengths, path+'.lengths.npy')
+		store(cf.data, path+'.npy')
+	else:
+		store(np.asarray(cf), path+'.npy')
+
+	# least recently used entries beyond the size of the cache (the 
+	# samples before the lengths of ragged ones)
+	entries = {}
+	for name in os.listdir(cf_cachedir):
+		if _cfcachefiles.match(name):
+			try:
+				stat = os.stat(os.path.join(cf_cachedir, name))
+			except OSError:
+				continue
+			mtime, size, names = entries.get(name[:43], (0., 0, []))
+			entries[name[:43]] = (max(mtime, stat.st_mtime), size+stat.st_size, sorted(names+[name], key=len))
+	total = sum(size for mtime, size, names in entries.values())
+	for mtime, size, names in sorted(entries.values()):
+		if total <= cf_cachesize:
+			break
+		for name in names:
+			try:
+				os.remove(os.path.join(cf_cachedir, name))
+			except OSError:
+				pass
+		total -= size
+
+	return cf
+
+
+class Ratio(object):
+	"""
+	Produces a not-to-scale proxy of the probability of seismic 
+	body-wave arrival in continuous seismic records. 
+	
+	In practice, it sets an instance of Ratio that can be used to 
+	apply division between the first and all other time-series of the 
+	same channel given in a multi-scale data-stream.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- data: ObsPy:class:`~obspy.core.stream` (optional).
+		- chunksize: int (optional).
+		- workers: int (optional).
+		- normalize: bool (optional).
+	:param: 
+		- multi-scale data-stream, pre-processed with 
+			`~trigger.ShortLongTerms` or `~trigger.leftRightTerms` or
+			`~trigger.Component`
+		- data of e.g. seismograms. 
+		- chunksize: number of samples processed at once (see 
+			`~trigger.recursive_chunks`, whole traces by default).
+		- workers: number of processes sharing the stations (see 
+			`~trigger.forked_map`).
+		- normalize: returns the geometric mean of the ratios 
+			(root of the product, by the number of enhancements) 
+			instead of their product.
+		- other keyword arguments (e.g. dtype, or scratch for 
+			outputs mapped to files, see `~trigger.scratch_array`) are 
+			given to the multiplexor.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.Ratio.output`: returns the results (from the 
+			cache of `~trigger.cached_cf` if enabled). It sets the 
+			pre_processed_data, enhancement_factor and l_windows 
+			attributes; pre_processed_data is None when the results 
+			come from the cache.
+		- `~trigger.Ratio.plot`: displays the output with 
+			`~trigger.stream_processor_plot`.
+	_________
+	.. note::
+
+		Ratios that are not finite (e.g. by a component beyond its
+		end) are left out of the product, padded or ragged: the 
+		output of the components multiplexor is 1 beyond the end 
+		of a shorter vertical component, not inf.
+	___________
+	.. rubric:: Example
+
+		Get some data-streams:
+		>>> import trigger
+		>>> data = trigger.artificial_stream(npts=5000)
+		>>> data_streams = (trigger.ShortLongTerms(data)).output()
+		
+		Get the operator instance and plot:
+		>>> cf = trigger.Ratio(data_streams, data)
+		>>> cf.plot()
+
+	"""
+	def __init__(self, data, multiplexor = 'shortlongterms', preprocessor = 'averageabs', chunksize=None, workers=None, normalize=False, **kwargs): #, pre_processed_data, data=None):
+
+		self.data = data
+		self.multiplexor = multiplexor
+		self.preprocessor = preprocessor
+		self.chunksize = chunksize
+		self.workers = workers
+		self.normalize = normalize
+		
+		self.kwargs = kwargs
+		self.multiplexors = {}
+		self.buffers = None
+		self.cf = None
+
+	def select(self, multiplexor=None):
+		"""
+		Returns the multiplexor instance (`~trigger.Ratio.multiplexor` 
+		by default), built at first use. The pre-processing is 
+		shared through `~trigger.cached_recursive`.
+		"""
+
+		if multiplexor is None:
+			multiplexor = self.multiplexor
+
+		if multiplexor in ('shortlongterms', 'stlt'):
+			name, multiplexor, kwargs = 'shortlongterms', ShortLongTerms, {'preprocessor': self.preprocessor}
+		elif multiplexor in ('leftrightterms', 'ltrt'):
+			name, multiplexor, kwargs = 'leftrightterms', LeftRightTerms, {'preprocessor': self.preprocessor}
+		elif multiplexor in ('components', 'comp'):
+			name, multiplexor, kwargs = 'components', Components, {}
+
+		if name not in self.multiplexors:
+			kwargs.update(self.kwargs)
+			self.multiplexors[name] = multiplexor(self.data, workers=self.workers, **kwargs)
+
+		return self.multiplexors[name]
+
+	shortlongterms = property(lambda self: self.select('shortlongterms'))
+	leftrightterms = property(lambda self: self.select('leftrightterms'))
+	components = property(lambda self: self.select('components'))
+
+	def output(self):
+
+		configuration = dict((k, v) for k, v in self.kwargs.items() if k != 'scratch')
+		configuration.update(combination='ratio', multiplexor=type(self.select()).__name__, preprocessor=self.preprocessor, normalize=self.normalize)
+		self.pre_processed_data = None
+		cf = cached_cf(self.data, configuration, self.calculate)
+		if self.pre_processed_data is None:
+			# from the cache: no pre-processed data to keep
+			self.enhancement_factor, self.l_windows = self.select().windows()
+
+		return cf
+
+	def calculate(self):
+
+		multiplexor = self.select()
+
+		if self.chunksize is None:
+			return self.combine(multiplexor.output())
+
+		# chunk by chunk, for long data
+		(tmax,nmax) = streamdatadim(multiplexor.data)
+		if multiplexor.ragged:
+			cf = RaggedTraces([tr.stats.npts for tr in multiplexor.data], dtype=multiplexor.dtype, fill=1., scratch=multiplexor.scratch)
+		else:
+			cf = scratch_array(( tmax, nmax ), multiplexor.dtype, 1., multiplexor.scratch)  
+		with ForkedPool(self.stations, self.workers) as pool:
+			if pool.forks:
+				# the chunks go through buffers shared with the pool
+				n, l_windows = multiplexor.windows()
+				self.buffers = (shared_array(( len(l_windows), tmax, l_windows.shape[-1], min(nmax, self.chunksize) ), multiplexor.dtype), 
+					shared_array(( tmax, min(nmax, self.chunksize) ), multiplexor.dtype))
+			for chunk in multiplexor.chunks(self.chunksize):
+				if multiplexor.ragged:
+					cf.assign(chunk[0], self.combine(chunk[2:], pool))
+				else:
+					cf[:, chunk[0]:chunk[1]] = self.combine(chunk[2:], pool)
+		self.buffers = None
+
+		return cf
+
+	def combine(self, pre_processed_data, pool=None):
+		
+		self.pre_processed_data = pre_processed_data[0]
+		self.enhancement_factor = pre_processed_data[1]
+		self.l_windows = pre_processed_data[2]
+
+		scratch = self.kwargs.get('scratch')
+		if pool is not None and pool.forks:
+			# a chunk, in the buffers of the pool
+			n = self.pre_processed_data.shape[-1]
+			self.buffers[0][..., :n] = self.pre_processed_data
+			self.buffers[1][:, :n] = 1.
+			cf = self.buffers[1][:, :n]
+			pool.map([(first, last, n) for first, last in station_batches([n]*len(cf), self.workers)])
+			return cf
+
+		if isinstance(self.pre_processed_data[0], RaggedTraces):
+			cf = RaggedTraces(self.pre_processed_data[0].lengths, dtype=self.pre_processed_data[0].dtype, fill=1., shared=self.workers is not None, scratch=scratch)
+		elif scratch is not None:
+			(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+			cf = scratch_array(( tmax, nmax ), self.pre_processed_data.dtype, 1., scratch)
+		elif self.workers is None:
+			(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+			cf = np.ones(( tmax, nmax ), dtype=self.pre_processed_data.dtype)  
+		else:
+			(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+			cf = shared_array(( tmax, nmax ), self.pre_processed_data.dtype, 1.)
+		self.cf = cf
+
+		# stations are independent
+		ragged = isinstance(cf, RaggedTraces)
+		lengths = cf.lengths if ragged else [cf.shape[-1]]*len(cf)
+		# one station at a time from mapped files
+		size = 1 if scratch is not None else 16
+		forked_map(self.stations, station_batches(lengths, self.workers, size), self.workers)
+		self.cf = None
+
+		# returns product # enhanced and rescaled		
+		return cf
 
+	def stations(self, first, last, n=None):
+		# all stations, enhancements and channels of the batch at 
+		# once, with a product in the log domain (no underflow)
+		if n is None:
+			data, target = station_batch(self.pre_processed_data, self.cf, first, last)
+		else:
+			# n samples of a chunk in the buffers of the pool
+			data, target = station_batch(self.buffers[0][..., :n], self.buffers[1][:, :n], first, last)
+		dtiny = np.finfo(target.dtype).tiny
+
+		product = np.zeros(target.shape)
+		buf = np.array(data[0])
+		for channel_i in range(1,len(data)) :
+			# the first channel is divided by all the next ones
+			buf /= data[channel_i]
+			# no ~zeros
+			buf[buf < dtiny] = dtiny
+			# product enhancement (no nans, no infs)
+			with np.errstate(invalid='ignore'):
+				logs = np.log(buf, dtype=np.float)
+			logs[~np.isfinite(logs)] = 0.
+			product += logs.sum(axis=1)
+
+		# rescaling (geometric mean)
+		if self.normalize:
+			product /= self.enhancement_factor
+
+		target[:] = np.exp(product)
+		target[target < dtiny] = dtiny
 
-class LeftRightTerms(object):
+	def plot(self, **kwargs):
+		return stream_processor_plot( self.data, self.output(), **kwargs)
 
+
+class Correlate(object):
 	"""
-	Produces an estimation/proxy of the probability of seismic 
+	Produces an estimation of the normalized probability of seismic 
 	body-wave arrival in continuous seismic records. 
 
-	In practice, it sets an instance of leftRightTerms that can be 
-	used to form a matrix in which the data-stream in cell [0, c, n] 
-	has to be compared with cells [1, c, n]. For the data of a given 
-	channel (c) there are n pairs of time-series to compare.
+	In practice, it sets an instance of Correlate that can be used to
+	apply correlation between the first and all other time-series of
+	the same channel given in a multi-scale data-streams.
 	______
 	:type: 
-		- ObsPy:class:`~obspy.core.stream`.
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- data: ObsPy:class:`~obspy.core.stream` (optional).
 		- scale: list (multi-scaling by default, optional).
-		- statistic: string (default 'averageabs', optional).
-		- maxscale: int (default 'None', optional).
+		- chunksize: int (optional).
+		- workers: int (optional).
 	:param: 
-		- data of e.g. seismograms.
-		- scales: or length of the window used for pre-processing with
-			`~trigger.recursive`.
-		- statistic: operation parameter in pre-processing with
-			`~trigger.recursive`.
-		- maxscale: maximum scale the window used for pre-processing 
-			with `~trigger.recursive`.
+		- multi-scale data-stream, pre-processed with 
+			`~trigger.ShortLongTerms` or `~trigger.leftRightTerms` or
+			`~trigger.Component`.
+		- data: of e.g. seismograms.
+		- scales: or length of the window used for correlation
+		- chunksize: number of samples processed at once (see 
+			`~trigger.recursive_chunks`, whole traces by default).
+		- workers: number of processes sharing the stations (see 
+			`~trigger.forked_map`).
+		- other keyword arguments (e.g. dtype, or scratch for 
+			outputs mapped to files, see `~trigger.scratch_array`) are 
+			given to the multiplexor.
 	___________
 	.. rubric:: _`Default Attributes`
-		- `~trigger.LeftRightTerms.output`: returns the results.
-		- `~trigger.LeftRightTerms.plot`: displays the output with 
-			`~trigger.stream_multiplexor_plot`.
-		- `~trigger.LeftRightTerms.correlate`: uses the 
-			`~trigger.Correlate` class to compare data-streams.
-		- `~trigger.LeftRightTerms.ratio`: uses the 
-			`~trigger.Ratio` class to compare data-streams.
+		- `~trigger.Correlate.output`: returns the results (from the 
+			cache of `~trigger.cached_cf` if enabled). It sets the 
+			pre_processed_data, enhancement_factor and l_windows 
+			attributes; pre_processed_data is None when the results 
+			come from the cache.
+		- `~trigger.Correlate.plot`: displays the output with 
+			`~trigger.stream_processor_plot`.
 	___________
 	.. rubric:: Example
 
-		Plot the data-streams:
+		Get some data-streams:
 		>>> import trigger
-		>>> cf = trigger.LeftRightTerms(trigger.artificial_stream(npts=5000), statistic='rms')
-		>>> cf.plot()
+		>>> data = trigger.artificial_stream(npts=5000)
+		>>> data_streams = (trigger.ShortLongTerms(data)).output()
 		
-		Plot the characteristic function:
-		>>> cf.correlate.plot()
+		Get the operator instance and plot:
+		>>> cf = trigger.Correlate(data_streams, data, scales=[10])
+		>>> cf.plot()
 
-	"""
+		Idem, activating multi-scaling:
+		>>> mcf = trigger.Correlate(data_streams, data)
+		>>> mcf.plot()
 
-	def __init__(self, data, preprocessor='averageabs', scales=None, maxscale=None): 
+	"""
+	def __init__(self, data, multiplexor = 'components', preprocessor = 'rms', procscales=None, chunksize=None, workers=None, **kwargs): #, pre_processed_data, data=None):
 
-		# stores input parameters
+		self.data = data
+		self.multiplexor = multiplexor
 		self.preprocessor = preprocessor
-		self.scales = scales
-		self.maxscale = maxscale
-
-		# get (station, scale, sample) array any way (for Trace & Stream inputs)
-		self.data, self.original_data = trace2stream(data.copy())
+		self.procscales = procscales
+		self.chunksize = chunksize
+		self.workers = workers
+		
+		self.kwargs = kwargs
+		self.multiplexors = {}
+		self.buffers = None
+		self.cf = None
+
+	def select(self, multiplexor=None):
+		"""
+		Returns the multiplexor instance (`~trigger.Correlate.multiplexor` 
+		by default), built at first use. The pre-processing is 
+		shared through `~trigger.cached_recursive`.
+		"""
+
+		if multiplexor is None:
+			multiplexor = self.multiplexor
+
+		if multiplexor in ('shortlongterms', 'stlt'):
+			name, multiplexor, kwargs = 'shortlongterms', ShortLongTerms, {'preprocessor': self.preprocessor}
+		elif multiplexor in ('leftrightterms', 'ltrt'):
+			name, multiplexor, kwargs = 'leftrightterms', LeftRightTerms, {'preprocessor': self.preprocessor}
+		elif multiplexor in ('components', 'comp'):
+			name, multiplexor, kwargs = 'components', Components, {'preprocessor': self.preprocessor}
+
+		if name not in self.multiplexors:
+			kwargs.update(self.kwargs)
+			self.multiplexors[name] = multiplexor(self.data, workers=self.workers, **kwargs)
+
+		return self.multiplexors[name]
+
+	shortlongterms = property(lambda self: self.select('shortlongterms'))
+	leftrightterms = property(lambda self: self.select('leftrightterms'))
+	components = property(lambda self: self.select('components'))
 
 	def output(self):
-		# Multiplex the pre-processed data	
 
-		# pre_processed: array of pre-processed data
-		# preprocessor: sum|average|rms
-		# scales: list
-		self.pre_processed, self.scales = recursive(self.data, self.scales, self.preprocessor, self.maxscale) 
+		configuration = dict((k, v) for k, v in self.kwargs.items() if k != 'scratch')
+		configuration.update(combination='correlate', multiplexor=type(self.select()).__name__, preprocessor=self.preprocessor, procscales=self.procscales)
+		self.pre_processed_data = None
+		cf = cached_cf(self.data, configuration, self.calculate)
+		if self.pre_processed_data is None:
+			# from the cache: no pre-processed data to keep
+			self.enhancement_factor, self.l_windows = self.select().windows()
 
-		# Initialize results at the minimal size
-		(tmax,nmax) = streamdatadim(self.data)
-		nscale = len(self.scales)
-		channels = np.zeros(( 2, tmax, nscale**2, nmax ))  ################################################ todo gen as nan 
-		l_windows = np.zeros(( 2, nscale**2 ))  
-		dtiny = np.finfo(0.0).tiny
+		return cf
+
+	def calculate(self):
+
+		multiplexor = self.select()
+
+		(tmax,nmax) = streamdatadim(multiplexor.data)
+		if self.chunksize is None:
+			return self.combine(multiplexor.output(), nmax)
+
+		# chunk by chunk, for long data, with the past of the 
+		# correlation windows 
+		margin = self.procscales
+		if margin is None:
+			margin = multiplexor.scales
+			if margin is None:
+				margin = default_scales(nmax, multiplexor.maxscale)
+		margin = max([0]+list(margin))
+
+		if multiplexor.ragged:
+			cf = RaggedTraces([tr.stats.npts for tr in multiplexor.data], dtype=multiplexor.dtype, fill=1., scratch=multiplexor.scratch)
+		else:
+			cf = scratch_array(( tmax, nmax ), multiplexor.dtype, 1., multiplexor.scratch)  
+		with ForkedPool(self.stations, self.workers) as pool:
+			if pool.forks:
+				# the chunks go through buffers shared with the pool
+				n, l_windows = multiplexor.windows()
+				self.buffers = (shared_array(( len(l_windows), tmax, l_windows.shape[-1], min(nmax, self.chunksize+2*margin) ), multiplexor.dtype), 
+					shared_array(( tmax, min(nmax, self.chunksize+2*margin) ), multiplexor.dtype))
+			for chunk in multiplexor.chunks(self.chunksize, margin):
+				p = max(0, chunk[0]-margin)
+				if multiplexor.ragged:
+					cf.assign(chunk[0], self.combine(chunk[2:], nmax, pool)[:, chunk[0]-p:chunk[1]-p])
+				else:
+					cf[:, chunk[0]:chunk[1]] = self.combine(chunk[2:], nmax, pool)[:, chunk[0]-p:chunk[1]-p]
+		self.buffers = None
+
+		return cf
+
+	def combine(self, pre_processed_data, npts=None, pool=None):
 		
-		# along stations
-		for station_i, station_data in enumerate(self.pre_processed):
-			n_enhancements = -1
+		self.pre_processed_data = pre_processed_data[0]
+		self.enhancement_factor = pre_processed_data[1]
+		self.l_windows = pre_processed_data[2]
+		self.npts = npts
+
+		scratch = self.kwargs.get('scratch')
+		if pool is not None and pool.forks:
+			# a chunk, in the buffers of the pool
+			n = self.pre_processed_data.shape[-1]
+			self.buffers[0][..., :n] = self.pre_processed_data
+			self.buffers[1][:, :n] = 1.
+			cf = self.buffers[1][:, :n]
+			pool.map([(first, last, n) for first, last in station_batches([n]*len(cf), self.workers)])
+		else:
+			if isinstance(self.pre_processed_data[0], RaggedTraces):
+				cf = RaggedTraces(self.pre_processed_data[0].lengths, dtype=self.pre_processed_data[0].dtype, fill=1., shared=self.workers is not None, scratch=scratch)
+			elif scratch is not None:
+				(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+				cf = scratch_array(( tmax, nmax ), self.pre_processed_data.dtype, 1., scratch)
+			elif self.workers is None:
+				(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+				cf = np.ones(( tmax, nmax ), dtype=self.pre_processed_data.dtype)  
+			else:
+				(tmax,nmax) = (self.pre_processed_data.shape)[1::2]
+				cf = shared_array(( tmax, nmax ), self.pre_processed_data.dtype, 1.)
+			self.cf = cf
+
+			# stations are independent
+			ragged = isinstance(cf, RaggedTraces)
+			lengths = cf.lengths if ragged else [cf.shape[-1]]*len(cf)
+			# one station at a time from mapped files
+			size = 1 if scratch is not None else 16
+			forked_map(self.stations, station_batches(lengths, self.workers, size), self.workers)
+			self.cf = None
+
+		values = cf
+		if isinstance(cf, RaggedTraces):
+			values = cf.data
+		dtiny = np.finfo(values.dtype).tiny
+		values[:] = 1-values # **(1./self.enhancement_factor))
+		values[ values< dtiny ] = dtiny
 
-			npts = (self.data[station_i]).stats.npts
+		return cf
 
-			# along scales
-			for scale_i, scale_data in enumerate(station_data):
+	def stations(self, first, last, n=None):
+		# all stations of the batch and all channel pairs at once
+		if n is None:
+			data, target = station_batch(self.pre_processed_data, self.cf, first, last)
+		else:
+			# n samples of a chunk in the buffers of the pool
+			data, target = station_batch(self.buffers[0][..., :n], self.buffers[1][:, :n], first, last)
+		dtiny = np.finfo(target.dtype).tiny
+		nchannel = len(data)
+		nodata = np.zeros(target.shape, dtype=bool)
 
-					n_enhancements += 1
-					l_windows[0][n_enhancements] = self.scales[scale_i]
-					l_windows[1][n_enhancements] = self.scales[scale_i]
+		for enhancement_i in range(data.shape[2]):
 
-					# no divide by ~zeros
-					scale_data[scale_data < dtiny] = dtiny
+			a = data[0, :, enhancement_i]
+			b = data[1:, :, enhancement_i]
 
-					channels[1][station_i][n_enhancements] = scale_data
-					channels[0][station_i][n_enhancements][:-1*(self.scales[scale_i])] = scale_data[self.scales[scale_i]:]
+			# (channel, station) pairs with signal, stacked
+			channel_i, station_i = np.nonzero(np.nansum(np.abs(b), axis=-1) > 0)
+			if len(channel_i):
+				with np.errstate(divide='ignore', invalid='ignore'):
+					buf = correlationcoef( a = a[station_i], b = b[channel_i, station_i], \
+						maxscale = int(self.l_windows[0][enhancement_i]/3.), scales=self.procscales, npts=self.npts)
+						#scales = [ int(self.l_windows[0][enhancement_i]/8.) ] )
 
-					channels[0][station_i][n_enhancements][-1*(self.scales[scale_i]):] = np.nan
-					channels[1][station_i][n_enhancements][npts:] = np.nan
+				# no ~zeros
+				buf[buf < dtiny] = dtiny
 
-					# apod = (np.require( range(self.scales[scale_i]) , dtype=np.float) / np.require(self.scales[scale_i], dtype=np.float))**0.5
-					# channels[0][station_i][scale_i][:self.scales[scale_i]] *= apod
-					# channels[1][station_i][scale_i][:self.scales[scale_i]] *= apod
+				# product enhancement (no nans, no infs), channel 
+				# by channel
+				buf[~np.isfinite(buf)] = 1.
+				for c in range(nchannel-1):
+					target[station_i[channel_i == c]] *= buf[channel_i == c]
 
-					# channels[0][station_i][n_enhancements][ (npts-2*self.scales[scale_i]):(npts-self.scales[scale_i]) ] *= apod[::-1]
-					# channels[1][station_i][n_enhancements][ (npts-self.scales[scale_i]):npts ] *= apod[::-1]
+			# if no signal (also where a chunk has no signal)
+			nodata |= np.isnan(data[:, :, enhancement_i]).any(axis=0)
 
+		target[nodata] = np.nan
 
-		for i in range(n_enhancements+1, nscale**2):
-			channels = np.delete(channels, n_enhancements+1, axis=2)
-			l_windows = np.delete(l_windows, n_enhancements+1, axis=1)
+	def plot(self, **kwargs):        
+		return stream_processor_plot( self.data, self.output(), **kwargs)
 
-		return channels, n_enhancements+1, l_windows
 
-	def plot(self):
-		channels, n, l = self.output() 
-		return stream_multiplexor_plot( self.data, channels )
 
+def recursive_sumsquares(a, scales=None, operation='sumsquare', maxscale=None, dtype=np.float, scratch=None):
+	"""
+	Returns `~trigger.recursive` of a data-stream and its 
+	'd-sumsquare', from a single pre-processing of the data.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`
+		- other parameters: see `~trigger.recursive`.
+	:param: 
+		- data-stream of e.g. seismograms.
+		- other parameters: see `~trigger.recursive` (no pyramid).
+	_______
+	:rtype: 
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+		- NumPy:class:`~numpy.ndarray` vector.
+	:return: 
+		- multi-scale time series of the operation, 
+		- multi-scale sums of squared time derivatives, 
+		- calculation scales (samples scale unit).
+	_________
+	.. note::
 
-class Components(object):
+		Both series share the detrending, tapering, filtering and 
+		de-spiking of the data, only the time derivative and the 
+		cumulative sums are added for the second one: for 
+		'sumsquare', this gives the sums of tau_p-like predominant 
+		periods in one pass.
 
 	"""
-	Produces an estimation/proxy of the probability of seismic 
-	body-wave arrival in continuous seismic records. 
 
-	In practice, it sets an instance of leftRightTerms that can be 
-	used to form a matrix in which the data-stream in cell [0, c, n] 
-	has to be compared with cells [1, c, n], [2, c, n], etc. For the data
-	of a given channel (c), with Nc component of the same channel, 
-	there are Nc*n pairs of time-series to compare. 
+	a, input_a = trace2stream(a)
+	(tmax,nmax) = streamdatadim(a)
+	if scales is None:
+		scales = default_scales(nmax, maxscale)
+
+	timeseries = scratch_array(( tmax, len(scales), nmax ), dtype, 0., scratch)
+	d_timeseries = scratch_array(( tmax, len(scales), nmax ), dtype, 0., scratch)
+
+	a.detrend('linear')
+	a.taper(.05, type='triang', max_length=10) 
+
+	# Channels sharing sampling rate and length are processed together
+	groups = OrderedDict()
+	for t, tr in enumerate(a) :
+		if not tr.stats.channel == 'YH':
+			groups.setdefault((tr.stats.sampling_rate, tr.stats.npts), []).append(t)
+
+	for (sampling_rate, npts), traces in groups.items() :
+		for b in range(0, len(traces), 16) :
+			batch = traces[b:b+16]
+			data = np.asarray([a[t].data for t in batch], dtype=np.float)
+			data = recursive_preprocessing(data, scales, 'sumsquare', sampling_rate)
+			if robust_operation(operation):
+				sums = multiscale_quantiles(np.asarray(data, dtype=dtype), scales, operation, nmax)
+			else:
+				sums = multiscale_sums(np.asarray(data, dtype=dtype), scales, operation, nmax)
+			d_sums = multiscale_sums(np.asarray(np.gradient(data, axis=-1), dtype=dtype), scales, 'd-sumsquare', nmax)
+			for t, s, d in zip(batch, sums, d_sums):
+				timeseries[t] = s
+				d_timeseries[t] = d
+
+	return timeseries, d_timeseries, scales
+
+
+_wavelets = OrderedDict()
+wavelet_cachesize = 2
+wavelet_cachebytes = 2**27
+
+def morlet_period(data, delta, fmin=.1, fmax=None, nf=32, w0=6):
+	"""
+	Returns the period of the maximum of the Morlet continuous 
+	wavelet transform of traces, as ObsPy:func:`~obspy.signal.
+	tf_misfit.cwt`, for all traces at once.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (..., samples).
+		- float
+		- fmin: float (default .1, optional).
+		- fmax: float (default Nyquist, optional).
+		- nf: int (default 32, optional).
+		- w0: float (default 6, optional).
+	:param: 
+		- data of traces sharing length and sampling rate.
+		- sampling interval (in seconds).
+		- fmin, fmax: frequency range (in Hz).
+		- nf: number of logarithmically spaced frequencies.
+		- w0: wavelet parameter.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (..., samples).
+	:return: period (in seconds) of each sample.
+	_________
+	.. note::
+
+		The Fourier transforms of the wavelets are kept in a least 
+		recently used cache of `~trigger.wavelet_cachesize` sets 
+		(one per length, sampling rate and frequencies), holding at 
+		most `~trigger.wavelet_cachebytes` bytes. Larger sets are 
+		not kept: the wavelet of each frequency is then transformed 
+		when needed, so memory does not grow with the number of 
+		frequencies. Each frequency is transformed back for all 
+		traces at once, and only the running maximum is kept.
+
+	"""
+
+	data = np.asarray(data, dtype=np.float)
+	if fmax is None:
+		fmax = 1./delta/2
+	npts = data.shape[-1] * 2
+	f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+	nfft = 2**int(np.ceil(np.log2(npts))) * 2
+
+	# same time grid as ObsPy (its step is not exactly delta)
+	t = np.linspace(0., (npts - 1) * delta, npts)
+	step = t[1] - t[0]
+	tminin = int(t[-1] / 2. / step)
+
+	def kernel(n):
+		scale = w0 / (2 * np.pi * f[n])
+		x = -1 * (t - t[-1] / 2.) / scale
+		psih = (np.pi ** (-.25) * np.exp(1j * w0 * x) * np.exp(-x ** 2 / 2.)).conjugate() / np.abs(scale) ** .5
+		return np.fft.fft(psih, n=nfft)
+
+	key = (npts, delta, fmin, fmax, nf, w0)
+	kernels = None
+	if key in _wavelets:
+		kernels = _wavelets.pop(key)
+	elif nf * nfft * np.dtype(np.complex).itemsize <= wavelet_cachebytes:
+		kernels = np.zeros((nf, nfft), dtype=np.complex)
+		with np.errstate(under='ignore'):
+			for n in range(nf):
+				kernels[n] = kernel(n)
+	if kernels is not None:
+		_wavelets[key] = kernels
+		while len(_wavelets) > wavelet_cachesize or sum(k.nbytes for k in _wavelets.values()) > wavelet_cachebytes:
+			_wavelets.popitem(last=False)
+
+	sf = np.fft.fft(data, n=nfft, axis=-1)
+	peak = np.zeros(data.shape)
+	index = np.zeros(data.shape, dtype=np.int64)
+	with np.errstate(under='ignore'):
+		for n in range(nf):
+			tf = np.abs(np.fft.ifft((kernel(n) if kernels is None else kernels[n]) * sf, axis=-1)[..., tminin:tminin + npts // 2] * step)
+			larger = tf > peak
+			peak[larger] = tf[larger]
+			index[larger] = n
+
+	return 1./f[index]
+
+
+class predom_period(object):
+
+	"""
+	Produces an estimation/proxy of the pre-dominant period in 
+	continuous seismic records. 
 	______
 	:type: 
 		- ObsPy:class:`~obspy.core.stream`.
 		- scale: list (multi-scaling by default, optional).
 		- statistic: string (default 'averageabs', optional).
 		- maxscale: int (default 'None', optional).
+		- scratch: string (default 'None', optional).
 	:param: 
 		- data of e.g. seismograms.
 		- scales: or length of the window used for pre-processing with
@@ -944,132 +3795,63 @@ class Components(object):
 			`~trigger.recursive`.
 		- maxscale: maximum scale the window used for pre-processing 
 			with `~trigger.recursive`.
+		- scratch: directory of the files mapping the outputs 
+			(see `~trigger.scratch_array`, in memory by default).
 	___________
 	.. rubric:: _`Default Attributes`
 	___________
 	.. rubric:: _`Default Methods`
-		- `~trigger.Component.output`: returns the results.
-		- `~trigger.Component.plot`: displays the output with 
+		- `~trigger.predom_period.output`: returns the results.
+		- `~trigger.predom_period.plot`: displays the output with 
 			`~trigger.stream_multiplexor_plot`.
-		- `~trigger.Component.correlate`: uses the 
+		- `~trigger.predom_period.correlate`: uses the 
 			`~trigger.Correlate` class to compare data-streams.
-		- `~trigger.Component.ratio`: uses the 
+		- `~trigger.predom_period.ratio`: uses the 
 			`~trigger.Ratio` class to compare data-streams.
 	___________
 	.. rubric:: Example
 
 		Plot the data-streams:
 		>>> import trigger
-		>>> cf = trigger.Component(trigger.artificial_stream(npts=5000), statistic='rms')
-		>>> cf.plot()
-
-		Plot the characteristic function:
-		>>> cf.correlate.plot()
+		>>> ... .plot()
 
 	"""
 
-	def __init__(self, data, preprocessor='rms', scales=None, maxscale=None): 
+	def __init__(self, data, preprocessor='sumsquare', scales=[800], maxscale=1000, scratch=None ): 
 
 		# stores input parameters
 		self.preprocessor = preprocessor
 		self.scales = scales
 		self.maxscale = maxscale
+		self.scratch = scratch
 
 		# get (station, scale, sample) array any way (for Trace & Stream inputs)
 		self.data, self.original_data = trace2stream(data.copy())
 
 	def output(self):
-		# Multiplex the pre-processed data	
-
-		# pre_processed: array of pre-processed data
-		# preprocessor: sum|average|rms
-		# scales: list
-		self.pre_processed, self.scales = recursive(self.data, self.scales, self.preprocessor, self.maxscale) 
+		# Multiplex the pre-processed data
 
-		# Initialize results at the minimal size
 		(tmax,nmax) = streamdatadim(self.data)
 		nscale = len(self.scales)
-		channels = np.zeros(( 3, tmax, nscale**2, nmax )) 
-		l_windows = np.zeros(( 3, nscale**2 ))  
-		dtiny = np.finfo(0.0).tiny
-		
-		# along stations
-		for station_i in range(tmax):
-			delta = (self.data[station_i]).stats.delta
-			net = (self.data[station_i]).stats.network
-			sta = (self.data[station_i]).stats.station
-			loc = (self.data[station_i]).stats.location
-			chan = (self.data[station_i]).stats.channel
-			stime = (self.data[station_i]).stats.starttime
-			etime = (self.data[station_i]).stats.endtime
-			npts = (self.data[station_i]).stats.npts
-			#print station_i, ':',  delta, net, sta, loc, chan, stime, etime, npts
-
-			ZNE = [chan, chan[:-1] + 'N', chan[:-1] + 'E']
-			ZNE_sta = [sta, sta, sta]
-
-			if chan[-1] in ('Z', 'N', 'E') :
-				ZNE[0] = chan[:-1] + 'Z'
-				ZNE[1] = chan[:-1] + 'N'
-				ZNE[2] = chan[:-1] + 'E'
-			if chan[-1] in ('3', '2', '1') :
-				ZNE[0] = chan[:-1] + '3'
-				ZNE[1] = chan[:-1] + '2'
-				ZNE[2] = chan[:-1] + '1'
-			if chan in ('VERTICAL', 'NORTH', 'EAST') :
-				ZNE[0] = 'VERTICAL'
-				ZNE[1] = 'NORTH'
-				ZNE[2] = 'EAST'
-			if chan in ('vertical', 'north', 'east') :
-				ZNE[0] = 'vertical'
-				ZNE[1] = 'north'
-				ZNE[2] = 'east'
-			if len(sta) > 3 :
-				if sta[-1] in ('Z', 'N', 'E') :
-					ZNE_sta[0] = sta[:-1] + 'Z'
-					ZNE_sta[1] = sta[:-1] + 'N'
-					ZNE_sta[2] = sta[:-1] + 'E'
-				if sta[-1] in ('z', 'n', 'e') :
-					ZNE_sta[0] = sta[:-1] + 'z'
-					ZNE_sta[1] = sta[:-1] + 'n'
-					ZNE_sta[2] = sta[:-1] + 'e'
-
-			if chan[-1] in ('N', '2') or chan in ('NORTH', 'north'):
-				ZNE     = [    ZNE[1],     ZNE[0]]#,     ZNE[2]]
-				ZNE_sta = [ZNE_sta[1], ZNE_sta[0]]#, ZNE_sta[2]]
-			elif chan[-1] in ('E', '1') or chan in ('EAST', 'east'):
-				ZNE     = [    ZNE[2],     ZNE[0]]#,     ZNE[1]]
-				ZNE_sta = [ZNE_sta[2], ZNE_sta[0]]#, ZNE_sta[1]]
-
-			ZNE_i = np.asarray([])
-			ZNE_di = np.asarray([])
-			for i in range(len(ZNE)):
-				#print ZNE_sta[i], ZNE[i]
-				i, di = stream_indexes(self.data, delta=delta, network=net, station=ZNE_sta[i], location=loc, channel=ZNE[i], minstarttime=stime, maxendtime=etime, reftime=stime )
-				ZNE_i = np.append(ZNE_i, i )
-				ZNE_di = np.append(ZNE_di, di )
-
-			ZNE_i = ZNE_i.astype(int)
-			ZNE_di = ZNE_di.astype(int)
-			#print  ZNE_sta, ZNE, ZNE_i, ZNE_di
+		channels = scratch_array(( 2, tmax, nscale**2, nmax ), np.float, 0., self.scratch) 
+		l_windows = np.zeros(( 2, nscale**2 ))  
 
-			for i in range(len(ZNE_i)):
-				#print '#', ZNE_i[i], ':',  (self.data[ZNE_i[i]]).stats.delta, (self.data[ZNE_i[i]]).stats.network, (self.data[ZNE_i[i]]).stats.station, (self.data[ZNE_i[i]]).stats.location, (self.data[ZNE_i[i]]).stats.channel, (self.data[ZNE_i[i]]).stats.starttime, (self.data[ZNE_i[i]]).stats.endtime, (self.data[ZNE_i[i]]).stats.npts
-				if ZNE_di[i] == 0 :
-					s = [0, 0]
-					e = [nmax, nmax]
-				elif ZNE_di[i] > 0 :
-					s = [0, ZNE_di[i]]
-					e = [nmax-ZNE_di[i], nmax]
-				elif ZNE_di[i] < 0 :
-					s = [-1*ZNE_di[i], 0]
-					e = [nmax, nmax+ZNE_di[i]]
-						
-				for scale_i in range(nscale):
-					l_windows[i][scale_i] = self.scales[scale_i]
-					channels[i][station_i][scale_i][s[0]:e[0]] = self.pre_processed[ZNE_i[i]][scale_i][s[1]:e[1]]
-					# channels[i][station_i][scale_i][:s[0]]   = self.pre_processed[ZNE_i[i]][scale_i][s[1]+1]
-					# channels[i][station_i][scale_i][e[0]:]   = self.pre_processed[ZNE_i[i]][scale_i][e[1]-1]
+		timeseries, d_timeseries, scales = recursive_sumsquares(self.data, operation=self.preprocessor, scales=self.scales, maxscale=self.maxscale, scratch=self.scratch) 
+
+		delta = np.asarray([trace.stats.delta for trace in self.data])[:, None]
+		for tserie_i in range((d_timeseries.shape)[1]):
+			channels[0] += (2 * np.pi * (timeseries[:, tserie_i, :] / (d_timeseries[:, tserie_i, :]/delta))**.5)[:, None, :]
+		channels[0] /= (d_timeseries.shape)[1]
+
+		# Traces sharing length and sampling rate are transformed together
+		groups = OrderedDict()
+		for trace_i, trace in enumerate(self.data):
+			groups.setdefault((trace.stats.delta, trace.stats.npts), []).append(trace_i)
+		for (delta, npts), traces in groups.items():
+			for b in range(0, len(traces), 16):
+				batch = traces[b:b+16]
+				periods = morlet_period([self.data[t].data for t in batch], delta, fmin=0.1, nf=32)
+				channels[1, batch, :, :npts] = periods[:, None, :]
 
 		return channels, nscale+1, l_windows
 
@@ -1078,284 +3860,737 @@ class Components(object):
 		return stream_multiplexor_plot( self.data, channels )
 
 
-class Ratio(object):
+
+
+class RecursiveState(object):
+
 	"""
-	Produces a not-to-scale proxy of the probability of seismic 
-	body-wave arrival in continuous seismic records. 
-	
-	In practice, it sets an instance of Ratio that can be used to 
-	apply division between the first and all other time-series of the 
-	same channel given in a multi-scale data-stream.
+	Stateful version of `~trigger.recursive` for one channel of 
+	continuous data received packet by packet.
+
+	In practice, it sets an instance of RecursiveState that keeps 
+	the filter states, the last window of raw samples (for 
+	de-spiking) and the last window of pre-processed samples of each 
+	scale, so that only the new samples are processed on update.
 	______
 	:type: 
-		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
-		- data: ObsPy:class:`~obspy.core.stream` (optional).
+		- sampling_rate: float.
+		- scales: vector.
+		- operation: string (default 'rms', optional).
 	:param: 
-		- multi-scale data-stream, pre-processed with 
-			`~trigger.ShortLongTerms` or `~trigger.leftRightTerms` or
-			`~trigger.Component`
-		- data of e.g. seismograms. 
+		- sampling_rate: sampling rate of data (in Hz).
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
 	___________
 	.. rubric:: _`Default Attributes`
-		- `~trigger.Ratio.output`: returns the results.
-		- `~trigger.Ratio.plot`: displays the output with 
-			`~trigger.stream_processor_plot`.
+		- `~trigger.RecursiveState.update`: returns the time-series 
+			of new samples.
+	_________
+	.. note::
+
+		Data can not be processed backward in real time: the 
+		high-pass filters of `~trigger.filterbank` are applied twice
+		forward (same amplitude response, not zero-phase), the data 
+		of the largest scale are de-meaned with the mean of all 
+		samples received, the spike mask uses the mean (instead of
+		the median) and the standard deviation of all samples 
+		received (the rolling windows of `~trigger.recursive` for 
+		robust operations) and the time derivative is a backward 
+		difference. 
+		The windows of the first samples are truncated. Results do 
+		not depend on how data are split in packets.
+
+	"""
+
+	def __init__(self, sampling_rate, scales, operation='rms'):
+
+		self.sampling_rate = sampling_rate
+		self.scales = np.require(scales, dtype=np.int)
+		self.operation = operation
+
+		nscale = len(self.scales)
+		self.smax = np.max(self.scales)
+		self.sos = [np.vstack((sos, sos)) for sos in filterbank(sampling_rate, self.scales).sos]
+		self.zi = None
+		self.npts = 0
+		self.total = 0.
+		self.raw = 0.
+		self.dt_sums = [0., 0.]
+		self.dt_past = np.zeros(0)
+		self.last = np.zeros(nscale)
+		self.window = np.zeros(( nscale, self.smax ))
+		self.past = np.zeros(( nscale, 0 ))
+
+	def update(self, data):
+		"""
+		Processes the new samples of the channel.
+		______
+		:type: NumPy:class:`~numpy.ndarray` (samples).
+		:param: new data of e.g. a seismogram.
+		_______
+		:rtype: NumPy:class:`~numpy.ndarray` (scales, samples).
+		:return: multi-scale time series of the new samples.
+		"""
+
+		data = np.require(data, dtype=np.float)
+		npts = len(data)
+		nscale = len(self.scales)
+		dtiny = np.finfo(0.0).tiny
+		if npts == 0 :
+			return np.zeros(( nscale, 0 ))
+
+		# de-spiking with the statistics of all samples received
+		dt = np.zeros(npts)
+		dt[1:] = np.abs(data[:-1]-data[1:])
+		if self.npts > 0 :
+			dt[0] = np.abs(self.raw-data[0])
+		self.raw = data[-1]
+		count = self.npts + np.arange(1, npts+1)
+		if robust_operation(self.operation):
+			# rolling windows over the last differences received
+			dt = np.concatenate((self.dt_past, dt))
+			keep = spike_mask(dt, self.smax)[len(self.dt_past):]
+			self.dt_past = dt[max(0, len(dt)-self.smax+1):]
+		else:
+			dt_sum = self.dt_sums[0] + np.cumsum(dt)
+			dt_sumsquare = self.dt_sums[1] + np.cumsum(dt**2)
+			self.dt_sums = [dt_sum[-1], dt_sumsquare[-1]]
+			dt_mean = dt_sum / count
+			dt_std = np.maximum(dt_sumsquare/count - dt_mean**2, 0.)**.5
+			keep = dt < (dt_mean+2.*dt_std)
+
+		# filtering
+		if self.zi is None :
+			self.zi = [sosfilt_zi(sos)*data[0] for sos in self.sos]
+		pre_processed = np.empty(( nscale, npts ))
+		for n, sos in enumerate(self.sos):
+			pre_processed[n], self.zi[n] = sosfilt(sos, data, zi=self.zi[n])
+		means = (self.total + np.cumsum(data)) / count
+		pre_processed[-1] = data - means
+		self.total += np.sum(data)
+
+		pre_processed *= keep
+		if self.operation[0:1] in ('d-'):
+			last = pre_processed[:, -1].copy()
+			pre_processed[:, 1:] -= pre_processed[:, :-1].copy()
+			pre_processed[:, 0] -= self.last
+			if self.npts == 0 :
+				pre_processed[:, 0] = 0.
+			self.last = last
+
+		if robust_operation(self.operation):
+			# rolling windows over the last samples received
+			buf = np.concatenate((self.past, pre_processed), axis=-1)
+			timeseries = multiscale_quantiles(buf, self.scales, self.operation, overlap=self.past.shape[-1], npts=np.inf)
+			self.past = buf[:, -self.smax:]
+			self.npts += npts
+			return timeseries
+
+		if self.operation in ('rms', 'sumsquare', 'd-sumsquare'):                  
+			pre_processed = np.nan_to_num(pre_processed**2)
+		elif self.operation in ('averageabs', 'sumabs'):  
+			pre_processed = np.nan_to_num(np.abs(pre_processed))
+		elif self.operation in ('average', 'sum'):  
+			pre_processed = np.nan_to_num(pre_processed)
+
+		# sliding windows over the last window and the new samples
+		buf = np.concatenate((self.window, pre_processed), axis=-1)
+		csqr = np.cumsum(buf, axis=-1)
+		s = self.scales[:, None]
+		i = self.smax + np.arange(npts)[None, :]
+		timeseries = csqr[:, i[0]] - csqr[np.arange(nscale)[:, None], i-s]
+		self.window = buf[:, -self.smax:]
+
+		# for average and rms only 
+		if self.operation not in ('sum', 'sumabs', 'sumsquare', 'd-sumsquare'):
+			timeseries /= np.minimum(s, count[None, :])
+		self.npts += npts
+
+		timeseries[timeseries < dtiny] = dtiny
+		if self.operation == 'rms' :
+			timeseries **= .5
+
+		return timeseries
+
+
+class OnlineRecursive(object):
+
+	"""
+	Stateful version of `~trigger.recursive` for continuous data
+	received packet by packet (e.g. from a real-time server).
+
+	In practice, it sets an instance of OnlineRecursive that keeps 
+	one `~trigger.RecursiveState` per trace id. Feeding a packet
+	returns the multi-scale time-series of its samples only. A 
+	channel is restarted if its packets are not contiguous.
+	______
+	:type: 
+		- scales: vector (optional).
+		- operation: string (default 'rms', optional).
+		- maxscale: int (optional).
+	:param: 
+		- scales: scale(s) of time-series operation (in samples).
+		- operation: type of operation (see `~trigger.recursive`).
+		- maxscale: maximum allowed scale (in samples).
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.OnlineRecursive.feed`: returns the time-series 
+			of a new packet.
 	___________
 	.. rubric:: Example
 
-		Get some data-streams:
 		>>> import trigger
-		>>> data = trigger.artificial_stream(npts=5000)
-		>>> data_streams = (trigger.ShortLongTerms(data)).output()
-		
-		Get the operator instance and plot:
-		>>> cf = trigger.Ratio(data_streams, data)
-		>>> cf.plot()
+		>>> a = trigger.artificial_stream(npts=5000)
+		>>> online = trigger.OnlineRecursive()
+		>>> for packet in a.slide(window_length=1., step=1.):
+		...     timeseries, scales = online.feed(packet)
 
 	"""
-	def __init__(self, data, multiplexor = 'shortlongterms', preprocessor = 'averageabs', **kwargs): #, pre_processed_data, data=None):
 
-		self.data = data
-		self.multiplexor = multiplexor
-		self.preprocessor = preprocessor
-		
-		self.shortlongterms = ShortLongTerms(data, preprocessor=self.preprocessor, **kwargs)
-		self.leftrightterms = LeftRightTerms(data, preprocessor=self.preprocessor, **kwargs)
-		self.components = Components(data, **kwargs)
+	def __init__(self, scales=None, operation=None, maxscale=None):
+
+		if operation is None:
+			operation = 'rms'
+		if scales is None:
+			scales = [2**i for i in range(5,10) if maxscale is None or 2**i <= maxscale]
+
+		self.scales = np.require(scales, dtype=np.int)
+		self.operation = operation
+		self.states = {}
+		self.nexttimes = {}
+
+	def state(self, trace):
+		"""
+		Returns the `~trigger.RecursiveState` of a trace, restarted 
+		if the trace does not follow the previous packet.
+		"""
+
+		state = self.states.get(trace.id)
+		if state is None or state.sampling_rate != trace.stats.sampling_rate or \
+			abs(trace.stats.starttime - self.nexttimes[trace.id]) > trace.stats.delta/2. :
+			state = RecursiveState(trace.stats.sampling_rate, self.scales, self.operation)
+			self.states[trace.id] = state
+		self.nexttimes[trace.id] = trace.stats.endtime + trace.stats.delta
+
+		return state
+
+	def feed(self, packet):
+		"""
+		Processes a new packet.
+		______
+		:type: ObsPy:class:`~obspy.core.stream` or 
+			ObsPy:class:`~obspy.core.trace`.
+		:param: new data of e.g. seismograms.
+		_______
+		:rtype: 
+			- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
+			- NumPy:class:`~numpy.ndarray` vector.
+		:return: 
+			- multi-scale time series of the packet, 
+			- calculation scales (samples scale unit).
+		"""
+
+		packet, input_packet = trace2stream(packet)
+		(tmax,nmax) = streamdatadim(packet)
+		timeseries = np.zeros(( tmax, len(self.scales), nmax ))
+
+		for t, tr in enumerate(packet):
+			# Avoid clock channels 
+			if not tr.stats.channel == 'YH':
+				timeseries[t, :, :tr.stats.npts] = self.state(tr).update(tr.data)
+				timeseries[t, :, tr.stats.npts:] = np.finfo(0.0).tiny
+
+		return timeseries, self.scales
+
+
+class PendingSamples(object):
 
-	def output(self):
+	"""
+	Ring buffer of the multi-scale time-series of one trace that 
+	`~trigger.OnlineMultiplexor` has not returned yet.
+
+	In practice, it sets an instance of PendingSamples that copies 
+	new samples at the end of a preallocated array (wrapping around)
+	and forgets samples from the start, without moving the samples 
+	kept. The array only grows (doubling) if more samples than its 
+	capacity are kept.
+	______
+	:type: 
+		- first: int.
+		- nscale: int.
+		- capacity: int.
+	:param: 
+		- first: index of the first sample (in samples since epoch).
+		- nscale: number of scales.
+		- capacity: number of samples allocated.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.PendingSamples.start`: index of the first sample
+			kept.
+		- `~trigger.PendingSamples.end`: index following the last 
+			sample kept.
+		- `~trigger.PendingSamples.append`: adds new samples.
+		- `~trigger.PendingSamples.read`: returns a copy of samples.
+		- `~trigger.PendingSamples.forget`: forgets the first samples.
 
-		if self.multiplexor in ('shortlongterms', 'stlt'):
-			pre_processed_data = self.shortlongterms.output()
-		elif self.multiplexor in ('leftrightterms', 'ltrt'):
-			pre_processed_data = self.leftrightterms.output()
-		elif self.multiplexor in ('components', 'comp'):
-			pre_processed_data = self.components.output()
-		
-		self.pre_processed_data = pre_processed_data[0]
-		self.enhancement_factor = pre_processed_data[1]
-		self.l_windows = pre_processed_data[2]
+	"""
 
-		dtiny = np.finfo(0.0).tiny
-		(tmax,nmax) = streamdatadim(self.data)
-		cf = np.ones(( tmax, nmax ))  
+	def __init__(self, first, nscale, capacity):
 
-		for station_i, station_data in enumerate(self.pre_processed_data[0]):
-			for enhancement_i, enhancement_data in enumerate(self.pre_processed_data[0][station_i]):
+		self.start = first
+		self.npts = 0
+		self.head = 0
+		self.buf = np.empty(( nscale, max(1, capacity) ))
 
-				for channel_i in range(1,len(self.pre_processed_data)) :
+	@property
+	def end(self):
+		return self.start + self.npts
 
-					buf = self.pre_processed_data[0][station_i][enhancement_i] 
-					buf /= self.pre_processed_data[channel_i][station_i][enhancement_i]
-					# no ~zeros
-					buf[buf < dtiny] = dtiny
-					#buf[0:100] = np.nan
-					# product enhancement (no nans, no infs)
-					cf[station_i][np.isfinite(buf)] *= buf[np.isfinite(buf)]
+	def append(self, timeseries):
+		"""
+		Adds the samples following the last sample kept.
+		"""
 
-			# rescaling 
-			#cf[station_i] **= (1./self.enhancement_factor) 
+		n = timeseries.shape[-1]
+		capacity = self.buf.shape[-1]
+		if self.npts + n > capacity:
+			kept = self.read(self.start, self.end)
+			self.buf = np.empty(( self.buf.shape[0], max(2*capacity, self.npts+n) ))
+			self.buf[:, :self.npts] = kept
+			self.head = 0
+			capacity = self.buf.shape[-1]
+		i = (self.head + self.npts + np.arange(n)) % capacity
+		self.buf[:, i] = timeseries
+		self.npts += n
 
-		# # no ~zeros
-		# ratio[ ratio < dtiny ] = dtiny
-		# # no nans, no infs
-		# ratio[ ~np.isfinite(ratio) ] = 1.
+	def read(self, start, end):
+		"""
+		Returns a copy of the samples from start to end (excluded), 
+		within the samples kept.
+		"""
 
-		# returns product # enhanced and rescaled		
-		return cf         # cf = (np.prod(ratio, axis=1))**(1/self.enhancement_factor)
+		i = (self.head + np.arange(start-self.start, end-self.start)) % self.buf.shape[-1]
+		return self.buf[:, i]
 
-	def plot(self, **kwargs):
-		return stream_processor_plot( self.data, self.output(), **kwargs)
+	def forget(self, end):
+		"""
+		Forgets the samples before end.
+		"""
 
+		n = min(max(0, end-self.start), self.npts)
+		self.head = (self.head + n) % self.buf.shape[-1]
+		self.start += n
+		self.npts -= n
 
-class Correlate(object):
-	"""
-	Produces an estimation of the normalized probability of seismic 
-	body-wave arrival in continuous seismic records. 
 
-	In practice, it sets an instance of Correlate that can be used to
-	apply correlation between the first and all other time-series of
-	the same channel given in a multi-scale data-streams.
+class OnlineMultiplexor(object):
+
+	"""
+	Stateful version of `~trigger.ShortLongTerms`, 
+	`~trigger.LeftRightTerms` and `~trigger.Components` for 
+	continuous data received packet by packet.
+
+	In practice, it sets an instance of OnlineMultiplexor that 
+	pre-processes packets with `~trigger.OnlineRecursive` and returns
+	the multiplexed time-series of the new samples only, in the 
+	format of the output of the multiplexor classes.
 	______
 	:type: 
-		- NumPy:class:`~numpy.ndarray` (channel, scales, samples).
-		- data: ObsPy:class:`~obspy.core.stream` (optional).
-		- scale: list (multi-scaling by default, optional).
+		- multiplexor: string (default 'shortlongterms', optional).
+		- preprocessor: string (optional).
+		- scales: vector (optional).
+		- maxscale: int (optional).
+		- maxlag: int (optional).
 	:param: 
-		- multi-scale data-stream, pre-processed with 
-			`~trigger.ShortLongTerms` or `~trigger.leftRightTerms` or
-			`~trigger.Component`.
-		- data: of e.g. seismograms.
-		- scales: or length of the window used for correlation
+		- multiplexor: 'shortlongterms' ('stlt'), 'leftrightterms'
+			('ltrt') or 'components' ('comp').
+		- preprocessor: operation parameter of 
+			`~trigger.OnlineRecursive` (default 'averageabs', or 
+			'rms' for components).
+		- scales: scale(s) of time-series operation (in samples).
+		- maxscale: maximum allowed scale (in samples).
+		- maxlag: maximum number of samples a trace waits for its 
+			other components, before they are dropped until they 
+			come back (components only, default 4 times the largest 
+			scale).
 	___________
 	.. rubric:: _`Default Attributes`
-		- `~trigger.Correlate.output`: returns the results.
-		- `~trigger.Correlate.plot`: displays the output with 
-			`~trigger.stream_processor_plot`.
+		- `~trigger.OnlineMultiplexor.feed`: returns the multiplexed
+			time-series of a new packet.
+		- `~trigger.OnlineMultiplexor.starttimes`: time of the first 
+			sample returned for each trace of the last packet.
+	_________
+	.. note::
+
+		The right terms of leftrightterms need the next samples: 
+		the output is delayed by the largest scale. The components 
+		output only covers the samples received for all the 
+		components of a trace.
 	___________
 	.. rubric:: Example
 
-		Get some data-streams:
 		>>> import trigger
-		>>> data = trigger.artificial_stream(npts=5000)
-		>>> data_streams = (trigger.ShortLongTerms(data)).output()
-		
-		Get the operator instance and plot:
-		>>> cf = trigger.Correlate(data_streams, data, scales=[10])
-		>>> cf.plot()
-
-		Idem, activating multi-scaling:
-		>>> mcf = trigger.Correlate(data_streams, data)
-		>>> mcf.plot()
+		>>> a = trigger.artificial_stream(npts=5000)
+		>>> online = trigger.OnlineMultiplexor('components')
+		>>> for packet in a.slide(window_length=1., step=1.):
+		...     channels, n, l_windows = online.feed(packet)
 
 	"""
-	def __init__(self, data, multiplexor = 'components', preprocessor = 'rms', procscales=None, **kwargs): #, pre_processed_data, data=None):
 
-		self.data = data
+	def __init__(self, multiplexor='shortlongterms', preprocessor=None, scales=None, maxscale=None, maxlag=None):
+
+		if preprocessor is None:
+			preprocessor = 'averageabs'
+			if multiplexor in ('components', 'comp'):
+				preprocessor = 'rms'
+
 		self.multiplexor = multiplexor
 		self.preprocessor = preprocessor
-		self.procscales = procscales
-		
-		self.shortlongterms = ShortLongTerms(data, preprocessor=self.preprocessor, **kwargs)
-		self.leftrightterms = LeftRightTerms(data, preprocessor=self.preprocessor, **kwargs)
-		self.components = Components(data, preprocessor=self.preprocessor, **kwargs)
-
-	def output(self):
+		self.recursive = OnlineRecursive(scales, preprocessor, maxscale)
+		self.scales = self.recursive.scales
+		self.maxlag = maxlag
+		if maxlag is None:
+			self.maxlag = 4*np.max(self.scales)
+
+		self.pairs = [(i, j) for i, small in enumerate(self.scales) for j, big in enumerate(self.scales) if big <= small*10 and big >= small*7]
+		if multiplexor in ('shortlongterms', 'stlt') and len(self.pairs) == 0:
+			raise ValueError("scales must be around 1 order apart (from *7 to *10)")
+
+		self.pending = {}
+		self.emitted = {}
+		self.groups = {}
+		self.starttimes = []
+
+	def first(self, trace):
+		# Index of the first sample of a trace, in samples since epoch
+		return int(round(trace.stats.starttime.timestamp*trace.stats.sampling_rate))
+
+	def append(self, trace, timeseries, capacity):
+		# Keeps the time-series not returned yet
+		first = self.first(trace)
+		pending = self.pending.get(trace.id)
+		if pending is None or pending.end != first:
+			pending = PendingSamples(first, len(self.scales), capacity + 2*timeseries.shape[-1])
+			self.pending[trace.id] = pending
+			self.emitted.pop(trace.id, None)
+		pending.append(timeseries)
+
+	def feed(self, packet):
+		"""
+		Processes a new packet.
+		______
+		:type: ObsPy:class:`~obspy.core.stream` or 
+			ObsPy:class:`~obspy.core.trace`.
+		:param: new data of e.g. seismograms.
+		_______
+		:rtype: 
+			- NumPy:class:`~numpy.ndarray` 
+				(multiplexed, channel, enhancement, samples).
+			- int
+			- NumPy:class:`~numpy.ndarray` (multiplexed, enhancement).
+		:return: 
+			- multiplexed time-series of the new samples.
+			- number of enhancements.
+			- window lengths of each enhancement.
+		"""
+
+		packet, input_packet = trace2stream(packet)
+		timeseries, scales = self.recursive.feed(packet)
 
 		if self.multiplexor in ('shortlongterms', 'stlt'):
-			pre_processed_data = self.shortlongterms.output()
+			return self.shortlongterms(packet, timeseries)
 		elif self.multiplexor in ('leftrightterms', 'ltrt'):
-			pre_processed_data = self.leftrightterms.output()
+			return self.leftrightterms(packet, timeseries)
 		elif self.multiplexor in ('components', 'comp'):
-			pre_processed_data = self.components.output()
-		
-		self.pre_processed_data = pre_processed_data[0]
-		self.enhancement_factor = pre_processed_data[1]
-		self.l_windows = pre_processed_data[2]
+			return self.components(packet, timeseries)
 
-		dtiny = np.finfo(0.0).tiny
-		(tmax,nmax) = streamdatadim(self.data)
-		cf = np.ones(( tmax, nmax ))  
+	def shortlongterms(self, packet, timeseries):
 
-		for station_i, station_data in enumerate(self.pre_processed_data[0]):
-			for enhancement_i, enhancement_data in enumerate(self.pre_processed_data[0][station_i]):
+		pairs = self.pairs
+		small, big = np.asarray(pairs, dtype=np.int).reshape(-1, 2).T
 
-				for channel_i in range(1,len(self.pre_processed_data)) :
+		channels = np.asarray([ timeseries[:, small], timeseries[:, big] ])
+		l_windows = np.asarray([ self.scales[small], self.scales[big] ], dtype=np.float)
+		self.starttimes = [tr.stats.starttime for tr in packet]
 
-					if np.nansum(np.abs( self.pre_processed_data[channel_i][station_i][enhancement_i] )) > 0:
+		return channels, len(pairs), l_windows
 
-						a = self.pre_processed_data[0][station_i][enhancement_i] 
-						b = self.pre_processed_data[channel_i][station_i][enhancement_i]
-						
-						buf = correlationcoef( a = a, b = b, \
-							maxscale = int(self.l_windows[0][enhancement_i]/3.), scales=self.procscales)
-							#scales = [ int(self.l_windows[0][enhancement_i]/8.) ] )
+	def leftrightterms(self, packet, timeseries):
 
-						# no ~zeros
-						buf[buf < dtiny] = dtiny
+		nscale = len(self.scales)
+		smax = np.max(self.scales)
+		outputs = []
+		self.starttimes = []
+
+		for t, tr in enumerate(packet):
+			self.append(tr, timeseries[t, :, :tr.stats.npts], smax)
+			pending = self.pending[tr.id]
+			start = pending.start
+			npts = max(0, pending.npts - smax)
+			buf = pending.read(start, pending.end)
+			output = np.empty(( 2, nscale, npts ))
+			output[1] = buf[:, :npts]
+			for scale_i, s in enumerate(self.scales):
+				output[0][scale_i] = buf[scale_i][s:s+npts]
+			pending.forget(start+npts)
+			self.starttimes.append(tr.stats.starttime + (start-self.first(tr))*tr.stats.delta)
+			outputs.append(output)
+
+		channels = np.zeros(( 2, len(packet), nscale, max([0]+[o.shape[-1] for o in outputs]) ))
+		channels[:] = np.nan
+		for t, output in enumerate(outputs):
+			channels[:, t, :, :output.shape[-1]] = output
+		l_windows = np.asarray([ self.scales, self.scales ], dtype=np.float)
+
+		return channels, nscale, l_windows
+
+	def components(self, packet, timeseries):
 
-						# product enhancement (no nans, no infs)
-						cf[station_i][np.isfinite(buf)] *= buf[np.isfinite(buf)] 
+		nscale = len(self.scales)
+		outputs = []
+		self.starttimes = []
+
+		for t, tr in enumerate(packet):
+			self.append(tr, timeseries[t, :, :tr.stats.npts], self.maxlag)
+			key, component = component_code(tr.stats)
+			self.groups.setdefault(key, {})[component] = tr.id
+
+		for t, tr in enumerate(packet):
+			key, component = component_code(tr.stats)
+			group = self.groups[key]
+			order = {'Z':['Z', 'N', 'E'], 'N':['N', 'Z'], 'E':['E', 'Z']}[component]
+			ids = [group[c] for c in order if c in group and group[c] in self.pending]
+
+			# common samples of all components
+			pending = self.pending[tr.id]
+			start = max([self.emitted.get(tr.id, pending.start)] + [self.pending[i].start for i in ids])
+			end = min([self.pending[i].end for i in ids])
+			if pending.end - end > self.maxlag:
+				end = pending.end
+			npts = max(0, end-start)
+
+			output = np.zeros(( 3, nscale, npts ))
+			for i, id in enumerate(ids):
+				other = self.pending[id]
+				s = min(max(start, other.start), other.end)
+				e = min(max(end, other.start), other.end)
+				output[i, :, s-start:e-start] = other.read(s, e)
+			self.emitted[tr.id] = start+npts
+			self.starttimes.append(tr.stats.starttime + (start-self.first(tr))*tr.stats.delta)
+			outputs.append(output)
+
+		# drop the components silent for more than maxlag, until 
+		# they come back
+		for key, group in self.groups.items():
+			ids = [i for i in group.values() if i in self.pending]
+			if ids:
+				latest = max([self.pending[i].end for i in ids])
+				for component, i in list(group.items()):
+					if i in self.pending and latest - self.pending[i].end > self.maxlag:
+						del self.pending[i], group[component]
+						self.emitted.pop(i, None)
+
+		# forget the samples returned for all components
+		for key, group in self.groups.items():
+			ids = [i for i in group.values() if i in self.pending]
+			if ids:
+				done = min([self.emitted.get(i, self.pending[i].start) for i in ids])
+				for i in ids:
+					self.pending[i].forget(done)
+
+		channels = np.zeros(( 3, len(packet), nscale, max([0]+[o.shape[-1] for o in outputs]) ))
+		for t, output in enumerate(outputs):
+			channels[:, t, :, :output.shape[-1]] = output
+		l_windows = np.asarray([ self.scales, self.scales, self.scales ], dtype=np.float)
 
-						# if no signal
-						cf[station_i][ np.isnan(self.pre_processed_data[0][station_i][enhancement_i]) ] = np.nan
-						cf[station_i][ np.isnan(self.pre_processed_data[channel_i][station_i][enhancement_i]) ] = np.nan
+		return channels, nscale+1, l_windows
 
-		cf = 1-cf # **(1./self.enhancement_factor))
-		cf[ cf< dtiny ] = dtiny
 
-		return cf
+_periods = OrderedDict()
+period_cachesize = 64
 
-	def plot(self, **kwargs):        
-		return stream_processor_plot( self.data, self.output(), **kwargs)
+def local_period(trace, start, stop, method='cwt', fmin=.1, block=None):
+	"""
+	Estimates the predominant period of a trace between two samples 
+	only, block by block, from a least recently used cache of 
+	`~trigger.period_cachesize` blocks.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.trace`.
+		- int
+		- int
+		- method: string (default 'cwt', optional).
+		- fmin: float (default .1, optional).
+		- block: int (optional).
+	:param: 
+		- data of e.g. a seismogram.
+		- first sample of the window.
+		- last sample of the window (excluded).
+		- method: 'cwt' for the frequency of the maximum of a Morlet 
+			continuous wavelet transform (32 frequencies from fmin to 
+			Nyquist), or 'recursive' for 2*pi*(sum(x**2)/
+			sum((dx/dt)**2))**.5 from `~trigger.recursive` sums over 
+			1/fmin seconds (much cheaper).
+		- fmin: lowest frequency (in Hz).
+		- block: number of samples of the blocks (by default, 
+			blocks and margins fill a power of 2 for the 'cwt' 
+			method, 2**15 for 'recursive').
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray`
+	:return: period (in seconds) of each sample of the window.
+	_________
+	.. note::
 
+		Only the blocks of the trace including the window are 
+		transformed, with margins of five wavelet scales (or one 
+		sum scale and a taper): away from the trace ends, it is the 
+		same as the transform of the whole trace up to the wavelet 
+		tails. Traces shorter than a block are transformed whole.
 
+		Blocks are identified by the trace object itself (and its 
+		start time and number of samples), not by its samples.
 
-class predom_period(object):
+	"""
 
+	stats = trace.stats
+	start, stop = max(0, start), min(stats.npts, stop)
+	if stop <= start:
+		return np.zeros(0)
+
+	fmax = 1./stats.delta/2
+	if method == 'cwt':
+		margin = int(np.ceil(5 * 6./(2*np.pi*fmin) / stats.delta))
+		if block is None:
+			block = 2**int(np.ceil(np.log2(8*margin))) - 2*margin
+	elif method == 'recursive':
+		scale = max(2, int(round(1./fmin/stats.delta)))
+		margin = scale + int(np.ceil(10./stats.delta))
+		if block is None:
+			block = 2**15
+	else:
+		raise ValueError('unknown period estimation method: %s' % method)
+
+	tp = []
+	for b in range(start//block, (stop-1)//block+1):
+
+		key = (id(trace), stats.starttime.timestamp, stats.npts, b, block, method, fmin)
+		if key in _periods and _periods[key][0]() is trace:
+			reference, values = _periods.pop(key)
+			_periods[key] = (reference, values)
+			tp.append(values)
+			continue
+
+		first, last = b*block, min(stats.npts, (b+1)*block)
+		p, q = max(0, first-margin), min(stats.npts, last+margin)
+		if method == 'cwt':
+			values = morlet_period(trace.data[p:q], stats.delta, fmin=fmin, fmax=fmax, nf=32)[first-p:last-p]
+		else:
+			window = Stream([Trace(np.require(trace.data[p:q], dtype=np.float), header={'delta':stats.delta})])
+			sums, d_sums, scales = recursive_sumsquares(window, [scale])
+			sums, d_sums = sums[0, 0], d_sums[0, 0]
+			with np.errstate(divide='ignore', invalid='ignore'):
+				values = (2*np.pi*stats.delta * (sums / d_sums)**.5)[first-p:last-p]
+
+		_periods[key] = (weakref.ref(trace), values)
+		while len(_periods) > period_cachesize:
+			_periods.popitem(last=False)
+		tp.append(values)
+
+	o = (start//block)*block
+	return np.concatenate(tp)[start-o:stop-o]
+
+
+def onset_candidates(charfct, dcharfct, thr_on):
 	"""
-	Produces an estimation/proxy of the pre-dominant period in 
-	continuous seismic records. 
+	Returns the first samples of the runs of samples above the 
+	threshold (or of increase of the characteristic function faster 
+	than the threshold), as the first step of 
+	`~trigger.trigger_onset`.
 	______
 	:type: 
-		- ObsPy:class:`~obspy.core.stream`.
-		- scale: list (multi-scaling by default, optional).
-		- statistic: string (default 'averageabs', optional).
-		- maxscale: int (default 'None', optional).
+		- NumPy:class:`~numpy.ndarray` ([trace,] samples).
+		- NumPy:class:`~numpy.ndarray` ([trace,] samples).
+		- float
 	:param: 
-		- data of e.g. seismograms.
-		- scales: or length of the window used for pre-processing with
-			`~trigger.recursive`.
-		- statistic: operation parameter in pre-processing with
-			`~trigger.recursive`.
-		- maxscale: maximum scale the window used for pre-processing 
-			with `~trigger.recursive`.
-	___________
-	.. rubric:: _`Default Attributes`
-	___________
-	.. rubric:: _`Default Methods`
-		- `~trigger.predom_period.output`: returns the results.
-		- `~trigger.predom_period.plot`: displays the output with 
-			`~trigger.stream_multiplexor_plot`.
-		- `~trigger.predom_period.correlate`: uses the 
-			`~trigger.Correlate` class to compare data-streams.
-		- `~trigger.predom_period.ratio`: uses the 
-			`~trigger.Ratio` class to compare data-streams.
-	___________
-	.. rubric:: Example
-
-		Plot the data-streams:
-		>>> import trigger
-		>>> ... .plot()
-
+		- characteristic function(s).
+		- time derivative of the characteristic function(s).
+		- threshold.
+	_______
+	:rtype: 
+		- NumPy:class:`~numpy.ndarray` type int
+		- NumPy:class:`~numpy.ndarray` type int
+	:return: 
+		- trace of each candidate onset (zeros for a vector).
+		- sample of each candidate onset.
 	"""
 
-	def __init__(self, data, preprocessor='sumsquare', scales=[800], maxscale=1000 ): 
-
-		# stores input parameters
-		self.preprocessor = preprocessor
-		self.scales = scales
-		self.maxscale = maxscale
-
-		# get (station, scale, sample) array any way (for Trace & Stream inputs)
-		self.data, self.original_data = trace2stream(data.copy())
-
-	def output(self):
-		# Multiplex the pre-processed data
-		
-		from obspy.signal.tf_misfit import cwt
+	above = np.atleast_2d((dcharfct > thr_on) + (charfct > thr_on))
+	starts = above.copy()
+	starts[:, 1:] &= ~above[:, :-1]
 
-		(tmax,nmax) = streamdatadim(self.data)
-		nscale = len(self.scales)
-		channels = np.zeros(( 2, tmax, nscale**2, nmax )) 
-		l_windows = np.zeros(( 2, nscale**2 ))  
+	return np.nonzero(starts)
 
-		timeseries, scales = recursive(self.data, operation=self.preprocessor, scales=self.scales, maxscale=self.maxscale) 
-		d_timeseries, scales = recursive(self.data, operation='d-sumsquare', scales=self.scales, maxscale=self.maxscale)  
 
-		for trace_i, trace in enumerate(self.data):
+def onset_refinement(dcharfct, rows, on, before=10, periods=5):
+	"""
+	Moves onsets back to the previous decrease of the characteristic 
+	function (within a few samples), and sets the end of each event 
+	a few times farther than the next decrease, all candidates at 
+	once.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` ([trace,] samples).
+		- NumPy:class:`~numpy.ndarray` type int.
+		- NumPy:class:`~numpy.ndarray` type int.
+		- before: int (default 10, optional).
+		- periods: int (default 5, optional).
+	:param: 
+		- time derivative of the characteristic function(s).
+		- trace of each onset.
+		- sample of each onset.
+		- before: maximum shift of the onsets (in samples).
+		- periods: length of the events, in number of samples from 
+			the onset to the next decrease.
+	_______
+	:rtype: 
+		- NumPy:class:`~numpy.ndarray` type int
+		- NumPy:class:`~numpy.ndarray` type int
+	:return: 
+		- refined onsets.
+		- ends of the events.
+	_________
+	.. note::
 
-			for tserie_i in range((d_timeseries.shape)[1]):
-				channels[0, trace_i, :] += 2 * np.pi * (timeseries[trace_i, tserie_i, :] / (d_timeseries[trace_i, tserie_i, :]/trace.stats.delta))**.5
-			channels[0, trace_i, :] /= (d_timeseries.shape)[1]
+		The next and previous decreases of each onset are found in 
+		the sorted index of all decreasing samples, computed once.
 
-			fmin = 0.1
-			fmax=1./trace.stats.delta/2
+	"""
 
-			tf = np.abs(cwt(trace, trace.stats.delta, w0=6, fmin=fmin, fmax=fmax, nf=32))
-			f = np.logspace(np.log10(fmin), np.log10(fmax), tf.shape[0])
-			channels[1, trace_i, :] = 1./f[tf.argmax(axis=0)]
+	dcharfct = np.atleast_2d(dcharfct)
+	n = dcharfct.shape[-1]
+	rows = np.asarray(rows, dtype=np.int64)
+	on = np.asarray(on, dtype=np.int64)
 
-		return channels, nscale+1, l_windows
+	# index of decreasing samples, along traces
+	decreasing = np.flatnonzero(dcharfct < 0)
+	position = rows*n + on
 
-	def plot(self):
-		channels, n, l = self.output() 
-		return stream_multiplexor_plot( self.data, channels )
+	# next decrease from the onset (included)
+	i = np.searchsorted(decreasing, position)
+	following = decreasing[np.minimum(i, len(decreasing)-1)] if len(decreasing) else position
+	found = (i < len(decreasing)) & (following < (rows+1)*n)
+	of = on + periods*np.where(found, following-position, 0)
 
+	# last decrease in the previous samples (excluded)
+	i = np.searchsorted(decreasing, position)-1
+	preceding = decreasing[np.maximum(i, 0)] if len(decreasing) else position
+	found = (i >= 0) & (preceding >= position-before) & (preceding >= rows*n) & (on > 0)
+	on = on - np.where(found, position-1-preceding, 0)
 
+	return on, of
 
 
-def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=True, onset_refine=True):
+def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=True, onset_refine=True, period='cwt'):
 	"""
 	Calculate trigger on and off times.
 
@@ -1381,9 +4616,17 @@ def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=T
 	:type max_len_delete: bool
 	:param max_len_delete: Do not write events longer than max_len into
 	                       report file.
+	:type period: str
+	:param period: Method of `~trigger.local_period`, used to estimate
+	               the predominant period only around each event.
 	:rtype: List
-	:return: Nested List of trigger on and of times in samples
+	:return: Nested List of trigger on and of times in samples (or 
+	         the pick array of `~trigger.trigger_onsets` for a 2-D 
+	         charfct and a Stream)
 	"""
+	if isinstance(charfct, RaggedTraces) or np.ndim(charfct) == 2:
+		return trigger_onsets(charfct, thr_on, trace, thr_off, max_len_delete, onset_refine, period)
+
 	# 1) find indices of samples greater than threshold
 	# 2) calculate trigger "of" times by the gap in trigger indices
 	#    above the threshold i.e. the difference of two following indices
@@ -1399,7 +4642,6 @@ def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=T
 	#    the signal is above thr_on
 
 	from collections import deque
-	from obspy.signal.tf_misfit import cwt
 	
 	if thr_off is None:
 		thr_off = thr_on/2.
@@ -1407,48 +4649,19 @@ def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=T
 	thr_d = .5
 	n=2
 
-	dtrace = np.gradient(abs(trace.data))
-	dcharfct = np.gradient(charfct.copy())
-	acharfct = np.gradient(dcharfct.copy())
+	dcharfct = np.gradient(charfct)
 
-	if isinstance(trace, Trace):
-		fmin = 0.1
-		fmax=1./trace.stats.delta/2
-		tf = np.abs(cwt(trace, trace.stats.delta, w0=6, fmin=fmin, fmax=fmax, nf=32))
-		f = np.logspace(np.log10(fmin), np.log10(fmax), tf.shape[0])
-		tp = 1./f[tf.argmax(axis=0)]
-	else:
+	if not isinstance(trace, Trace):
 		max_len_delete=False
 
-	ind1 = np.where( (dcharfct > thr_on) + (charfct > thr_on) )[0] #(charfct > thr_on) + (smoothed_dcharfct > thr_on*thr_d) )[0]
+	on = onset_candidates(charfct, dcharfct, thr_on)[1]
 
-	if len(ind1) == 0:
+	if len(on) == 0:
 	    return []
-	
-	on = deque([ind1[0]])
-
-	# last occurence is missed by the diff, add it manually
-	on.extend(ind1[np.where(np.diff(ind1) > 1)[0] + 1].tolist())
 
 	# shift where each onset begins 
 	if onset_refine:
-		of = deque([])
-		for e in range(len(on)): 
-			#print on[e]
-			tmax =  on[e] + np.argmax( dcharfct[on[e]:]<0 )
-			onset_period =  on[e] + 5*np.argmax( dcharfct[on[e]:]<0 )
-			on[e] = on[e] - (np.argmax( np.fliplr(np.atleast_2d(dcharfct[np.max([0,on[e]-10]):on[e]]))[0]<0 ) )
-			# for t in range(on[e]-1,0,-1): 
-			# 	if np.max(dcharfct[np.max([0,t-10]):t]) >= 0. : 
-			# 		on[e] = t
-			# 		if dcharfct[np.max([0,t-1])] < 0. or np.min(charfct[np.max([0,t-10]):t-1]) >= charfct[t+1] : #np.sum(dcharfct[np.max([0,t-10]):tmax]) >= np.sum(dcharfct[t:tmax])*.85:  #or np.sum(dtrace[np.max([0,t-10]):tmax]) >= np.sum(dtrace[t:tmax]):
-			# 			break
-			# 	# else:
-			# 	# 	break
-			#onset_period =  tmax + np.argmax( charfct[tmax:] < charfct[on[e]] + (charfct[tmax]-charfct[on[e]])/2. )
-			#onset_period =  on[e]+ ((np.mean( tp[on[e]: np.min([onset_period, len(dcharfct)-1]) ]))/tr.stats.delta)
-			of.extend([onset_period])
-			#print '   ->',on[e],of[e],onset_period
+		on, of = onset_refinement(dcharfct, np.zeros(len(on), dtype=int), on)
 	else:
 		of = deque([-1])
 
@@ -1474,7 +4687,7 @@ def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=T
 
 		if max_len_delete:
 			trig_d = (of[e]-on[e])*trace.stats.delta
-			trig_p = np.mean( tp[on[e]:of[e] ])
+			trig_p = np.mean( local_period(trace, on[e], of[e], period) )
 			if trig_d < (trig_p*2/3.) : #or trig_d > (trig_p*5/3.)
 				# on.popleft()
 				# of.popleft()
@@ -1487,6 +4700,304 @@ def trigger_onset(charfct, thr_on=.1, trace=None, thr_off=None, max_len_delete=T
 	return np.array(pick, dtype=np.int64)
 
 
+def trigger_onsets(charfct, thr_on=.1, stream=None, thr_off=None, max_len_delete=True, onset_refine=True, period='cwt'):
+	"""
+	Calculates trigger on and off times of many traces at once, as 
+	`~trigger.trigger_onset`.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` (trace, samples) or 
+			`~trigger.RaggedTraces`.
+		- thr_on: float (default .1, optional).
+		- stream: ObsPy:class:`~obspy.core.stream` (optional).
+		- other parameters: see `~trigger.trigger_onset`.
+	:param: 
+		- characteristic functions (e.g. from `~trigger.Correlate`).
+		- thr_on: threshold.
+		- stream: traces of the characteristic functions (for ids 
+			and the deletion of short events).
+		- other parameters: see `~trigger.trigger_onset`.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` structured array.
+	:return: fields trace (index), id, on and off (samples) of each 
+		pick, sorted by trace and onset.
+	_________
+	.. note::
+
+		Padded characteristic functions are processed all at once 
+		(candidates, time derivatives and refinement), ragged ones 
+		(or without refinement) trace by trace.
+
+	"""
+
+	if isinstance(charfct, RaggedTraces) or not onset_refine:
+		rows, on, of = [], [], []
+		for t in range(len(charfct)):
+			picks = np.asarray(trigger_onset(np.asarray(charfct[t]), thr_on, None, thr_off, False, onset_refine, period), dtype=np.int64).reshape(-1, 2)
+			rows.extend([t]*len(picks))
+			on.extend(picks[:, 0])
+			of.extend(picks[:, 1])
+		rows, on, of = np.asarray(rows, dtype=np.int64), np.asarray(on, dtype=np.int64), np.asarray(of, dtype=np.int64)
+	else:
+		charfct = np.asarray(charfct)
+		dcharfct = np.gradient(charfct, axis=-1)
+		rows, on = onset_candidates(charfct, dcharfct, thr_on)
+		on, of = onset_refinement(dcharfct, rows, on)
+
+	periods = None
+	if max_len_delete and stream is not None:
+		periods = np.zeros(len(on))
+		keep = np.ones(len(on), dtype=bool)
+		for e in range(len(on)):
+			trace = stream[rows[e]]
+			trig_d = (of[e]-on[e])*trace.stats.delta
+			periods[e] = trig_p = np.mean( local_period(trace, on[e], of[e], period) )
+			keep[e] = not trig_d < (trig_p*2/3.)
+		rows, on, of, periods = rows[keep], on[keep], of[keep], periods[keep]
+
+	return pick_table(rows, on, of, stream, charfct, periods)
+
+
+def pick_table(rows, on, of, stream=None, charfct=None, periods=None):
+	"""
+	Returns the structured array of picks of `~trigger.trigger_onsets`.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` type int (x3).
+		- stream: ObsPy:class:`~obspy.core.stream` (optional).
+		- charfct: NumPy:class:`~numpy.ndarray` (trace, samples) or 
+			`~trigger.RaggedTraces` (optional).
+		- periods: NumPy:class:`~numpy.ndarray` (optional).
+	:param: 
+		- trace, onset and end of each pick (samples).
+		- stream: traces of the characteristic functions (for ids 
+			and times).
+		- charfct: characteristic functions (for peaks).
+		- periods: predominant period of each pick (in seconds).
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` structured array.
+	:return: fields trace, id, on and off (samples), time (of the 
+		onset, in seconds since 1970-01-01 UTC), peak (maximum of 
+		the characteristic function from on to off) and period, NaN 
+		when unknown. See `~trigger.obspy_picks`.
+	"""
+
+	rows = np.asarray(rows, dtype=np.int64)
+	on = np.asarray(on, dtype=np.int64)
+	of = np.asarray(of, dtype=np.int64)
+
+	ids = [tr.id for tr in stream] if stream is not None else ['']
+	picks = np.zeros(len(on), dtype=[('trace', np.int64), ('id', str, max([1]+[len(i) for i in ids])), ('on', np.int64), ('off', np.int64), ('time', np.float64), ('peak', np.float64), ('period', np.float64)])
+	picks['trace'] = rows
+	picks['on'] = on
+	picks['off'] = of
+	picks['time'] = picks['peak'] = picks['period'] = np.nan
+
+	if stream is not None:
+		picks['id'] = np.asarray(ids)[rows]
+		starttimes = np.asarray([tr.stats.starttime.timestamp for tr in stream])
+		deltas = np.asarray([tr.stats.delta for tr in stream])
+		picks['time'] = starttimes[rows] + on*deltas[rows]
+
+	if charfct is not None and len(on):
+		# maxima of all windows at once, in the flat samples
+		if isinstance(charfct, RaggedTraces):
+			flat = charfct.data
+			first, end = charfct.offsets[rows], charfct.offsets[rows]+charfct.lengths[rows]
+		else:
+			charfct = np.atleast_2d(charfct)
+			flat = charfct.ravel()
+			first, end = rows*charfct.shape[-1], (rows+1)*charfct.shape[-1]
+		start = first + np.minimum(on, end-first-1)
+		stop = np.maximum(start+1, np.minimum(first+of+1, end))
+		bounds = np.ravel(np.c_[start, stop])
+		picks['peak'] = np.maximum.reduceat(np.append(flat, 0), bounds)[::2]
+
+	if periods is not None:
+		picks['period'] = periods
+
+	return picks
+
+
+def obspy_picks(picks, phase_hint=None):
+	"""
+	Returns the ObsPy picks of a structured array of picks.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` structured array.
+		- phase_hint: string (optional).
+	:param: 
+		- picks (e.g. from `~trigger.trigger_onsets` or 
+			`~trigger.network_picks`).
+		- phase_hint: phase of all picks (e.g. 'P').
+	_______
+	:rtype: list of ObsPy:class:`~obspy.core.event.Pick`
+	:return: automatic picks at the onset times.
+	"""
+
+	from obspy import UTCDateTime
+	from obspy.core.event import Pick, WaveformStreamID
+
+	return [Pick(time=UTCDateTime(pick['time']), waveform_id=WaveformStreamID(seed_string=pick['id']), phase_hint=phase_hint, evaluation_mode='automatic') for pick in picks]
+
+
+class OnlineTrigger(object):
+	"""
+	Picks characteristic functions chunk by chunk, as 
+	`~trigger.trigger_onsets` would on the whole data.
+	______
+	:type: 
+		- thr_on: float (default .1, optional).
+		- stream: ObsPy:class:`~obspy.core.stream` (optional).
+		- before: int (default 10, optional).
+		- periods: int (default 5, optional).
+	:param: 
+		- thr_on: threshold.
+		- stream: traces of the characteristic functions (for ids).
+		- before, periods: see `~trigger.onset_refinement`.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.OnlineTrigger.update`: returns the picks 
+			confirmed by a new chunk.
+		- `~trigger.OnlineTrigger.flush`: returns the picks still 
+			pending at the end of the data.
+	_________
+	.. note::
+
+		The last sample of each chunk is kept until the next one 
+		(its time derivative needs the following sample), as well as 
+		the last decrease of each trace (for the onset refinement) 
+		and the onsets waiting for their next decrease (for the end 
+		of the event). A pick is returned as soon as its next 
+		decrease is known, i.e. one sample later.
+
+		The short events are not deleted (max_len_delete=False in 
+		`~trigger.trigger_onsets`): the predominant period would 
+		need the signal after the end of the event.
+	___________
+	.. rubric:: Example
+
+		>>> import trigger
+		>>> data = trigger.artificial_stream(npts=5000)
+		>>> cf = trigger.Correlate(data).output()
+		>>> picker = trigger.OnlineTrigger(thr_on=.1, stream=data)
+		>>> picks = [picker.update(cf[:, i:i+512]) for i in range(0, cf.shape[1], 512)]
+		>>> picks.append(picker.flush())
+
+	"""
+
+	def __init__(self, thr_on=.1, stream=None, before=10, periods=5):
+
+		# stores input parameters
+		self.thr_on = thr_on
+		self.stream = stream
+		self.before = before
+		self.periods = periods
+
+		# state across chunks
+		self.done = 0
+		self.tail = None
+		self.above = None
+		self.decrease = None
+		self.pending = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+	def update(self, charfct):
+		"""
+		Returns the picks confirmed by a new chunk of characteristic 
+		function(s) ([trace,] samples), see `~trigger.pick_table`.
+		"""
+
+		charfct = np.atleast_2d(charfct)
+		if self.tail is None:
+			self.tail = charfct[:, :0]
+			self.above = np.zeros(len(charfct), dtype=bool)
+			self.decrease = -np.ones(len(charfct), dtype=np.int64)
+
+		data = np.concatenate((self.tail, charfct), axis=1)
+		if data.shape[1] < 2:
+			self.tail = data
+			return pick_table([], [], [], self.stream)
+
+		# derivatives are final up to the last sample excluded
+		first = 1 if self.done else 0
+		dcharfct = np.gradient(data, axis=-1)[:, first:-1]
+		self.tail = data[:, -2:]
+
+		return self.picks(data[:, first:-1], dcharfct)
+
+	def flush(self):
+		"""
+		Returns the picks still pending at the end of the data, see 
+		`~trigger.pick_table`.
+		"""
+
+		picks = []
+		if self.tail is not None and self.tail.shape[1]:
+			dcharfct = np.gradient(self.tail, axis=-1)[:, -1:] if self.tail.shape[1] > 1 else np.zeros_like(self.tail)
+			picks = self.picks(self.tail[:, -1:], dcharfct)
+
+		# no next decrease in the data
+		rows, position, on = self.pending
+		self.pending = rows[:0], position[:0], on[:0]
+		flushed = pick_table(rows, on, position, self.stream)
+		self.tail = self.tail[:, :0] if self.tail is not None else None
+
+		return np.concatenate((picks, flushed)) if len(picks) else flushed
+
+	def picks(self, charfct, dcharfct):
+		"""
+		Updates the state with final samples and returns the 
+		confirmed picks.
+		"""
+
+		n = charfct.shape[-1]
+		stride = self.done + n + 1
+		trace = np.arange(len(charfct), dtype=np.int64)
+
+		# candidates, continuing the runs of the previous chunk
+		above = (dcharfct > self.thr_on) + (charfct > self.thr_on)
+		starts = above.copy()
+		starts[:, 0] &= ~self.above
+		starts[:, 1:] &= ~above[:, :-1]
+		rows, position = np.nonzero(starts)
+		position += self.done
+
+		# decreases of the chunk, after the last one of each trace
+		decreasing = np.flatnonzero(dcharfct < 0)
+		decreasing = (decreasing // n)*stride + self.done + decreasing % n
+		previous = (trace*stride + self.decrease)[self.decrease >= 0]
+		known = np.sort(np.concatenate((previous, decreasing)))
+
+		# onsets move back to the last decrease (excluded)
+		key = rows*stride + position
+		i = np.searchsorted(known, key)-1
+		preceding = known[np.maximum(i, 0)] if len(known) else key
+		found = (i >= 0) & (preceding >= key-self.before) & (preceding >= rows*stride) & (position > 0)
+		on = position - np.where(found, key-1-preceding, 0)
+
+		# ends of new and pending events at the next decrease (included)
+		rows = np.concatenate((self.pending[0], rows))
+		position = np.concatenate((self.pending[1], position))
+		on = np.concatenate((self.pending[2], on))
+		key = rows*stride + position
+		i = np.searchsorted(decreasing, key)
+		following = decreasing[np.minimum(i, len(decreasing)-1)] if len(decreasing) else key
+		found = (i < len(decreasing)) & (following < (rows+1)*stride)
+		of = position + self.periods*(following-key)
+
+		order = np.lexsort((position[found], rows[found]))
+		picks = pick_table(rows[found][order], on[found][order], of[found][order], self.stream)
+		self.pending = rows[~found], position[~found], on[~found]
+
+		# state for the next chunk
+		self.above = above[:, -1]
+		if len(decreasing):
+			np.maximum.at(self.decrease, decreasing // stride, decreasing % stride)
+		self.done += n
+
+		return picks
+
+
 def plot_trigger(show=True, charfct=None, thr_on=.1, trace=None, thr_off=None, **kwargs):
 	"""
 	Plot characteristic function of trigger along with waveform data and
@@ -1542,89 +5053,389 @@ def row_derivate(cf, **kwargs):
 
 	return (np.gradient(cf, **kwargs))[1]
 
-def row_kurtosis(cf, window=100, **kwargs):
+def row_kurtosis(cf, window=100, min_periods=None):
+	"""
+	Returns the rolling kurtosis of each row of cf (see 
+	`~trigger.rolling_kurtosis`). The other options of pandas 
+	rolling_kurt (freq, center, how) are not supported.
+	"""
+
+	return rolling_kurtosis(cf, window, min_periods)
+
+
+def window_view(data, length):
+	"""
+	Returns all the windows of samples of a trace, without copy.
+	______
+	:type: 
+		- NumPy:class:`~numpy.ndarray` vector.
+		- int
+	:param: 
+		- samples of e.g. a trace.
+		- number of samples of the windows.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` (windows, length)
+	:return: read-only view, the window i starts at sample i.
+	"""
+
+	from numpy.lib.stride_tricks import as_strided
 
-	return rolling_kurt(cf, window, **kwargs)
+	data = np.asarray(data)
+	view = as_strided(data, shape=(max(0, len(data)-length+1), length), strides=(data.strides[0], data.strides[0]))
+	view.flags.writeable = False
 
+	return view
 
-def stream_trim_cf(stream, cf, threshold=.2):
+
+def stream_trim_cf(stream, picks, before=.25, after=.25, cf=None):
 	"""
 	Extract wavelets of seismic body-wave arrival from continuous 
 	seismic records. 
 
-	In practice, it detects the onset of local maximum in the 
-	characteristic functions using `~trigger` and trims the related 
-	data.  
+	In practice, it cuts windows of the traces (and of their 
+	characteristic functions) around picks, all picks of a trace at 
+	once.
 	______
 	:type: 
 		- ObsPy:class:`~obspy.core.stream`.
+		- NumPy:class:`~numpy.ndarray` structured array.
+		- before: float (default .25, optional).
+		- after: float (default .25, optional).
+		- cf: NumPy:class:`~numpy.ndarray` (trace, samples) or 
+			`~trigger.RaggedTraces` (optional).
 	:param: 
 		- data of e.g. seismograms.
+		- picks, with fields trace and on (see 
+			`~trigger.pick_table`).
+		- before: duration of the windows before the onsets (in 
+			seconds, e.g. a dominant period).
+		- after: duration of the windows from the onsets (in 
+			seconds).
+		- cf: characteristic functions of the traces.
 	_______
 	:rtype: 
-		- 
+		- NumPy:class:`~numpy.ndarray` (picks, samples)
+		- NumPy:class:`~numpy.ndarray` (picks, samples) (if cf)
 	:return: 
-		- 
+		- wavelets, NaN beyond the traces (or beyond the window of 
+			traces of lower sampling rate).
+		- windows of the characteristic functions.
+	_________
+	.. note::
+
+		The windows are taken from `~trigger.window_view` of each 
+		trace: the only copy is the output.
 	___________
 	.. rubric:: Example
 
 		>>> import trigger
+		>>> data = trigger.artificial_stream(npts=5000)
+		>>> picks = trigger.network_picks(data, thr_on=.1)
+		>>> wavelets, cflets = trigger.stream_trim_cf(data, picks, cf=trigger.Correlate(data).output())
 
 	"""
-	l = 0.25 # dominant period
-
-	(tmax,nmax) = streamdatadim(stream)
-	cflets = np.zeros(( tmax, 2+(stream[0]).stats.sampling_rate*2 ))  
-	cflets[:] = np.nan
-
-	wavelets = stream.copy()
-	dcf = abs((np.gradient(cf))[1])
-	dcf = abs((np.gradient(dcf))[1])
-	dcf = abs((np.gradient(dcf))[1])
 
-	cflets = dcf.copy()
-	cflets *= (cf+(1-threshold))**2.
-	#cflets[cflets<threshold/100.] = 0.
-
-
-	# for t, trace in enumerate(wavelets):
+	rows = np.asarray(picks['trace'], dtype=np.int64)
+	on = np.asarray(picks['on'], dtype=np.int64)
+	rates = np.asarray([tr.stats.sampling_rate for tr in stream])
+	first = np.round(before*rates).astype(np.int64)
+	length = first + np.round(after*rates).astype(np.int64)
+	nmax = int(np.max(length[rows])) if len(rows) else 0
+
+	sources = [[tr.data for tr in stream]]
+	if cf is not None:
+		sources.append([cf[t] for t in range(len(stream))])
+	outputs = [np.empty((len(rows), nmax)) for source in sources]
+	for output in outputs:
+		output[...] = np.nan
+
+	for t in np.unique(rows):
+		index = np.flatnonzero(rows == t)
+		start = on[index] - first[t]
+		for output, source in zip(outputs, sources):
+			data = np.asarray(source[t])
+			inside = (start >= 0) & (start+length[t] <= len(data))
+			if np.any(inside):
+				output[index[inside], :length[t]] = window_view(data, length[t])[start[inside]]
+			# windows over the ends of the trace
+			for i, s in zip(index[~inside], start[~inside]):
+				p, q = max(0, s), min(len(data), s+length[t])
+				if q > p:
+					output[i, p-s:q-s] = data[p:q]
+
+	if cf is None:
+		return outputs[0]
+	return tuple(outputs)
+
+
+class Pipeline(object):
+	"""
+	Describes the stages of a characteristic function (pre-processing 
+	with `~trigger.recursive`, multiplexing, `~trigger.Ratio` or 
+	`~trigger.Correlate` combination and `~trigger.trigger_onset` 
+	picking) and runs them batch of stations by batch of stations.
+	______
+	:type: 
+		- combination: string (default 'correlate', optional).
+		- multiplexor: string (default 'components', optional).
+		- preprocessor: string (optional).
+		- onset: dict (default 'None', optional).
+		- outputs: tuple (default ('cf',), optional).
+		- batch: int (default 16, optional).
+		- scales, maxscale, dtype, ragged, pyramid, workers, 
+			chunksize, scratch, and normalize for ratios or 
+			procscales for correlations (optional).
+	:param: 
+		- combination: 'ratio' or 'correlate'.
+		- multiplexor: 'shortlongterms', 'leftrightterms' or 
+			'components' (or their short names, see 
+			`~trigger.Ratio`).
+		- preprocessor: operation of `~trigger.recursive` (by 
+			default, the one of `~trigger.Ratio` or 
+			`~trigger.Correlate`: 'averageabs' for ratios of terms, 
+			else 'rms'). As with `~trigger.Ratio`, components are 
+			always pre-processed with 'rms' for ratios.
+		- onset: keyword arguments of `~trigger.trigger_onset` 
+			(thr_on, thr_off, ...), no picking by default.
+		- outputs: results returned by `~trigger.Pipeline.run`, 
+			among 'cf', 'picks' (onsets and ends of each trace) and 
+			'table' (see `~trigger.pick_table`).
+		- batch: maximum number of traces processed at once.
+		- other keyword arguments are given to the stages (see 
+			`~trigger.recursive`, `~trigger.Ratio` and 
+			`~trigger.Correlate`), TypeError is raised for the 
+			others.
+	___________
+	.. rubric:: _`Default Attributes`
+		- `~trigger.Pipeline.compile`: returns the execution plan.
+		- `~trigger.Pipeline.run`: returns the results for a 
+			data-stream.
+	_________
+	.. note::
 
-	# 	cf[t][:trace.stats.sampling_rate]=0
+		Each batch holds whole three-component sets and goes 
+		through all the stages before the next one. Its 
+		intermediate arrays are released as soon as they are 
+		consumed, so the memory is the one of the widest stage for 
+		one batch, plus the outputs. The characteristic function is 
+		not kept if only picks are requested.
 
-	# 	pick = np.argmax(cf[t])
-	# 	if pick > 0 :
-	# 		#pick += np.argmax(dcf[t][pick - l/trace.stats.delta : pick + l/trace.stats.delta ]) - l/trace.stats.delta
+		Traces are processed at their own length (as with 
+		ragged=True), with the scales of the whole data-stream.
 
-	# 		pick += np.argmax(dcf[t][pick - l/trace.stats.delta : pick ]) - l/trace.stats.delta
+		When the characteristic function is not requested, the 
+		workers share the batches instead of the channels of each 
+		stage: only the picks of each batch are sent back.
+	___________
+	.. rubric:: Example
 
-	# 		pick += np.argmax(d2cf[t][pick - l/trace.stats.delta/10 : pick ]) - l/trace.stats.delta/10
+		>>> import trigger
+		>>> pipeline = trigger.Pipeline('correlate', onset={'thr_on':.1}, outputs=('cf', 'picks'))
+		>>> cf, picks = pipeline.run(trigger.artificial_stream(npts=5000))
 
-	# 		# noise_cf = [ np.nanmedian(cf[t][pick - l/trace.stats.delta : pick ]), np.nanstd(cf[t][pick - l/trace.stats.delta : pick ]) ]
-	# 		# pick += np.argmax(cf[t][pick - l/trace.stats.delta : pick ]>noise_cf[0]+noise_cf[1]) - l/trace.stats.delta
+	"""
 
-	# 	wlstart = trace.stats.starttime + pick*trace.stats.delta - l
-	# 	wlend = trace.stats.starttime + pick*trace.stats.delta  + l
-	# 	trace.trim(wlstart, wlend)
-		
-	# 	test = cf[t][pick - l/trace.stats.delta : pick + l/trace.stats.delta ]
-	# 	cflets[t][:len(test)] = test
+	def __init__(self, combination='correlate', multiplexor='components', preprocessor=None, onset=None, outputs=('cf',), batch=16, **options):
 
-	# 	#plotTfr(trace.data, dt=trace.stats.delta, fmin=0.1, fmax=trace.stats.sampling_rate/2)
+		# same pre-processing as the combination classes (Ratio 
+		# leaves Components to its own)
+		if combination == 'ratio' and multiplexor in ('components', 'comp'):
+			preprocessor = 'rms'
+		elif preprocessor is None:
+			preprocessor = 'rms'
+			if combination == 'ratio':
+				preprocessor = 'averageabs'
 
+		# stores input parameters
+		self.combination = combination
+		self.multiplexor = multiplexor
+		self.preprocessor = preprocessor
+		self.onset = onset
+		self.outputs = outputs
+		self.batch = batch
+		self.options = options
+
+	def compile(self):
+		"""
+		Returns the execution plan: the list of (stage, parameters) 
+		needed by the requested outputs.
+		"""
+
+		# options of the combination stage
+		if self.combination == 'ratio':
+			combination, names = Ratio, ('workers', 'chunksize', 'normalize')
+		elif self.combination == 'correlate':
+			combination, names = Correlate, ('workers', 'chunksize', 'procscales')
+		else:
+			raise ValueError('unknown combination: %s' % self.combination)
+		if self.multiplexor not in ('shortlongterms', 'stlt', 'leftrightterms', 'ltrt', 'components', 'comp'):
+			raise ValueError('unknown multiplexor: %s' % self.multiplexor)
+		for name in self.options:
+			if name not in names + ('scales', 'maxscale', 'dtype', 'ragged', 'pyramid', 'scratch'):
+				raise TypeError("unexpected option for the %s pipeline: '%s'" % (self.combination, name))
+
+		options = dict(self.options)
+		plan = []
+		plan.append(('recursive', dict(operation=self.preprocessor, scales=options.pop('scales', None), maxscale=options.pop('maxscale', None), dtype=options.pop('dtype', np.float), pyramid=options.pop('pyramid', None), scratch=options.pop('scratch', None), workers=options.get('workers'))))
 
+		if self.multiplexor in ('shortlongterms', 'stlt'):
+			plan.append(('multiplex', dict(multiplexor=ShortLongTerms)))
+		elif self.multiplexor in ('leftrightterms', 'ltrt'):
+			plan.append(('multiplex', dict(multiplexor=LeftRightTerms)))
+		elif self.multiplexor in ('components', 'comp'):
+			plan.append(('multiplex', dict(multiplexor=Components)))
+
+		ragged = options.pop('ragged', False)
+		plan.append(('combine', dict(combination=combination, options=options)))
+
+		# intermediates nobody consumes are skipped
+		if 'picks' in self.outputs or 'table' in self.outputs:
+			plan.append(('onset', dict(self.onset or {})))
+		if 'cf' in self.outputs:
+			plan.append(('assemble', dict(ragged=ragged)))
+
+		return plan
+
+	def batches(self, data):
+		"""
+		Returns the trace indexes of each batch, keeping together the 
+		three-component sets.
+		"""
+
+		groups = [[t] for t in range(len(data))]
+		if self.multiplexor in ('components', 'comp'):
+			groups = [sorted(sum(group.values(), [])) for group in ComponentIndex(data).groups.values()]
+			groups.sort()
+
+		batches = []
+		for group in groups:
+			if batches and len(batches[-1])+len(group) <= self.batch:
+				batches[-1].extend(group)
+			else:
+				batches.append(list(group))
+
+		return batches
+
+	def run(self, data):
+		"""
+		Returns the requested outputs (see `~trigger.Pipeline`) for 
+		a data-stream.
+		"""
+
+		plan = OrderedDict(self.compile())
+		data, input_data = trace2stream(data)
+		(tmax,nmax) = streamdatadim(data)
+
+		# the scales of the whole data-stream
+		recursive_options = dict(plan['recursive'])
+		if recursive_options['scales'] is None:
+			recursive_options['scales'] = default_scales(nmax, recursive_options['maxscale'])
+		scales = recursive_options.pop('scales')
+		operation = recursive_options.pop('operation')
+
+		cf = None
+		if 'assemble' in plan:
+			cf = RaggedTraces([tr.stats.npts for tr in data], dtype=recursive_options['dtype'], scratch=recursive_options['scratch'])
+
+		# without characteristic function to assemble, batches of 
+		# stations run in parallel (their stages one process each)
+		workers = recursive_options['workers']
+		combine_options = dict(plan['combine']['options'])
+		if cf is None and workers is not None and workers > 1:
+			recursive_options['workers'] = combine_options['workers'] = None
+		else:
+			workers = None
+
+		def process(batch):
+			stream = Stream([data[t] for t in batch])
+
+			# one batch through all the stages
+			combination = plan['combine']['combination'](stream, multiplexor=self.multiplexor, preprocessor=operation, scales=scales, maxscale=recursive_options['maxscale'], dtype=recursive_options['dtype'], ragged=True, pyramid=recursive_options['pyramid'], scratch=recursive_options['scratch'], **combine_options)
+			if combination.chunksize is None:
+				multiplexor = combination.select()
+				pre_processed = recursive(stream.copy(), scales, operation, ragged=True, **recursive_options)[0]
+				channels = multiplexor.multiplex(pre_processed)
+				del pre_processed
+				if isinstance(combination, Correlate):
+					batch_cf = combination.combine(channels, nmax)
+				else:
+					batch_cf = combination.combine(channels)
+				del channels, combination.pre_processed_data
+			else:
+				batch_cf = combination.output()
+
+			table = None
+			if 'onset' in plan:
+				table = trigger_onsets(batch_cf, stream=stream, **plan['onset'])
+				table['trace'] = np.asarray(batch)[table['trace']]
+			if cf is not None:
+				for i, t in enumerate(batch):
+					cf[t] = batch_cf[i]
+
+			return table
+
+		tables = forked_map(process, [(batch,) for batch in self.batches(data)], workers)
+
+		table = picks = None
+		if 'onset' in plan:
+			ids = max([1]+[len(tr.id) for tr in data])
+			table = pick_table([], [], [], data)
+			if tables:
+				table = np.concatenate([t.astype(t.dtype.descr[:1]+[('id', str, ids)]+t.dtype.descr[2:]) for t in tables])
+			table = table[np.argsort(table['trace'], kind='mergesort')]
+			bounds = np.searchsorted(table['trace'], np.arange(tmax+1))
+			picks = [np.c_[table['on'][i:j], table['off'][i:j]] for i, j in zip(bounds[:-1], bounds[1:])]
+
+		if cf is not None and not plan['assemble']['ragged']:
+			cf = cf.padded()
+
+		results = {'cf': cf, 'picks': picks, 'table': table}
+		if len(self.outputs) == 1:
+			return results[self.outputs[0]]
+		return tuple(results[output] for output in self.outputs)
+
+
+
+def network_picks(data, thr_on=.1, combination='correlate', multiplexor='components', workers=None, onset=None, **options):
+	"""
+	Picks a whole data-stream: characteristic function and onsets of 
+	all stations, in parallel.
+	______
+	:type: 
+		- ObsPy:class:`~obspy.core.stream`.
+		- thr_on: float (default .1, optional).
+		- combination: string (default 'correlate', optional).
+		- multiplexor: string (default 'components', optional).
+		- workers: int (optional).
+		- onset: dict (optional).
+		- other keyword arguments (optional).
+	:param: 
+		- data of e.g. seismograms.
+		- thr_on: threshold of `~trigger.trigger_onsets`.
+		- combination, multiplexor: see `~trigger.Pipeline`.
+		- workers: number of processes sharing the batches of 
+			stations (see `~trigger.forked_map`).
+		- onset: other keyword arguments of 
+			`~trigger.trigger_onsets` (thr_off, period, ...).
+		- other keyword arguments are given to 
+			`~trigger.Pipeline`.
+	_______
+	:rtype: NumPy:class:`~numpy.ndarray` structured array.
+	:return: picks of all traces (see `~trigger.pick_table`), 
+		to be converted with `~trigger.obspy_picks` if needed.
+	___________
+	.. rubric:: Example
 
-	# # nfft=(wavelets[0]).stats.sampling_rate
-	# # spec = np.zeros((tmax, nfft // 2 + 1), dtype=np.complex)
+		>>> import trigger
+		>>> picks = trigger.network_picks(trigger.artificial_stream(npts=5000), thr_on=.1, workers=4)
+		>>> events = trigger.obspy_picks(picks, phase_hint='P')
 
-	# # fig = plt.figure()
-	# # ax = fig.gca() 
-	# # f_lin = np.linspace(0, 0.5 / (wavelets[0]).stats.delta, nfft // 2 + 1)
+	"""
 
-	# # for t, trace in enumerate(wavelets): 
-	# # 	spec[t] = np.abs( np.fft.rfft(trace.data, n=int(nfft)) * trace.stats.delta ) ** 2
-	# # 	ax.semilogx(f_lin, spec[t])
+	onset = dict(onset or {}, thr_on=thr_on)
+	pipeline = Pipeline(combination, multiplexor, onset=onset, outputs=('table',), workers=workers, **options)
 
-	return wavelets, cflets
+	return pipeline.run(data)
 
 
 # def ggg(...):
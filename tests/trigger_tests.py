@@ -0,0 +1,870 @@
+from nose.tools import *
+import gc
+import os
+import shutil
+import tempfile
+import numpy as np
+from multiprocessing import Pool
+from pandas import DataFrame
+from obspy import UTCDateTime, Stream, Trace
+from NnK import trigger
+
+
+def mixed_stream(npts=4000, short=3000):
+	"""
+	Artificial stream with one trace shorter than the others.
+	"""
+	stream = trigger.artificial_stream(npts=npts)[:3]
+	stream[1].data = stream[1].data[:short]
+	return stream
+
+
+def stitched_chunks(stream, operation, chunksize):
+	"""
+	Stitches the chunks of `~trigger.recursive_chunks`.
+	"""
+	output = None
+	for start, stop, timeseries, scales in trigger.recursive_chunks(stream.copy(), operation=operation, chunksize=chunksize):
+		if output is None:
+			output = np.zeros(timeseries.shape[:-1] + (max(len(tr.data) for tr in stream),))
+		output[..., start:stop] = timeseries
+	return output
+
+
+def rolling_baseline(data, scale, operation):
+	"""
+	Direct pandas rolling window of one scale of pre-processed data.
+	"""
+	values = DataFrame(np.abs(data) if operation.endswith('abs') else data)
+	if operation in ('rms', 'sumsquare'):
+		values = values**2
+	rolling = values.rolling(scale)
+	if operation == 'mad':
+		return np.maximum(rolling.apply(lambda w: np.median(np.abs(w-np.median(w))), raw=True).values[:, 0], np.finfo(np.float).tiny)
+	if operation.startswith('sum'):
+		output = rolling.sum()
+	elif operation in ('average', 'averageabs', 'rms'):
+		output = rolling.mean()
+	elif operation.startswith('percentile'):
+		output = rolling.quantile(float(operation[10:])/100.)
+	else:
+		output = rolling.median()
+	output = output.values[:, 0]
+	if operation == 'rms':
+		output **= .5
+	return np.maximum(output, np.finfo(np.float).tiny)
+
+
+def check_rolling_mad(data, window, chunk):
+	mad = trigger.rolling_mad(data, window, chunk=chunk)
+	assert_equal(mad.dtype, np.result_type(data, np.float32))
+	for row, values in zip(data, mad):
+		for i in range(row.shape[-1]):
+			window_values = row[max(0, i-window+1):i+1]
+			assert_equal(values[i], np.median(np.abs(window_values-np.median(window_values))))
+
+
+def test_rolling_mad():
+	random = np.random.RandomState(0)
+	for window in (1, 2, 7, 50):
+		# chunks shorter and longer than the windows, ties
+		yield check_rolling_mad, random.randn(2, 300), window, 1000
+		yield check_rolling_mad, random.randn(2, 300), window, 37
+		yield check_rolling_mad, random.randint(0, 4, (2, 300)).astype(np.float), window, 64
+	yield check_rolling_mad, random.randn(1, 300).astype(np.float32), 20, 100
+
+
+def test_spike_mask_glitch():
+	dt = np.abs(np.random.RandomState(0).randn(2000))
+	glitched = dt.copy()
+	glitched[1000] = 1e6
+	keep = trigger.spike_mask(dt, 100)
+	keep_glitched = trigger.spike_mask(glitched, 100)
+	assert_false(keep_glitched[1000])
+	# nothing changes out of the windows of the glitch
+	outside = (np.arange(2000) < 1000) | (np.arange(2000) >= 1100)
+	assert_true(np.array_equal(keep[outside], keep_glitched[outside]))
+	# the global threshold is skewed by the glitch
+	assert_true(np.sum(trigger.spike_mask(glitched)) > np.sum(trigger.spike_mask(dt)))
+
+
+def test_filterbank():
+	stream = trigger.artificial_stream(npts=1000)[:3]
+	scales = [16, 64, 128]
+	bank = trigger.filterbank(stream[0].stats.sampling_rate, scales)
+	filtered = bank.filter(np.asarray([tr.data for tr in stream], dtype=np.float))
+	for t, tr in enumerate(stream):
+		for n in range(len(scales)-1):
+			expected = tr.copy().filter('highpass', freq=1/(scales[n+1]*tr.stats.delta), corners=4, zerophase=True).data
+			assert_true(np.allclose(filtered[t, n], expected, rtol=1e-10, atol=1e-12*np.abs(expected).max()), 'trace %d at scale %d' % (t, scales[n]))
+		# the largest scale is not filtered
+		assert_true(np.array_equal(filtered[t, -1], tr.data))
+
+
+def test_filterbank_cache():
+	cachesize = trigger.filterbank_cachesize
+	trigger.filterbank_cachesize = 2
+	try:
+		first = trigger.filterbank(100, [16, 64])
+		assert_true(trigger.filterbank(100., np.asarray([16, 64])) is first)
+		second = trigger.filterbank(100, [16, 128])
+		assert_false(second is first)
+		# the least recently used one is evicted
+		trigger.filterbank(100, [16, 64])
+		trigger.filterbank(50, [16, 64])
+		assert_equal(len(trigger._filterbanks), 2)
+		assert_true(trigger.filterbank(100, [16, 64]) is first)
+		assert_false(trigger.filterbank(100, [16, 128]) is second)
+	finally:
+		trigger.filterbank_cachesize = cachesize
+
+
+def baseline_sums(data, s, operation):
+	"""
+	One scale of the original per-scale loop of `~trigger.recursive`.
+	"""
+	npts = len(data)
+	if operation == 'averageabs':
+		data = np.abs(data)
+	csqr = (data**2 if operation == 'rms' else data).cumsum()
+	output = np.zeros(npts)
+	output[s:] = csqr[s:] - csqr[:npts-s]
+	if operation != 'sum':
+		output /= s
+	output[1:s] = csqr[1:s] - csqr[0]
+	if operation != 'sum':
+		output[1:s] = output[1:s]/np.asarray(range(1, s), dtype=np.float32)
+	output[1:s] = output[1:s]+(output[1:s]-output[1])*np.asarray(range(s, 1, -1), dtype=np.float32)/s
+	f = np.cumsum(output)
+	output[0:s] = (f[s+1]-f[0:s])/np.asarray(range(s+1,1,-1), dtype=np.float32)
+	output[output < np.finfo(0.0).tiny] = np.finfo(0.0).tiny
+	if operation == 'rms':
+		output **= .5
+	return output
+
+
+def test_multiscale_sums_bitwise():
+	# scale divisions not exact in single precision
+	scales = [20, 50, 100]
+	data = np.random.RandomState(0).randn(len(scales), 1000)
+	for operation in ('sum', 'average', 'averageabs', 'rms'):
+		timeseries = trigger.multiscale_sums(data, scales, operation)
+		for k, scale in enumerate(scales):
+			assert_true(np.array_equal(timeseries[k], baseline_sums(data[k], scale, operation)), '%s at scale %d' % (operation, scale))
+
+
+def check_chunks(stream, operation, chunksize=700):
+	full = trigger.recursive(stream.copy(), operation=operation)[0]
+	chunked = stitched_chunks(stream, operation, chunksize)
+	assert_equal(chunked.shape, full.shape)
+	assert_true(np.allclose(chunked, full, rtol=1e-6, atol=0))
+
+
+def test_chunks():
+	for operation in ('rms', 'sum', 'averageabs', 'median'):
+		yield check_chunks, trigger.artificial_stream(npts=3000)[:3], operation
+
+
+def test_chunks_mixed_lengths_robust():
+	for operation in ('median', 'mad'):
+		yield check_chunks, mixed_stream(), operation
+
+
+def test_chunks_below_largest_scale():
+	# chunks shorter than the head of the first samples
+	for chunksize in (513, 400, 33):
+		for operation in ('rms', 'averageabs', 'mad'):
+			yield check_chunks, trigger.artificial_stream(npts=3000)[:3], operation, chunksize
+
+
+def check_operation(operation):
+	stream = trigger.artificial_stream(npts=2000)[:2]
+	scales = [16, 64, 100]
+	timeseries = trigger.recursive(stream.copy(), scales=scales, operation=operation)[0]
+
+	# same detrending and tapering as recursive
+	stream.detrend('linear')
+	stream.taper(.05, type='triang', max_length=10)
+	for t, tr in enumerate(stream):
+		data = trigger.recursive_preprocessing(tr.data.astype(np.float), scales, operation, tr.stats.sampling_rate)
+		for k, scale in enumerate(scales):
+			# the first samples have truncated windows
+			ok = np.allclose(timeseries[t, k, max(scales)+2:], rolling_baseline(data[k], scale, operation)[max(scales)+2:], rtol=1e-7, atol=0)
+			assert_true(ok, '%s of trace %d at scale %d' % (operation, t, scale))
+
+
+def test_operations():
+	for operation in ('sum', 'sumabs', 'sumsquare', 'average', 'averageabs', 'rms', 'median', 'medianabs', 'mad', 'percentile90'):
+		yield check_operation, operation
+
+
+def stitched_packets(online, stream, seconds):
+	"""
+	Stitches the outputs of `~trigger.OnlineMultiplexor` fed with
+	packets of a stream (nan where nothing is returned).
+	"""
+	npts = stream[0].stats.npts
+	output = None
+	for packet in stream.slide(window_length=seconds-stream[0].stats.delta, step=seconds):
+		channels, n, l_windows = online.feed(packet)
+		if output is None:
+			output = np.zeros(channels.shape[:-1] + (npts,)) + np.nan
+		for t, tr in enumerate(packet):
+			i = int(round((online.starttimes[t]-stream[t].stats.starttime)*tr.stats.sampling_rate))
+			k = min(channels.shape[-1], npts-i)
+			output[:, t, :, i:i+k] = channels[:, t, :, :k]
+	return output
+
+
+def check_online_multiplexor(multiplexor, seconds):
+	stream = trigger.artificial_stream(npts=3000)
+	online = trigger.OnlineMultiplexor(multiplexor)
+	streamed = stitched_packets(online, stream, seconds)
+	# the batch multiplexor of the whole stream in one packet
+	timeseries = trigger.OnlineRecursive(operation=online.preprocessor).feed(stream)[0]
+	batch = {'leftrightterms': trigger.LeftRightTerms, 'components': trigger.Components}[multiplexor]
+	expected = batch(stream.copy(), scales=online.scales).multiplex(timeseries)[0]
+	compared = ~np.isnan(streamed) & ~np.isnan(expected)
+	assert_true(np.sum(compared) > .8*expected.size)
+	assert_true(np.allclose(streamed[compared], expected[compared], rtol=1e-9, atol=0))
+
+
+def test_online_multiplexor():
+	for multiplexor in ('leftrightterms', 'components'):
+		for seconds in (1., 2.5):
+			yield check_online_multiplexor, multiplexor, seconds
+
+
+def test_online_multiplexor_silent_component():
+	stream = trigger.artificial_stream(npts=6000)
+	rate = int(stream[0].stats.sampling_rate)
+	online = trigger.OnlineMultiplexor('components', maxlag=rate*3//2)
+	capacity = None
+	for packet in stream.slide(window_length=1.-stream[0].stats.delta, step=1.):
+		if packet[0].stats.starttime - stream[0].stats.starttime > 3:
+			packet = packet.select(id='Test.A..[ZN]')
+		channels, n, l_windows = online.feed(packet)
+		if capacity is None:
+			capacity = online.pending['Test.A..Z'].buf.shape[-1]
+	assert_true('Test.A..E' not in online.pending)
+	# the other components are returned again without waiting
+	assert_equal(channels.shape[-1], rate)
+	assert_true(np.all(channels[1, 0] > 0))
+	assert_true(np.all(channels[2, 0] == 0))
+	assert_equal(online.pending['Test.A..Z'].buf.shape[-1], capacity)
+	assert_equal(online.pending['Test.A..Z'].npts, 0)
+
+
+def test_online_shortlongterms_scales():
+	assert_raises(ValueError, trigger.OnlineMultiplexor, 'shortlongterms', scales=[32, 64])
+
+
+def check_workers(combination, chunksize):
+	stream = trigger.artificial_stream(npts=3000)
+	expected = combination(stream.copy(), chunksize=chunksize).output()
+	pools = []
+	def counted(*args, **kwargs):
+		pools.append(args)
+		return Pool(*args, **kwargs)
+	trigger.Pool = counted
+	try:
+		cf = combination(stream.copy(), chunksize=chunksize, workers=2).output()
+	finally:
+		trigger.Pool = Pool
+	assert_true(np.array_equal(np.isnan(cf), np.isnan(expected)))
+	assert_true(np.array_equal(np.nan_to_num(cf), np.nan_to_num(expected)))
+	if chunksize is not None:
+		# one pool for all chunks
+		assert_equal(len(pools), 1)
+
+
+def test_workers():
+	for combination in (trigger.Ratio, trigger.Correlate):
+		for chunksize in (None, 700):
+			yield check_workers, combination, chunksize
+
+
+def test_pyramid_block_ends():
+	data = np.random.RandomState(0).randn(2, 3, 10000)
+	scales = [100, 512, 1024]
+	for operation in ('sum', 'averageabs', 'rms'):
+		full = trigger.multiscale_sums(data, scales, operation)
+		pyramid = trigger.multiscale_pyramid(data, scales, operation, samples=32)
+		for k, (scale, d) in enumerate(zip(scales, (2, 16, 32))):
+			# exact where the decimated windows end
+			ends = np.arange(scale//d, 10000//d+1)*d - 1
+			ends = ends[ends >= scale+2]
+			assert_true(np.allclose(pyramid[:, k, ends], full[:, k, ends], rtol=1e-9, atol=0))
+
+
+def test_pyramid_chunks():
+	stream = trigger.artificial_stream(npts=3000)
+	assert_raises(ValueError, list, trigger.ShortLongTerms(stream, pyramid=32).chunks(700))
+	assert_raises(ValueError, trigger.Ratio(stream, chunksize=700, pyramid=32).output)
+
+
+def test_stream_indexes():
+	stream = trigger.artificial_stream(npts=1000)
+	stream[1].stats.sampling_rate = 50.
+	stream[2].stats.starttime += 5
+	stream[3].data = stream[3].data[:600]
+	table = trigger.stream_table(stream)
+	for query in (dict(), dict(station='A'), dict(station='[AP]'), dict(channel='*Z'), dict(id='Test.P..?'), dict(network='Test', channel='E'), dict(npts=1000), dict(station='Q')):
+		expected = [t for t, tr in enumerate(stream) if any(tr is selected for selected in stream.select(**query))]
+		assert_equal(list(trigger.stream_indexes(stream, **query)[0]), expected)
+		assert_equal(list(trigger.stream_indexes(table, **query)[0]), expected)
+	assert_equal(list(trigger.stream_indexes(stream, delta=.02)[0]), [1])
+	assert_equal(list(trigger.stream_indexes(stream, starttime=UTCDateTime(5))[0]), [2])
+	assert_equal(list(trigger.stream_indexes(stream, maxendtime=UTCDateTime(1))[0]), [0, 1, 3, 4, 5, 6, 7])
+	assert_equal(list(trigger.stream_indexes(stream, minstarttime=UTCDateTime(10))[0]), [1, 2])
+	indexes, samples = trigger.stream_indexes(stream, station='A', reftime=UTCDateTime(6))
+	assert_equal(list(indexes), [2, 3, 4])
+	assert_equal(list(samples), [100, 600, 600])
+
+
+def test_stream_indexes_cached_table():
+	stream = trigger.artificial_stream(npts=1000)
+	table = trigger.cached_stream_table(stream)
+	assert_true(trigger.cached_stream_table(stream) is table)
+	stream[2].stats.starttime += 5
+	assert_false(trigger.cached_stream_table(stream) is table)
+	assert_equal(list(trigger.stream_indexes(stream, starttime=UTCDateTime(5))[0]), [2])
+	stream.append(stream[0].copy())
+	assert_equal(len(trigger.cached_stream_table(stream)), len(stream))
+	key = id(stream)
+	del stream
+	assert_false(key in trigger._tables)
+
+
+def test_stream_indexes_precision():
+	stream = trigger.artificial_stream(npts=1000)
+	stream[2].stats.starttime += 5
+	assert_equal(list(trigger.stream_indexes(stream, starttime=UTCDateTime(5.0000001))[0]), [2])
+	assert_equal(list(trigger.stream_indexes(stream, starttime=UTCDateTime(5.00001))[0]), [])
+	assert_equal(list(trigger.stream_indexes(stream, starttime=UTCDateTime(5.00001, precision=4))[0]), [2])
+
+
+def check_pipeline(combination, multiplexor, preprocessor):
+	stream = trigger.artificial_stream(npts=2000)
+	classes = {'ratio': trigger.Ratio, 'correlate': trigger.Correlate}
+	kwargs = {} if preprocessor is None else {'preprocessor': preprocessor}
+	expected = classes[combination](stream.copy(), multiplexor=multiplexor, ragged=True, **kwargs).output()
+	cf = trigger.Pipeline(combination, multiplexor, preprocessor, ragged=True).run(stream.copy())
+	for c, e in zip(cf, expected):
+		assert_true(np.allclose(c, e, equal_nan=True))
+
+
+def test_pipeline():
+	for combination in ('ratio', 'correlate'):
+		for multiplexor in ('shortlongterms', 'leftrightterms', 'components'):
+			for preprocessor in (None, 'averageabs'):
+				yield check_pipeline, combination, multiplexor, preprocessor
+
+
+def test_pipeline_options():
+	assert_raises(TypeError, trigger.Pipeline('ratio', procscales=[1]).compile)
+	assert_raises(TypeError, trigger.Pipeline('correlate', normalize=True).compile)
+	assert_raises(TypeError, trigger.Pipeline('correlate', chunk=100).compile)
+	assert_raises(ValueError, trigger.Pipeline('sum').compile)
+	plan = dict(trigger.Pipeline('ratio', scratch='/tmp', normalize=True).compile())
+	assert_equal(plan['recursive']['scratch'], '/tmp')
+	assert_equal(plan['combine']['options'], {'normalize': True})
+
+
+def noisy_cf(npts=3000):
+	stream = trigger.artificial_stream(npts=npts)
+	cf = trigger.Correlate(stream).output()
+	return stream, cf + .05*np.random.RandomState(0).rand(*cf.shape)
+
+
+def test_trigger_onsets():
+	stream, cf = noisy_cf()
+	for thr_on in (.1, .3):
+		for max_len_delete in (False, True):
+			picks = trigger.trigger_onsets(cf, thr_on, stream, max_len_delete=max_len_delete)
+			for t in range(len(stream)):
+				expected = np.asarray(trigger.trigger_onset(cf[t], thr_on, trace=stream[t], max_len_delete=max_len_delete), dtype=np.int64).reshape(-1, 2)
+				rows = picks['trace'] == t
+				assert_true(np.array_equal(np.c_[picks['on'][rows], picks['off'][rows]], expected))
+				assert_true(all(picks['id'][rows] == stream[t].id))
+
+
+def test_online_trigger_chunks():
+	stream, cf = noisy_cf()
+	expected = trigger.trigger_onsets(cf, .1, stream, max_len_delete=False)
+	for size in (1, 7, 512, cf.shape[1]):
+		picker = trigger.OnlineTrigger(.1, stream)
+		picks = [picker.update(cf[:, i:i+size]) for i in range(0, cf.shape[1], size)]
+		picks.append(picker.flush())
+		picks = np.concatenate(picks)
+		picks = picks[np.lexsort((picks['on'], picks['trace']))]
+		for name in ('trace', 'id', 'on', 'off'):
+			assert_true(np.array_equal(picks[name], expected[name]), 'chunks of %d samples' % size)
+
+
+def test_network_picks():
+	stream = trigger.artificial_stream(npts=3000)
+	cf = trigger.Correlate(stream.copy()).output()
+	expected = trigger.trigger_onsets(cf, .1, stream)
+	for workers in (None, 2):
+		picks = trigger.network_picks(stream.copy(), .1, workers=workers, batch=3)
+		for name in ('trace', 'id', 'on', 'off'):
+			assert_true(np.array_equal(picks[name], expected[name]))
+
+
+def test_network_picks_empty():
+	picks = trigger.network_picks(Stream())
+	assert_equal(len(picks), 0)
+	assert_equal(picks.dtype.names, trigger.pick_table([], [], []).dtype.names)
+
+
+class TestCachedCf(object):
+
+	def setup(self):
+		self.cachedir, self.cachesize = trigger.cf_cachedir, trigger.cf_cachesize
+		trigger.cf_cachedir = tempfile.mkdtemp()
+		self.calls = 0
+
+	def teardown(self):
+		shutil.rmtree(trigger.cf_cachedir, True)
+		trigger.cf_cachedir, trigger.cf_cachesize = self.cachedir, self.cachesize
+
+	def cf(self):
+		self.calls += 1
+		return np.ones((3, 100))
+
+	def files(self):
+		return sorted(os.listdir(trigger.cf_cachedir))
+
+	def test_hit(self):
+		stream = trigger.artificial_stream(npts=500)
+		first = trigger.cached_cf(stream, {'thr': 1}, self.cf)
+		second = trigger.cached_cf(stream.copy(), {'thr': 1}, self.cf)
+		assert_equal(self.calls, 1)
+		assert_true(np.array_equal(first, second))
+		# copy-on-write
+		second[0, 0] = 5.
+		assert_true(np.array_equal(trigger.cached_cf(stream, {'thr': 1}, self.cf), first))
+
+	def test_miss(self):
+		stream = trigger.artificial_stream(npts=500)
+		trigger.cached_cf(stream, {'thr': 1}, self.cf)
+		trigger.cached_cf(stream, {'thr': 2}, self.cf)
+		stream[0].data[10] += 1.
+		trigger.cached_cf(stream, {'thr': 1}, self.cf)
+		assert_equal(self.calls, 3)
+		assert_equal(len(self.files()), 3)
+
+	def test_eviction(self):
+		stream = trigger.artificial_stream(npts=500)
+		trigger.cached_cf(stream, {'thr': 1}, self.cf)
+		first = self.files()
+		# older than the next ones
+		for name in first:
+			os.utime(os.path.join(trigger.cf_cachedir, name), (0, 0))
+		trigger.cf_cachesize = 2*os.path.getsize(os.path.join(trigger.cf_cachedir, first[0]))
+		trigger.cached_cf(stream, {'thr': 2}, self.cf)
+		trigger.cached_cf(stream, {'thr': 3}, self.cf)
+		assert_equal(len(self.files()), 2)
+		assert_true(first[0] not in self.files())
+		trigger.cached_cf(stream, {'thr': 1}, self.cf)
+		assert_equal(self.calls, 4)
+
+
+def test_correlationcoef_batched():
+	random = np.random.RandomState(0)
+	a = random.randn(4, 600)
+	b = random.randn(3, 4, 600)
+	# no signal, a constant and gaps
+	a[1] = 0.
+	b[0, 2] = 3.
+	b[1, 0, 200:] = np.nan
+	a[3, 100] = np.nan
+	for scales in (None, [16, 50]):
+		with np.errstate(divide='ignore', invalid='ignore'):
+			cc = trigger.correlationcoef(a, b, scales=scales)
+			for c in range(b.shape[0]):
+				# (station, samples) pairs, and one pair at a time
+				pairs = trigger.correlationcoef(a, b[c], scales=scales)
+				for t in range(a.shape[0]):
+					expected = trigger.correlationcoef(a[t], b[c, t], scales=scales)
+					np.testing.assert_array_equal(cc[c, t], expected)
+					np.testing.assert_array_equal(pairs[t], expected)
+	assert_true(np.isnan(cc[1, 0, 200:]).all())
+	assert_true(np.isfinite(cc[1, 0, :200]).all())
+	assert_true(np.isnan(cc[:, 3, 100:]).all())
+	# 0/0 without signal, as one pair at a time
+	assert_true(np.isnan(cc[:, 1, 1:]).all())
+	assert_true(np.isfinite(cc[0, 2]).all())
+	# single precision data, summed in double precision
+	single = trigger.correlationcoef(a[[0, 2]].astype(np.float32), b[2, [0, 2]].astype(np.float32), scales=scales)
+	assert_equal(single.dtype, np.float32)
+	assert_true(np.allclose(single, cc[2, [0, 2]], rtol=1e-4, atol=1e-5))
+
+
+# (station, channel, start in samples, npts, sampling rate), and the 
+# expected three-component sets
+component_table = [
+	(('STA', 'HHZ', 0, 500, 100.), ('STA', 'HHN', 5, 500, 100.), ('STA', 'HHE', -10, 500, 100.)),
+	(('STB', 'EH3', 0, 500, 100.), ('STB', 'EH2', 20, 400, 100.), ('STB', 'EH1', 0, 500, 100.)),
+	(('STC', 'VERTICAL', 0, 500, 100.), ('STC', 'NORTH', 0, 500, 100.), ('STC', 'EAST', 3, 500, 100.)),
+	(('STC', 'vertical', 0, 500, 50.), ('STC', 'north', 0, 500, 50.), ('STC', 'east', 0, 500, 50.)),
+	(('ABCZ', 'SHZ', 0, 500, 100.), ('ABCN', 'SHN', -7, 500, 100.), ('ABCE', 'SHE', 0, 500, 100.)),
+	(('abcz', 'SHZ', 0, 500, 100.), ('abcn', 'SHN', 0, 500, 100.), ('abce', 'SHE', 9, 500, 100.)),
+	# incomplete sets
+	(('STD', 'BHZ', 0, 500, 100.), ('STD', 'BHN', 0, 500, 100.)),
+	(('STE', 'BHE', 0, 500, 100.),),
+	(('STF', 'BHZ', 0, 500, 100.),),
+	# without overlap (same set, not matched), or at another 
+	# sampling rate
+	(('STG', 'HHZ', 0, 500, 100.), ('STG', 'HHN', 600, 500, 100.)),
+	(('STH', 'HHZ', 0, 500, 100.),),
+	(('STH', 'HHN', 0, 500, 50.),),
+	]
+
+
+def component_stream():
+	stream = Stream()
+	for group in component_table:
+		for station, channel, start, npts, sampling_rate in group:
+			stream.append(Trace(np.zeros(npts), header={'network': 'NT', 'station': station, 'channel': channel, 'sampling_rate': sampling_rate, 'starttime': UTCDateTime(1000+start/sampling_rate)}))
+	return stream
+
+
+def baseline_triplet(stream, t):
+	"""
+	Components of a trace as matched by the baseline Components.output.
+	"""
+	stats = stream[t].stats
+	sta, chan = stats.station, stats.channel
+	ZNE = [chan, chan[:-1] + 'N', chan[:-1] + 'E']
+	ZNE_sta = [sta, sta, sta]
+	if chan[-1] in ('Z', 'N', 'E'):
+		ZNE = [chan[:-1] + 'Z', chan[:-1] + 'N', chan[:-1] + 'E']
+	if chan[-1] in ('3', '2', '1'):
+		ZNE = [chan[:-1] + '3', chan[:-1] + '2', chan[:-1] + '1']
+	if chan in ('VERTICAL', 'NORTH', 'EAST'):
+		ZNE = ['VERTICAL', 'NORTH', 'EAST']
+	if chan in ('vertical', 'north', 'east'):
+		ZNE = ['vertical', 'north', 'east']
+	if len(sta) > 3 and sta[-1] in ('Z', 'N', 'E'):
+		ZNE_sta = [sta[:-1] + 'Z', sta[:-1] + 'N', sta[:-1] + 'E']
+	if len(sta) > 3 and sta[-1] in ('z', 'n', 'e'):
+		ZNE_sta = [sta[:-1] + 'z', sta[:-1] + 'n', sta[:-1] + 'e']
+	if chan[-1] in ('N', '2') or chan in ('NORTH', 'north'):
+		ZNE, ZNE_sta = [ZNE[1], ZNE[0]], [ZNE_sta[1], ZNE_sta[0]]
+	elif chan[-1] in ('E', '1') or chan in ('EAST', 'east'):
+		ZNE, ZNE_sta = [ZNE[2], ZNE[0]], [ZNE_sta[2], ZNE_sta[0]]
+	ZNE_i, ZNE_di = [], []
+	for station, channel in zip(ZNE_sta, ZNE):
+		i, di = trigger.stream_indexes(stream, delta=stats.delta, network=stats.network, station=station, location=stats.location, channel=channel, minstarttime=stats.starttime, maxendtime=stats.endtime, reftime=stats.starttime)
+		ZNE_i.extend(i)
+		ZNE_di.extend(di)
+	return ZNE_i, ZNE_di
+
+
+def test_component_index():
+	stream = component_stream()
+	index = trigger.ComponentIndex(stream)
+	for t in range(len(stream)):
+		ZNE_i, ZNE_di = index.triplet(t)
+		expected_i, expected_di = baseline_triplet(stream, t)
+		assert_equal(list(ZNE_i), expected_i, stream[t].id)
+		assert_equal(list(ZNE_di), expected_di, stream[t].id)
+	# one set per group of the table
+	groups = sorted(sorted(sum(group.values(), [])) for group in index.groups.values())
+	bounds = np.cumsum([0]+[len(group) for group in component_table])
+	assert_equal(groups, [list(range(i, j)) for i, j in zip(bounds[:-1], bounds[1:])])
+
+
+def check_ragged(combination, multiplexor):
+	stream = trigger.artificial_stream(npts=3000)
+	# a shorter vertical component, and shorter horizontal ones
+	for t, npts in ((1, 2500), (2, 2000), (6, 2200)):
+		stream[t].data = stream[t].data[:npts]
+	scales = trigger.default_scales(3000)
+	padded = combination(stream.copy(), multiplexor=multiplexor).output()
+	ragged = combination(stream.copy(), multiplexor=multiplexor, ragged=True).output()
+	for t, tr in enumerate(stream):
+		n = tr.stats.npts
+		if multiplexor == 'leftrightterms':
+			# the right terms end with the trace, as for the trace alone
+			alone = combination(stream[t:t+1].copy(), multiplexor=multiplexor, scales=scales).output()
+			assert_true(np.allclose(ragged[t], alone[0], rtol=1e-12, atol=0, equal_nan=True), tr.id)
+			n -= max(scales)
+		assert_true(np.allclose(ragged[t][:n], padded[t, :n], rtol=1e-12, atol=0, equal_nan=True), tr.id)
+	if combination is trigger.Ratio and multiplexor == 'components':
+		# beyond the end of the vertical component of station A
+		assert_true(np.all(padded[3:5, 2000:] == 1.))
+
+
+def test_ragged_recursive():
+	stream = mixed_stream()
+	for operation in ('rms', 'averageabs', 'median'):
+		padded, scales = trigger.recursive(stream.copy(), operation=operation)
+		ragged, ragged_scales = trigger.recursive(stream.copy(), operation=operation, ragged=True)
+		assert_true(np.array_equal(scales, ragged_scales))
+		for t, tr in enumerate(stream):
+			assert_true(np.array_equal(ragged[t], padded[t][:, :tr.stats.npts]), operation)
+
+
+def test_ragged():
+	for combination in (trigger.Ratio, trigger.Correlate):
+		for multiplexor in ('shortlongterms', 'leftrightterms', 'components'):
+			yield check_ragged, combination, multiplexor
+
+
+def check_float32(combination, multiplexor, rtol, atol):
+	stream = trigger.artificial_stream(npts=20000)[2:5]
+	for tr in stream:
+		# long cumulative sums over a DC offset
+		tr.data = tr.data + 1e4
+	expected = combination(stream.copy(), multiplexor=multiplexor).output()
+	single = combination(stream.copy(), multiplexor=multiplexor, dtype=np.float32).output()
+	assert_equal(single.dtype, np.float32)
+	ok = np.isfinite(expected) & (expected > 1e-30)
+	error = np.abs(single[ok]-expected[ok])
+	assert_true(np.all(error <= rtol*expected[ok] + atol), 'max relative error %g, absolute %g' % (np.max(error/expected[ok]), np.max(error)))
+
+
+def test_float32():
+	for multiplexor, rtol in (('shortlongterms', 1e-4), ('leftrightterms', 1e-4), ('components', 1e-3)):
+		yield check_float32, trigger.Ratio, multiplexor, rtol, 0.
+		# 1 - correlation coefficients, in [0, 2]
+		yield check_float32, trigger.Correlate, multiplexor, 0., 2e-5
+
+
+def assert_same(a, b):
+	a, b = np.asarray(a), np.asarray(b)
+	assert_true(np.array_equal(np.isnan(a), np.isnan(b)))
+	assert_true(np.array_equal(np.nan_to_num(a), np.nan_to_num(b)))
+
+
+class TestScratch(object):
+
+	def setup(self):
+		self.scratch = tempfile.mkdtemp()
+
+	def teardown(self):
+		shutil.rmtree(self.scratch, True)
+
+	def mapped(self):
+		# files of the scratch directory still mapped in memory
+		with open('/proc/self/maps') as maps:
+			return [line for line in maps if self.scratch in line]
+
+	def test_multiplexors(self):
+		stream = trigger.artificial_stream(npts=2000)
+		for multiplexor in (trigger.ShortLongTerms, trigger.LeftRightTerms, trigger.Components):
+			expected = multiplexor(stream.copy()).output()
+			mapped = multiplexor(stream.copy(), scratch=self.scratch).output()
+			assert_true(isinstance(mapped[0], np.memmap))
+			for a, b in zip(expected, mapped):
+				assert_same(a, b)
+		for combination in (trigger.Ratio, trigger.Correlate):
+			for multiplexor in ('shortlongterms', 'leftrightterms', 'components'):
+				expected = combination(stream.copy(), multiplexor=multiplexor).output()
+				assert_same(combination(stream.copy(), multiplexor=multiplexor, scratch=self.scratch).output(), expected)
+
+	def test_predom_period(self):
+		stream = trigger.artificial_stream(npts=2000)[:3]
+		expected = trigger.predom_period(stream.copy()).output()
+		mapped = trigger.predom_period(stream.copy(), scratch=self.scratch).output()
+		for a, b in zip(expected, mapped):
+			assert_same(a, b)
+
+	def test_files(self):
+		channels = trigger.ShortLongTerms(trigger.artificial_stream(npts=2000), scratch=self.scratch).output()[0]
+		# deleted right away, released with the array
+		assert_equal(os.listdir(self.scratch), [])
+		if os.path.exists('/proc/self/maps'):
+			assert_true(len(self.mapped()) > 0)
+			del channels
+			gc.collect()
+			assert_equal(self.mapped(), [])
+
+
+def period_trace(npts=12000, delta=.01):
+	t = np.arange(npts)*delta
+	data = np.random.RandomState(0).randn(npts) + 5*np.sin(2*np.pi*8*t)*(t < 30) + 5*np.sin(2*np.pi*3*t)*(t > 40)
+	return Trace(data, header={'delta': delta})
+
+
+def test_local_period_cwt():
+	from obspy.signal.tf_misfit import cwt
+	trace = period_trace()
+	fmin, fmax = 1., 1./trace.stats.delta/2
+	tf = np.abs(cwt(trace.data, trace.stats.delta, w0=6, fmin=fmin, fmax=fmax, nf=32))
+	expected = 1./np.logspace(np.log10(fmin), np.log10(fmax), 32)[tf.argmax(axis=0)]
+	# blocks of 3140 samples, windows within and across blocks
+	for start, stop in ((0, 12000), (3000, 3300), (6200, 6400), (11900, 12000)):
+		assert_true(np.array_equal(trigger.local_period(trace, start, stop, fmin=fmin), expected[start:stop]), (start, stop))
+
+
+def test_local_period_recursive():
+	npts, delta = 12000, .01
+	t = np.arange(npts)*delta
+	trace = Trace(np.sin(2*np.pi*5*t) + .01*np.random.RandomState(0).randn(npts), header={'delta': delta})
+	blocks = trigger.local_period(trace, 0, npts, method='recursive', fmin=1., block=2000)
+	whole = trigger.local_period(trace, 0, npts, method='recursive', fmin=1., block=2**15)
+	assert_true(np.allclose(blocks, whole, rtol=2e-2, atol=0))
+	# the period of the sine, once the sums are full
+	assert_true(np.allclose(blocks[200:], .2, rtol=7e-2, atol=0))
+	assert_raises(ValueError, trigger.local_period, trace, 0, 10, 'spectrum')
+
+
+def test_local_period_cache():
+	trace = period_trace()
+	calls = []
+	morlet_period = trigger.morlet_period
+	def counted(*args, **kwargs):
+		calls.append(args)
+		return morlet_period(*args, **kwargs)
+	trigger.morlet_period = counted
+	cachesize = trigger.period_cachesize
+	try:
+		# within the second block (3140 to 6280)
+		first = trigger.local_period(trace, 3200, 3500, fmin=1.)
+		assert_equal(len(calls), 1)
+		assert_true(np.array_equal(trigger.local_period(trace, 3300, 3400, fmin=1.), first[100:200]))
+		assert_equal(len(calls), 1)
+		# another block, another trace object
+		trigger.local_period(trace, 7000, 7200, fmin=1.)
+		trigger.local_period(trace.copy(), 3200, 3500, fmin=1.)
+		assert_equal(len(calls), 3)
+		# least recently used blocks are evicted
+		trigger.period_cachesize = 1
+		trigger.local_period(trace, 9500, 9600, fmin=1.)
+		assert_equal(len(trigger._periods), 1)
+		trigger.local_period(trace, 3200, 3500, fmin=1.)
+		assert_equal(len(calls), 5)
+	finally:
+		trigger.morlet_period = morlet_period
+		trigger.period_cachesize = cachesize
+
+
+def check_morlet_period(cachebytes):
+	from obspy.signal.tf_misfit import cwt
+	stream = trigger.artificial_stream(npts=1500)[:3]
+	data = np.asarray([tr.data for tr in stream], dtype=np.float)
+	delta = stream[0].stats.delta
+	fmin, fmax = .5, 1./delta/2
+	f = np.logspace(np.log10(fmin), np.log10(fmax), 32)
+	wavelets = trigger._wavelets.copy()
+	size = trigger.wavelet_cachebytes
+	trigger._wavelets.clear()
+	trigger.wavelet_cachebytes = cachebytes
+	try:
+		for repeat in range(2):
+			periods = trigger.morlet_period(data, delta, fmin=fmin)
+			for t, row in enumerate(data):
+				expected = 1./f[np.abs(cwt(row, delta, w0=6, fmin=fmin, fmax=fmax, nf=32)).argmax(axis=0)]
+				assert_true(np.array_equal(periods[t], expected))
+			# kernels kept only if they fit
+			assert_equal(len(trigger._wavelets), 1 if cachebytes else 0)
+	finally:
+		trigger._wavelets.clear()
+		trigger._wavelets.update(wavelets)
+		trigger.wavelet_cachebytes = size
+
+
+def test_morlet_period():
+	yield check_morlet_period, 2**28
+	# without cache, one kernel at a time
+	yield check_morlet_period, 0
+
+
+def rolling_reference(data, window, min_periods):
+	from scipy.stats import kurtosis, skew
+	reference = np.nan*np.ones((2,) + data.shape)
+	for t, row in enumerate(data):
+		for i in range(min_periods-1, len(row)):
+			segment = row[max(0, i+1-window):i+1]
+			# centred first, the reference keeps its precision at any offset
+			segment = segment - segment.mean()
+			if len(segment) >= 4:
+				reference[0, t, i] = kurtosis(segment, bias=False)
+			if len(segment) >= 3:
+				reference[1, t, i] = skew(segment, bias=False)
+	return reference
+
+
+def check_rolling_moments(offset):
+	np.random.seed(4)
+	data = np.random.randn(2, 500).cumsum(axis=-1) + offset
+	windows = [5, 37, 100]
+	kurtosis, skewness = trigger.rolling_moments(data, windows, ('kurtosis', 'skewness'), min_periods=3)
+	assert_equal(kurtosis.shape, (2, len(windows), 500))
+	for w, window in enumerate(windows):
+		expected = rolling_reference(data, window, 3)
+		np.testing.assert_allclose(kurtosis[:, w], expected[0], rtol=1e-7, atol=1e-8)
+		np.testing.assert_allclose(skewness[:, w], expected[1], rtol=1e-7, atol=1e-8)
+	# one window, default min_periods: NaN until the window is full
+	expected = rolling_reference(data, 37, 37)
+	np.testing.assert_allclose(trigger.rolling_kurtosis(data, 37), expected[0], rtol=1e-7, atol=1e-8)
+	np.testing.assert_allclose(trigger.rolling_skewness(data, 37), expected[1], rtol=1e-7, atol=1e-8)
+
+
+def test_rolling_moments():
+	yield check_rolling_moments, 0.
+	# small variations over a large offset (pandas is off by ~3e10)
+	yield check_rolling_moments, 1e8
+
+
+def test_rolling_moments_statistics():
+	assert_raises(ValueError, trigger.rolling_moments, np.zeros(10), 5, ('variance',))
+
+
+def test_window_view():
+	data = np.arange(20.)
+	for length in (1, 7, 20, 21):
+		view = trigger.window_view(data, length)
+		assert_equal(view.shape, (max(0, len(data)-length+1), length))
+		for i, window in enumerate(view):
+			assert_true(np.array_equal(window, data[i:i+length]))
+		assert_false(view.flags.writeable)
+		assert_true(len(view) == 0 or np.may_share_memory(view, data))
+
+
+def sliced_window(data, start, length, nmax):
+	window = np.nan*np.ones(nmax)
+	for k in range(length):
+		if 0 <= start+k < len(data):
+			window[k] = data[start+k]
+	return window
+
+
+def test_stream_trim_cf():
+	np.random.seed(5)
+	stream = Stream([Trace(np.random.randn(npts), header={'sampling_rate': rate}) for npts, rate in ((1000, 100.), (600, 50.), (800, 100.))])
+	cf = np.nan*np.ones((len(stream), 1000))
+	for t, tr in enumerate(stream):
+		cf[t, :tr.stats.npts] = np.random.rand(tr.stats.npts)
+	# inside, over the start and over the end of each trace
+	picks = np.zeros(9, dtype=[('trace', np.int64), ('on', np.int64)])
+	picks['trace'] = [0, 0, 0, 1, 1, 1, 2, 2, 2]
+	picks['on'] = [500, 10, 990, 300, 5, 595, 400, 0, 799]
+	before, after = .25, .3
+	wavelets, cflets = trigger.stream_trim_cf(stream, picks, before=before, after=after, cf=cf)
+	np.testing.assert_array_equal(wavelets, trigger.stream_trim_cf(stream, picks, before=before, after=after))
+	# windows of the highest sampling rate, NaN after the others (half
+	# samples rounded to even, 12 samples before at 50 Hz)
+	nmax = int(round(before*100.)) + int(round(after*100.))
+	assert_equal(wavelets.shape, (len(picks), nmax))
+	assert_equal(cflets.shape, (len(picks), nmax))
+	for i, (t, on) in enumerate(picks):
+		rate = stream[t].stats.sampling_rate
+		first = int(np.round(before*rate))
+		length = first + int(np.round(after*rate))
+		expected = sliced_window(stream[t].data, on-first, length, nmax)
+		np.testing.assert_array_equal(wavelets[i], expected)
+		expected = sliced_window(cf[t], on-first, length, nmax)
+		np.testing.assert_array_equal(cflets[i], expected)
+
+
+def test_stream_trim_cf_empty():
+	stream = Stream([Trace(np.ones(100))])
+	picks = np.zeros(0, dtype=[('trace', np.int64), ('on', np.int64)])
+	wavelets, cflets = trigger.stream_trim_cf(stream, picks, cf=np.ones((1, 100)))
+	assert_equal(wavelets.shape, (0, 0))
+	assert_equal(cflets.shape, (0, 0))